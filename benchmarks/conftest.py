@@ -0,0 +1,33 @@
+import os
+import matplotlib
+
+# Benchmarks draw into memory, never on a display
+matplotlib.use('Agg')
+
+import pytest
+import query_cache
+from database import dispose_engines
+from synthetic_data import generate
+
+# Menu items per platform of the synthetic databases, e.g. BENCHMARK_MENU_ITEMS=10000000 for production scale
+MENU_ITEMS = int(os.environ.get('BENCHMARK_MENU_ITEMS', 10_000))
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Function to run the whole session in a directory holding synthetic databases, so no real data or snapshot is read
+@pytest.fixture(scope='session', autouse=True)
+def synthetic_databases(tmp_path_factory):
+    workdir = tmp_path_factory.mktemp(f'market-{MENU_ITEMS}')
+    paths = generate(os.path.join(workdir, 'databases'), MENU_ITEMS)
+    os.symlink(os.path.join(REPO_DIR, 'map'), os.path.join(workdir, 'map'))
+
+    previous_dir = os.getcwd()
+    previous_cache = query_cache.CACHE_DISABLED
+    os.chdir(workdir)
+    # Every round has to hit SQLite, not the query cache
+    query_cache.CACHE_DISABLED = True
+    dispose_engines()
+    yield paths
+    dispose_engines()
+    query_cache.CACHE_DISABLED = previous_cache
+    os.chdir(previous_dir)
@@ -0,0 +1,122 @@
+import matplotlib.pyplot as plt
+import pandas as pd
+import pytest
+from database import read_platforms, read_query
+from distribution_across_provinces import get_platform_data, plot_province_counts
+from distribution_map import create_dataframe, plot_individual_and_combined_restaurants
+from grid_cube import LEVELS, build_cube_tables, fetch_price_bins, fetch_restaurant_categories
+from matching import match_restaurants
+from platforms import CANONICAL_QUERIES, PLATFORMS
+from postal_codes import clean_postal_codes, postal_code_to_province
+from proximity import RADII_KM, competitor_counts
+from ranking import rank_restaurants
+from snapshot import load_restaurants, to_canonical
+from tiles import MIN_ZOOM, load_layer, tile_features, to_points
+from venn import plot_venn
+
+PLATFORM_NAMES = list(PLATFORMS)
+
+@pytest.fixture(scope='module')
+def restaurants():
+    return load_restaurants()
+
+@pytest.fixture(scope='module')
+def raw_restaurants():
+    return {platform: read_query(platform, CANONICAL_QUERIES['restaurants'][platform]) for platform in PLATFORM_NAMES}
+
+# Stage 1: queries
+
+@pytest.mark.parametrize('platform', PLATFORM_NAMES)
+def test_query_restaurants(benchmark, platform):
+    df = benchmark(read_query, platform, CANONICAL_QUERIES['restaurants'][platform])
+    assert len(df) > 0
+
+@pytest.mark.parametrize('platform', PLATFORM_NAMES)
+def test_query_menu_items(benchmark, platform):
+    df = benchmark(read_query, platform, CANONICAL_QUERIES['menu_items'][platform])
+    assert len(df) > 0
+
+def test_query_all_platforms(benchmark):
+    df = benchmark(read_platforms, CANONICAL_QUERIES['restaurants'])
+    assert set(df['platform']) == set(PLATFORM_NAMES)
+
+# Stage 2: province mapping
+
+@pytest.mark.parametrize('platform', PLATFORM_NAMES)
+def test_postal_code_to_province(benchmark, raw_restaurants, platform):
+    postal_codes = raw_restaurants[platform]['postal_code']
+    provinces = benchmark(lambda: postal_code_to_province(clean_postal_codes(postal_codes)))
+    assert len(provinces) == len(postal_codes)
+
+@pytest.mark.parametrize('platform', PLATFORM_NAMES)
+def test_to_canonical(benchmark, raw_restaurants, platform):
+    df = benchmark(to_canonical, 'restaurants', raw_restaurants[platform], platform)
+    assert 'province' in df
+
+@pytest.mark.parametrize('platform', PLATFORM_NAMES)
+def test_province_counts(benchmark, platform):
+    df = benchmark(get_platform_data, platform)
+    assert df['restaurant_count'].sum() > 0
+
+# Stage 3: concat
+
+def test_concat(benchmark, raw_restaurants):
+    frames = [df.assign(platform=platform) for platform, df in raw_restaurants.items()]
+    df = benchmark(pd.concat, frames, ignore_index=True)
+    assert len(df) == sum(len(frame) for frame in frames)
+
+def test_load_restaurants(benchmark):
+    df = benchmark(load_restaurants)
+    assert set(df['platform']) == set(PLATFORM_NAMES)
+
+# Stage 4: plotting
+
+def test_plot_province_counts(benchmark, restaurants):
+    counts = restaurants.groupby(['platform', 'province'], observed=True).size().rename('restaurant_count').reset_index()
+    benchmark(lambda: plt.close(plot_province_counts(counts)))
+
+def test_plot_restaurant_maps(benchmark, restaurants):
+    frames = {platform: create_dataframe(restaurants, platform) for platform in PLATFORM_NAMES}
+    benchmark(lambda: plt.close(plot_individual_and_combined_restaurants(frames)))
+
+# Stage 5: Venn
+
+def test_match_restaurants(benchmark, restaurants):
+    matches = benchmark(match_restaurants, restaurants)
+    assert matches['canonical_id'].nunique() < len(matches)
+
+def test_plot_venn(benchmark, restaurants):
+    matches = match_restaurants(restaurants).rename(columns={'platform': 'source'})
+    benchmark(lambda: plt.close(plot_venn(matches)))
+
+# Stage 6: grid cube
+
+def test_build_cube_tables(benchmark):
+    restaurants, categories = fetch_restaurant_categories()
+    price_bins = fetch_price_bins()
+    cells, _ = benchmark(build_cube_tables, restaurants, categories, price_bins)
+    top = cells[(cells['level'] == 0) & (cells['category'] == 'All')]
+    assert top['restaurants'].sum() == len(restaurants)
+    assert set(cells['level']) == set(range(LEVELS))
+
+# Stage 7: rankings
+
+def test_rank_restaurants(benchmark):
+    ranked = benchmark(rank_restaurants, 'pizza')
+    assert list(ranked['rank']) == list(range(1, len(ranked) + 1))
+    assert ranked['adjusted_rating'].is_monotonic_decreasing
+
+# Stage 8: proximity
+
+def test_competitor_counts(benchmark):
+    restaurants = load_restaurants(columns=['platform', 'restaurant_id', 'latitude', 'longitude'], valid_coordinates=True)
+    counts = benchmark(competitor_counts, restaurants)
+    assert len(counts) == len(restaurants)
+    assert len(counts.columns) == 2 + len(PLATFORM_NAMES) * len(RADII_KM)
+
+# Stage 9: map tiles
+
+def test_tile_features(benchmark):
+    points = to_points(load_layer('restaurants'))
+    tiles = benchmark(tile_features, points, MIN_ZOOM)
+    assert sum(feature['properties']['count'] for features in tiles.values() for feature in features) == len(points)
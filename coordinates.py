@@ -0,0 +1,55 @@
+import argparse
+import numpy as np
+import pandas as pd
+from instrumentation import stage
+from regions import assign_regions
+
+# Reasons the coordinates of a row are rejected, in the order they are checked
+COORDINATE_ISSUES = ['missing', 'zero', 'swapped', 'outside_belgium']
+
+# Restaurant ids listed per platform and reason in the summary
+SUMMARY_EXAMPLES = 3
+
+# Function to find why the coordinates of each row are unusable, missing for the valid rows.
+# regions holds the region polygon of each point (see regions.assign_regions): a point in no polygon is outside Belgium,
+# unless swapping its latitude and longitude puts it inside
+def find_coordinate_issues(df, regions, platform=None):
+    with stage('validate_coordinates', platform, rows=len(df)) as record:
+        latitudes = pd.to_numeric(df['latitude'], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+        longitudes = pd.to_numeric(df['longitude'], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+        missing = np.isnan(latitudes) | np.isnan(longitudes)
+        zero = ~missing & ((latitudes == 0) | (longitudes == 0))
+        outside = ~missing & ~zero & regions.isna().to_numpy()
+
+        # Only the points outside every polygon are tested a second time
+        swapped = np.zeros(len(df), dtype=bool)
+        if outside.any():
+            swapped[outside] = assign_regions(df[outside], longitude='latitude', latitude='longitude').notna().to_numpy()
+
+        issues = np.full(len(df), None, dtype=object)
+        issues[missing] = 'missing'
+        issues[zero] = 'zero'
+        issues[outside] = 'outside_belgium'
+        issues[swapped] = 'swapped'
+        issues = pd.Series(pd.Categorical(issues, categories=COORDINATE_ISSUES), index=df.index, name='coordinate_issue')
+        record.update({f'rejected_{issue}': int(count) for issue, count in issues.value_counts().items() if count})
+    return issues
+
+# Function to summarize the rejected rows of a canonical table: how many per platform and reason, their share and a few ids
+def coordinate_summary(df, examples=SUMMARY_EXAMPLES):
+    rejected = df[df['coordinate_issue'].notna()]
+    summary = rejected.groupby(['platform', 'coordinate_issue'], observed=True).agg(
+        rows=('restaurant_id', 'size'), examples=('restaurant_id', lambda ids: ', '.join(ids.head(examples))))
+    summary = summary.reset_index()
+    totals = df.groupby('platform', observed=True).size()
+    summary['share'] = summary['rows'] / summary['platform'].map(totals).astype(float)
+    return summary[['platform', 'coordinate_issue', 'rows', 'share', 'examples']]
+
+if __name__ == "__main__":
+    from snapshot import load_table
+
+    parser = argparse.ArgumentParser(description='Summarize the rows whose coordinates are rejected on load')
+    parser.add_argument('--table', default='restaurants', choices=['restaurants', 'locations'], help='canonical table to summarize')
+    args = parser.parse_args()
+    summary = coordinate_summary(load_table(args.table, columns=['platform', 'restaurant_id', 'coordinate_issue']))
+    print(summary.to_string(index=False) if len(summary) else 'No rejected coordinates')
@@ -0,0 +1,198 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+import os
+from sqlalchemy import create_engine, event, text
+import pandas as pd
+from instrumentation import SLOW_QUERY_SECONDS, result_size, stage
+from platforms import PLATFORMS
+from query_cache import cached_query, normalize_query
+
+try:
+    import adbc_driver_manager
+    import adbc_driver_sqlite.dbapi as adbc_sqlite
+except ImportError:
+    # Without the ADBC driver every result is read row by row through SQLAlchemy
+    adbc_sqlite = None
+
+# Location of the scraped database for each platform
+DATABASES = {platform: spec['database'] for platform, spec in PLATFORMS.items()}
+
+# Memory-map up to 1 GiB of each database file instead of copying pages into SQLite's cache
+MMAP_SIZE = 1024 ** 3
+
+# Number of platforms loaded at the same time, one worker per platform when unset
+MAX_WORKERS = int(os.environ.get('LOADER_MAX_WORKERS', 0)) or None
+
+# Rows the ADBC driver returns at a time. It types each column from the first batch and widens it to text within a batch,
+# so large batches leave few results with a value of another type in a later batch
+ARROW_BATCH_ROWS = 1_000_000
+
+# One pooled engine per platform, created on first use
+_engines = {}
+
+# Function to enable memory-mapped reads on every new SQLite connection
+def _configure_connection(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f'PRAGMA mmap_size = {MMAP_SIZE}')
+    cursor.execute('PRAGMA query_only = ON')
+    cursor.close()
+
+# Function to open an ADBC connection to a platform database, read-only and immutable like the engines,
+# with a cursor returning batches of batch_rows rows
+def _adbc_connect(platform, batch_rows=ARROW_BATCH_ROWS):
+    con = adbc_sqlite.connect(f'file:{DATABASES[platform]}?mode=ro&immutable=1')
+    cursor = con.cursor()
+    cursor.execute(f'PRAGMA mmap_size = {MMAP_SIZE}')
+    cursor.fetchall()
+    cursor.adbc_statement.set_options(**{'adbc.sqlite.query.batch_rows': str(batch_rows)})
+    return con, cursor
+
+# Function to get the shared read-only engine of a platform
+def get_engine(platform):
+    if platform not in _engines:
+        db_path = DATABASES[platform]
+        # The scrape snapshots never change while we read them, so open them immutable
+        engine = create_engine(f'sqlite:///file:{db_path}?mode=ro&immutable=1&uri=true')
+        event.listen(engine, 'connect', _configure_connection)
+        _engines[platform] = engine
+    return _engines[platform]
+
+# Function to close the pooled connections, e.g. after a database file was rewritten
+def dispose_engines():
+    for engine in _engines.values():
+        engine.dispose()
+    _engines.clear()
+
+# Function to run a query on a platform database and read the result into a dataframe
+def read_query(platform, query, params=None, chunksize=None, use_cache=True):
+    engine = get_engine(platform)
+    if chunksize is None:
+        with stage('query', platform, query=normalize_query(query)[:200]) as record:
+            # Whole results are served from the on-disk cache while the database file is unchanged
+            df = cached_query(DATABASES[platform], query, params, partial(_read_query, engine, query, params, platform), bypass=not use_cache)
+            record.update(result_size(df))
+        if record.get('wall_s', 0) > SLOW_QUERY_SECONDS:
+            record['query_plan'] = explain_query(platform, query, params)
+        return df
+    return _read_query_chunks(engine, query, params, chunksize, platform)
+
+# Function to read a whole query result from the database, timing the SQL, the fetch and the dataframe creation apart.
+# Results come as Arrow columns through ADBC when it is installed, so rows never become Python objects
+def _read_query(engine, query, params, platform=None):
+    # The ADBC driver binds parameters by position only, the few queries with named ones are small
+    if adbc_sqlite is not None and platform is not None and not params:
+        df = _read_query_arrow(query, platform)
+        if df is not None:
+            return df
+    return _read_query_rows(engine, query, params, platform)
+
+# Function to read a whole query result as Arrow columns, or None when it has to be read row by row instead:
+# the driver types each column from its first rows and stops at a later value of another type, and an empty
+# result has no values to type its columns from
+def _read_query_arrow(query, platform):
+    # A database that cannot be opened is reported by the row path
+    try:
+        con, cursor = _adbc_connect(platform)
+    except adbc_driver_manager.Error:
+        return None
+    try:
+        with stage('execute', platform):
+            cursor.execute(query)
+        with stage('fetch', platform) as record:
+            table = cursor.fetch_arrow_table()
+            record['rows'] = table.num_rows
+    except (OSError, adbc_driver_manager.Error):
+        return None
+    finally:
+        cursor.close()
+        con.close()
+    if table.num_rows == 0:
+        return None
+    with stage('to_dataframe', platform) as record:
+        df = table.to_pandas()
+        record.update(result_size(df))
+    return df
+
+# Function to read a whole query result through SQLAlchemy, one Row object per row
+def _read_query_rows(engine, query, params, platform=None):
+    with engine.connect() as con:
+        with stage('execute', platform):
+            result = con.execute(text(query), params or {})
+        with stage('fetch', platform) as record:
+            rows = result.fetchall()
+            record['rows'] = len(rows)
+        with stage('to_dataframe', platform) as record:
+            df = pd.DataFrame.from_records(rows, columns=list(result.keys()), coerce_float=True)
+            record.update(result_size(df))
+    return df
+
+# Function to stream a query result as dataframes of at most chunksize rows, as Arrow batches when ADBC is installed.
+# When a batch holds a value of another type than the first ones, the stream goes on row by row after the rows already given
+def _read_query_chunks(engine, query, params, chunksize, platform=None):
+    done = 0
+    con = None
+    if adbc_sqlite is not None and platform is not None and not params:
+        try:
+            con, cursor = _adbc_connect(platform, chunksize)
+        except adbc_driver_manager.Error:
+            pass
+    if con is not None:
+        try:
+            cursor.execute(query)
+            batches = cursor.fetch_record_batch()
+            while True:
+                with stage('fetch_chunk', platform) as record:
+                    batch = next(batches, None)
+                    chunk = batch.to_pandas() if batch is not None and batch.num_rows else None
+                    if chunk is not None:
+                        record.update(result_size(chunk))
+                if batch is None and done:
+                    return
+                if batch is None:
+                    # An empty result is read row by row, which gives it its columns
+                    break
+                if chunk is not None:
+                    done += len(chunk)
+                    yield chunk
+        except (OSError, adbc_driver_manager.Error):
+            pass
+        finally:
+            cursor.close()
+            con.close()
+
+    with engine.connect() as con:
+        chunks = pd.read_sql(text(query), con, params=params, chunksize=chunksize)
+        while True:
+            # Only the reading of each chunk is timed, not the work of the caller in between
+            with stage('fetch_chunk', platform) as record:
+                chunk = next(chunks, None)
+                if chunk is not None:
+                    # Rows the Arrow stream already gave are skipped
+                    skipped = min(done, len(chunk))
+                    chunk, done = chunk.iloc[skipped:].reset_index(drop=True), done - skipped
+                    record.update(result_size(chunk))
+            if chunk is None:
+                return
+            if len(chunk) or not skipped:
+                yield chunk
+
+# Function to get the SQLite plan of a query, one line per step
+def explain_query(platform, query, params=None):
+    with get_engine(platform).connect() as con:
+        plan = con.execute(text(f'EXPLAIN QUERY PLAN {query}'), params or {}).fetchall()
+    return [row[-1] for row in plan]
+
+# Function to run one task per platform at the same time and collect the results by platform
+def run_per_platform(tasks, max_workers=MAX_WORKERS, use_processes=False):
+    # SQLite releases the GIL while it runs a query, so threads are enough unless the task is pandas-heavy
+    executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    with executor_class(max_workers=max_workers or len(tasks)) as executor:
+        futures = {platform: executor.submit(task) for platform, task in tasks.items()}
+        return {platform: future.result() for platform, future in futures.items()}
+
+# Function to run one query per platform concurrently and return a single platform-tagged dataframe
+def read_platforms(queries, max_workers=MAX_WORKERS, use_processes=False):
+    tasks = {platform: partial(read_query, platform, query) for platform, query in queries.items()}
+    results = run_per_platform(tasks, max_workers, use_processes)
+    frames = [results[platform].assign(platform=platform) for platform in queries]
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,174 @@
+import argparse
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from instrumentation import instrumented, stage
+from snapshot import load_restaurants, load_table
+from tagging import has_tag
+
+# Directory of the precomputed cube, one Parquet dataset per table partitioned by level
+CUBE_DIR = os.environ.get('CUBE_DIR', 'cube')
+
+# Cell size in degrees of level 0; every next level halves it, so a cell is exactly four cells of the level below
+BASE_CELL_DEGREES = 0.64
+
+# Levels of the cube, level 7 has cells of 0.005 degrees (about 350 x 550 m in Belgium)
+LEVELS = 8
+
+# Category row holding every restaurant of a cell, whatever its categories
+ALL_CATEGORIES = 'All'
+
+# Menu prices are counted in bins of 50 cents between 0 and 100 euros, prices outside land in the edge bins
+PRICE_BIN_CENTS = 50
+PRICE_BINS = 200
+
+# Price quantiles stored on every cube row
+QUANTILES = [0.25, 0.5, 0.75]
+
+# Columns a cube row is keyed by
+CUBE_KEYS = ['level', 'cell_x', 'cell_y', 'platform', 'category']
+
+# Function to give the cell size in degrees of a level
+def cell_size(level):
+    return BASE_CELL_DEGREES / 2 ** level
+
+# Function to find the finest level whose cells still number at most cells_across over the width of an extent
+def level_for_extent(width_degrees, cells_across=64):
+    level = int(np.floor(np.log2(cells_across * BASE_CELL_DEGREES / max(width_degrees, 1e-9))))
+    return min(max(level, 0), LEVELS - 1)
+
+# Function to find the cell of each point at a level; cells are anchored at (0, 0) so every level nests in the one above
+def cell_of(longitudes, latitudes, level):
+    size = cell_size(level)
+    return np.floor(np.asarray(longitudes, dtype=float) / size).astype(np.int64), np.floor(np.asarray(latitudes, dtype=float) / size).astype(np.int64)
+
+# Function to compute quantiles from binned counts, interpolating inside the bin; hist holds keys, 'bin' and 'count'
+def histogram_quantiles(hist, keys, quantiles=QUANTILES):
+    hist = hist.sort_values(keys + ['bin']).reset_index(drop=True)
+    groups = hist.groupby(keys, sort=False, observed=True)['count']
+    after = groups.cumsum()
+    before = after - hist['count']
+    total = groups.transform('sum')
+
+    result = hist[keys].drop_duplicates()
+    for q in quantiles:
+        target = q * total
+        # The bin where the running count first reaches the target holds the quantile
+        hit = (after >= target) & (before < target)
+        price = (hist['bin'] + (target - before) / hist['count']) * PRICE_BIN_CENTS / 100
+        found = hist.loc[hit, keys].assign(**{f'price_p{int(q * 100)}': price[hit]}).drop_duplicates(subset=keys)
+        result = result.merge(found, on=keys, how='left')
+    return result
+
+# Function to load the restaurants with usable coordinates, their categories (plus the 'All' row) and whether they are vegetarian
+@instrumented()
+def fetch_restaurant_categories(platforms=None):
+    restaurants = load_restaurants(columns=['platform', 'restaurant_id', 'latitude', 'longitude', 'delivery_fee', 'tags'], platforms=platforms, valid_coordinates=True)
+    restaurants['is_veg'] = has_tag(restaurants['tags'], 'vegetarian')
+    restaurants = restaurants.drop(columns='tags')
+    categories = load_table('categories', columns=['platform', 'restaurant_id', 'category'], platforms=platforms)
+
+    # Categories are compared across platforms in lower case
+    categories = categories.dropna(subset=['category'])
+    categories = categories.assign(category=categories['category'].astype('string').str.strip().str.lower())
+    categories = categories[['platform', 'restaurant_id', 'category']].drop_duplicates()
+    everything = restaurants[['platform', 'restaurant_id']].assign(category=ALL_CATEGORIES)
+    return restaurants, pd.concat([everything, categories], ignore_index=True)
+
+# Function to count the menu prices of each restaurant per price bin
+@instrumented()
+def fetch_price_bins(platforms=None):
+    items = load_table('menu_items', columns=['platform', 'restaurant_id', 'price_cents'], platforms=platforms).dropna(subset=['price_cents'])
+    bins = np.clip(items['price_cents'].to_numpy(dtype=np.int64) // PRICE_BIN_CENTS, 0, PRICE_BINS - 1)
+    items = pd.DataFrame({'platform': items['platform'].to_numpy(), 'restaurant_id': items['restaurant_id'].to_numpy(), 'bin': bins.astype(np.int16)})
+    return items.groupby(['platform', 'restaurant_id', 'bin'], observed=True).size().rename('count').reset_index()
+
+# Function to aggregate the restaurants of every level into cells x platform x category, with the price histogram of each row
+@instrumented()
+def build_cube_tables(restaurants, categories, price_bins, levels=LEVELS):
+    finest = levels - 1
+    cell_x, cell_y = cell_of(restaurants['longitude'], restaurants['latitude'], finest)
+    restaurants = restaurants.assign(cell_x=cell_x, cell_y=cell_y, delivery_fee=restaurants['delivery_fee'].astype(float),
+                                     fee_count=restaurants['delivery_fee'].notna().astype(np.int64))
+    rows = categories.merge(restaurants, on=['platform', 'restaurant_id'])
+    bins = price_bins.merge(rows[['platform', 'restaurant_id', 'category', 'cell_x', 'cell_y']], on=['platform', 'restaurant_id'])
+
+    cells, histograms = [], []
+    for level in range(levels):
+        with stage('cube_level', level=level):
+            # Coarser cells are the finest ones divided down, the grid being dyadic
+            factor = 2 ** (finest - level)
+            keyed = rows.assign(level=level, cell_x=rows['cell_x'] // factor, cell_y=rows['cell_y'] // factor)
+            cells.append(keyed.groupby(CUBE_KEYS, observed=True).agg(
+                restaurants=('restaurant_id', 'size'), veg_restaurants=('is_veg', 'sum'),
+                delivery_fee_sum=('delivery_fee', 'sum'), delivery_fee_count=('fee_count', 'sum')).reset_index())
+            keyed = bins.assign(level=level, cell_x=bins['cell_x'] // factor, cell_y=bins['cell_y'] // factor)
+            histograms.append(keyed.groupby(CUBE_KEYS + ['bin'], observed=True)['count'].sum().reset_index())
+
+    cells = pd.concat(cells, ignore_index=True)
+    histograms = pd.concat(histograms, ignore_index=True)
+    cells['mean_delivery_fee'] = cells['delivery_fee_sum'] / cells['delivery_fee_count'].where(cells['delivery_fee_count'] > 0)
+    price_items = histograms.groupby(CUBE_KEYS, observed=True)['count'].sum().rename('price_items').reset_index()
+    cells = cells.merge(price_items, on=CUBE_KEYS, how='left')
+    cells['price_items'] = cells['price_items'].fillna(0).astype(np.int64)
+    with stage('cube_quantiles', rows=len(histograms)):
+        cells = cells.merge(histogram_quantiles(histograms, CUBE_KEYS), on=CUBE_KEYS, how='left')
+    return cells, histograms
+
+# Function to build the cube from the canonical tables and write it as Parquet, partitioned by level
+def build_cube(output_dir=CUBE_DIR, platforms=None, levels=LEVELS):
+    restaurants, categories = fetch_restaurant_categories(platforms)
+    cells, histograms = build_cube_tables(restaurants, categories, fetch_price_bins(platforms), levels)
+    if os.path.isdir(output_dir):
+        shutil.rmtree(output_dir)
+    for name, df in [('cells', cells), ('price_histogram', histograms)]:
+        df.to_parquet(os.path.join(output_dir, name), engine='pyarrow', partition_cols=['level'], index=False)
+    print(f"Wrote {len(cells)} cube rows over {levels} levels to {output_dir}")
+    return cells, histograms
+
+# Function to read the rows of a cube table at one level inside bounds (min_lon, min_lat, max_lon, max_lat)
+def _read_cube(name, level, bounds=None, platforms=None, categories=None, cube_dir=CUBE_DIR):
+    filters = [('level', '=', level)]
+    if bounds is not None:
+        (x_min, x_max), (y_min, y_max) = cell_of([bounds[0], bounds[2]], [bounds[1], bounds[3]], level)
+        filters += [('cell_x', '>=', int(x_min)), ('cell_x', '<=', int(x_max)), ('cell_y', '>=', int(y_min)), ('cell_y', '<=', int(y_max))]
+    if platforms is not None:
+        filters.append(('platform', 'in', list(platforms)))
+    if categories is not None:
+        filters.append(('category', 'in', list(categories)))
+    df = pd.read_parquet(os.path.join(cube_dir, name), engine='pyarrow', filters=filters)
+    df['level'] = level
+    return df
+
+# Function to read the cube cells covering an area at a level, by default the level fitting the width of the area
+def query_cells(bounds, level=None, platforms=None, categories=(ALL_CATEGORIES,), cube_dir=CUBE_DIR):
+    level = level_for_extent(bounds[2] - bounds[0]) if level is None else level
+    return _read_cube('cells', level, bounds, platforms, categories, cube_dir)
+
+# Function to total an area per platform and category: counts, mean delivery fee and price quantiles merged from the cell histograms
+def summarize_area(bounds, level=None, platforms=None, categories=(ALL_CATEGORIES,), cube_dir=CUBE_DIR):
+    level = level_for_extent(bounds[2] - bounds[0]) if level is None else level
+    cells = _read_cube('cells', level, bounds, platforms, categories, cube_dir)
+    keys = ['platform', 'category']
+    summary = cells.groupby(keys, observed=True)[['restaurants', 'veg_restaurants', 'delivery_fee_sum', 'delivery_fee_count', 'price_items']].sum().reset_index()
+    summary['mean_delivery_fee'] = summary['delivery_fee_sum'] / summary['delivery_fee_count'].where(summary['delivery_fee_count'] > 0)
+
+    histograms = _read_cube('price_histogram', level, bounds, platforms, categories, cube_dir)
+    histograms = histograms.groupby(keys + ['bin'], observed=True)['count'].sum().reset_index()
+    if len(histograms):
+        summary = summary.merge(histogram_quantiles(histograms, keys), on=keys, how='left')
+    return summary.drop(columns=['delivery_fee_sum', 'delivery_fee_count'])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build the multi-resolution grid cube, or summarize an area from it')
+    parser.add_argument('--output', default=CUBE_DIR, help='directory of the cube')
+    parser.add_argument('--platforms', nargs='*', help='platforms to include (default: all)')
+    parser.add_argument('--bounds', nargs=4, type=float, metavar=('MIN_LON', 'MIN_LAT', 'MAX_LON', 'MAX_LAT'), help='summarize this area from the built cube')
+    parser.add_argument('--level', type=int, help='level to summarize at (default: from the width of the area)')
+    parser.add_argument('--categories', nargs='*', default=[ALL_CATEGORIES], help='categories to summarize')
+    args = parser.parse_args()
+    if args.bounds:
+        print(summarize_area(args.bounds, args.level, args.platforms, args.categories, args.output).to_string(index=False))
+    else:
+        build_cube(args.output, args.platforms)
@@ -0,0 +1,216 @@
+import argparse
+import os
+from sqlalchemy import create_engine, text
+import numpy as np
+import pandas as pd
+from database import DATABASES, read_query
+from price_stats import histogram_bins, new_sketch
+from snapshot import CANONICAL_QUERIES, to_canonical
+from tagging import TAG_KEYS, TAGS, count_tags, has_tag, restaurant_tags, tag_texts
+
+# SQLite file holding the per-restaurant fingerprints and the persisted aggregates
+STATE_DB = os.environ.get('INCREMENTAL_STATE_DB', 'state/incremental.db')
+
+# Restaurants whose menus are fetched per query
+ID_BATCH_SIZE = 500
+
+# Character between the menu rows of a restaurant when they are joined to be hashed (ASCII record separator)
+MENU_ROW_SEPARATOR = '\x1e'
+
+STATE_SCHEMA = [
+    # One row per restaurant seen in the last refresh, with what it contributed to the aggregates
+    """CREATE TABLE IF NOT EXISTS restaurant_state (
+        platform TEXT, restaurant_id TEXT, row_hash TEXT, province TEXT,
+        latitude REAL, longitude REAL, is_veg INTEGER, has_kapsalon INTEGER,
+        price_count INTEGER, price_total REAL, price_total_sq REAL, price_min REAL, price_max REAL,
+        PRIMARY KEY (platform, restaurant_id))""",
+    # Histogram bins of the menu prices of each restaurant, so they can be taken out again
+    """CREATE TABLE IF NOT EXISTS restaurant_price_bins (
+        platform TEXT, restaurant_id TEXT, bin INTEGER, count INTEGER,
+        PRIMARY KEY (platform, restaurant_id, bin))""",
+    """CREATE TABLE IF NOT EXISTS province_counts (
+        platform TEXT, province TEXT, restaurant_count INTEGER,
+        PRIMARY KEY (platform, province))""",
+    """CREATE TABLE IF NOT EXISTS price_histogram (
+        platform TEXT, bin INTEGER, count INTEGER,
+        PRIMARY KEY (platform, bin))""",
+]
+
+# Function to open the state database, creating its tables on first use
+def get_state_engine(state_db=STATE_DB):
+    os.makedirs(os.path.dirname(state_db) or '.', exist_ok=True)
+    engine = create_engine(f'sqlite:///{state_db}')
+    with engine.begin() as con:
+        for statement in STATE_SCHEMA:
+            con.execute(text(statement))
+    return engine
+
+# Function to fingerprint every restaurant of a platform from its row, its categories and a hash of every row of its menu
+def current_fingerprints(platform):
+    restaurants = to_canonical('restaurants', read_query(platform, CANONICAL_QUERIES['restaurants'][platform], use_cache=False), platform)
+
+    # The menu rows are joined inside SQLite, one row per restaurant comes back; quote() keeps NULLs and separators unambiguous
+    menus = read_query(platform, f"""
+        SELECT restaurant_id, group_concat(quote(item_id) || ',' || quote(name) || ',' || quote(description) || ',' || quote(price), char({ord(MENU_ROW_SEPARATOR)})) AS menu
+        FROM ({CANONICAL_QUERIES['menu_items'][platform]})
+        GROUP BY restaurant_id
+    """, use_cache=False)
+    menus['restaurant_id'] = menus['restaurant_id'].astype('string')
+    # SQLite concatenates in no set order, so the rows are sorted before the menu is hashed
+    menus['menu'] = menus['menu'].astype('string').str.split(MENU_ROW_SEPARATOR).map(lambda rows: MENU_ROW_SEPARATOR.join(sorted(rows)))
+    menus['menu'] = pd.util.hash_pandas_object(menus['menu'], index=False).map('{:016x}'.format)
+
+    categories = to_canonical('categories', read_query(platform, CANONICAL_QUERIES['categories'][platform], use_cache=False), platform)
+    category_summary = categories.sort_values('category').groupby('restaurant_id').agg(
+        categories=('category', lambda c: '|'.join(c.dropna()))).reset_index()
+
+    df = restaurants.merge(menus, on='restaurant_id', how='left').merge(category_summary, on='restaurant_id', how='left')
+    hashed = df.drop(columns=['platform', 'region'], errors='ignore').astype('string')
+    df['row_hash'] = pd.util.hash_pandas_object(hashed, index=False).map('{:016x}'.format)
+    # The tags of the categories are combined with those of the menu once the menus of the changed restaurants are fetched
+    return df.merge(count_tags(categories), on=TAG_KEYS, how='left')
+
+# Function to fetch the menu prices and names of a set of restaurants
+def fetch_menus(platform, restaurant_ids):
+    frames = []
+    for start in range(0, len(restaurant_ids), ID_BATCH_SIZE):
+        batch = list(restaurant_ids[start:start + ID_BATCH_SIZE])
+        placeholders = ', '.join(f':id{i}' for i in range(len(batch)))
+        frames.append(read_query(platform, f"""
+            SELECT restaurant_id, name, price
+            FROM ({CANONICAL_QUERIES['menu_items'][platform]})
+            WHERE restaurant_id IN ({placeholders})
+        """, params={f'id{i}': restaurant_id for i, restaurant_id in enumerate(batch)}, use_cache=False))
+    if not frames:
+        return pd.DataFrame(columns=['restaurant_id', 'name', 'price'])
+    menus = pd.concat(frames, ignore_index=True)
+    menus['restaurant_id'] = menus['restaurant_id'].astype('string')
+    menus['price'] = pd.to_numeric(menus['price'], errors='coerce')
+    return menus
+
+# Function to compute what each changed restaurant contributes to the aggregates
+def contributions(platform, changed):
+    menus = fetch_menus(platform, changed['restaurant_id'].tolist())
+    prices = menus.dropna(subset=['price']).assign(price_sq=lambda df: df['price'] ** 2)
+
+    moments = prices.groupby('restaurant_id').agg(
+        price_count=('price', 'count'), price_total=('price', 'sum'), price_total_sq=('price_sq', 'sum'),
+        price_min=('price', 'min'), price_max=('price', 'max'))
+    menus['platform'] = platform
+    menus['tags'] = tag_texts(menus['name'])
+    category_counts = changed[TAG_KEYS + list(TAGS) + ['rows']].dropna(subset=['rows'])
+    tags = restaurant_tags(category_counts, count_tags(menus)).set_index('restaurant_id')['tags']
+
+    state = changed[['restaurant_id', 'row_hash', 'province', 'latitude', 'longitude']].copy()
+    state = state.merge(moments, left_on='restaurant_id', right_index=True, how='left')
+    restaurant_tag_bits = state['restaurant_id'].map(tags).fillna(0).astype(np.uint32)
+    state['is_veg'] = has_tag(restaurant_tag_bits, 'vegetarian').astype(int)
+    state['has_kapsalon'] = has_tag(restaurant_tag_bits, 'kapsalon').astype(int)
+    state['price_count'] = state['price_count'].fillna(0).astype(int)
+    state[['price_total', 'price_total_sq']] = state[['price_total', 'price_total_sq']].fillna(0.0)
+    state['platform'] = platform
+
+    bins = pd.DataFrame({'restaurant_id': prices['restaurant_id'].to_numpy(), 'bin': histogram_bins(prices['price'].to_numpy(dtype=float))})
+    bins = bins.groupby(['restaurant_id', 'bin']).size().rename('count').reset_index()
+    bins['platform'] = platform
+    return state, bins
+
+# Function to add (sign=1) or remove (sign=-1) restaurants from the persisted aggregates
+def apply_to_aggregates(con, platform, state, bins, sign):
+    provinces = state.groupby('province', observed=True).size()
+    for province, count in provinces.items():
+        con.execute(text("""
+            INSERT INTO province_counts (platform, province, restaurant_count) VALUES (:platform, :province, :count)
+            ON CONFLICT (platform, province) DO UPDATE SET restaurant_count = restaurant_count + excluded.restaurant_count
+        """), {'platform': platform, 'province': province, 'count': sign * int(count)})
+
+    histogram = bins.groupby('bin')['count'].sum()
+    if len(histogram):
+        con.execute(text("""
+            INSERT INTO price_histogram (platform, bin, count) VALUES (:platform, :bin, :count)
+            ON CONFLICT (platform, bin) DO UPDATE SET count = count + excluded.count
+        """), [{'platform': platform, 'bin': int(b), 'count': sign * int(c)} for b, c in histogram.items()])
+
+# Function to bring the aggregates of one platform up to date with its database
+def refresh_platform(platform, engine):
+    current = current_fingerprints(platform)
+    with engine.connect() as con:
+        previous = pd.read_sql(text('SELECT restaurant_id, row_hash FROM restaurant_state WHERE platform = :platform'), con, params={'platform': platform})
+
+    merged = current[['restaurant_id', 'row_hash']].merge(previous, on='restaurant_id', how='outer', suffixes=('', '_previous'), indicator=True)
+    inserted = merged.loc[merged['_merge'] == 'left_only', 'restaurant_id']
+    deleted = merged.loc[merged['_merge'] == 'right_only', 'restaurant_id']
+    updated = merged.loc[(merged['_merge'] == 'both') & (merged['row_hash'] != merged['row_hash_previous']), 'restaurant_id']
+
+    stale_ids = pd.concat([deleted, updated]).tolist()
+    fresh = current[current['restaurant_id'].isin(pd.concat([inserted, updated]))]
+    new_state, new_bins = contributions(platform, fresh)
+
+    with engine.begin() as con:
+        # Take the old contributions of deleted and updated restaurants out ...
+        for start in range(0, len(stale_ids), ID_BATCH_SIZE):
+            batch = stale_ids[start:start + ID_BATCH_SIZE]
+            params = {'platform': platform, **{f'id{i}': restaurant_id for i, restaurant_id in enumerate(batch)}}
+            where = f"platform = :platform AND restaurant_id IN ({', '.join(f':id{i}' for i in range(len(batch)))})"
+            old_state = pd.read_sql(text(f'SELECT * FROM restaurant_state WHERE {where}'), con, params=params)
+            old_bins = pd.read_sql(text(f'SELECT * FROM restaurant_price_bins WHERE {where}'), con, params=params)
+            apply_to_aggregates(con, platform, old_state, old_bins, sign=-1)
+            con.execute(text(f'DELETE FROM restaurant_state WHERE {where}'), params)
+            con.execute(text(f'DELETE FROM restaurant_price_bins WHERE {where}'), params)
+
+        # ... and put the new ones of inserted and updated restaurants in
+        apply_to_aggregates(con, platform, new_state, new_bins, sign=1)
+        new_state.to_sql('restaurant_state', con, if_exists='append', index=False)
+        new_bins.to_sql('restaurant_price_bins', con, if_exists='append', index=False)
+
+    return {'platform': platform, 'inserted': len(inserted), 'updated': len(updated), 'deleted': len(deleted)}
+
+# Function to refresh the aggregates of all platforms, processing only the restaurants that changed
+def refresh(platforms=None, state_db=STATE_DB):
+    engine = get_state_engine(state_db)
+    summary = pd.DataFrame([refresh_platform(platform, engine) for platform in platforms or DATABASES])
+    engine.dispose()
+    return summary
+
+# Function to read the persisted restaurant count per province and platform
+def load_province_counts(state_db=STATE_DB):
+    engine = get_state_engine(state_db)
+    with engine.connect() as con:
+        return pd.read_sql(text('SELECT platform, province, restaurant_count FROM province_counts WHERE restaurant_count > 0'), con)
+
+# Function to rebuild the price sketch of a platform (see price_stats.py) from the persisted aggregates
+def load_price_sketch(platform, state_db=STATE_DB):
+    engine = get_state_engine(state_db)
+    with engine.connect() as con:
+        moments = con.execute(text("""
+            SELECT TOTAL(price_count), TOTAL(price_total), TOTAL(price_total_sq), MIN(price_min), MAX(price_max)
+            FROM restaurant_state WHERE platform = :platform
+        """), {'platform': platform}).fetchone()
+        histogram = pd.read_sql(text('SELECT bin, count FROM price_histogram WHERE platform = :platform'), con, params={'platform': platform})
+
+    sketch = new_sketch()
+    count, total, total_sq, price_min, price_max = moments
+    if count:
+        sketch.update({
+            'count': int(count),
+            'mean': total / count,
+            'm2': max(total_sq - total ** 2 / count, 0.0),
+            'min': price_min,
+            'max': price_max,
+        })
+        np.add.at(sketch['histogram'], histogram['bin'].to_numpy(dtype=np.int64), histogram['count'].to_numpy(dtype=np.int64))
+    return sketch
+
+# Function to read the locations of the restaurants flagged vegetarian or selling kapsalons
+def load_locations(flag, state_db=STATE_DB):
+    column = {'veg': 'is_veg', 'kapsalon': 'has_kapsalon'}[flag]
+    engine = get_state_engine(state_db)
+    with engine.connect() as con:
+        return pd.read_sql(text(f'SELECT platform, restaurant_id, latitude, longitude FROM restaurant_state WHERE {column} = 1'), con)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Update the persisted aggregates with the restaurants changed since the last run')
+    parser.add_argument('--platforms', nargs='*', help='platforms to refresh (default: all)')
+    parser.add_argument('--state-db', default=STATE_DB, help='SQLite file holding the incremental state')
+    args = parser.parse_args()
+    print(refresh(args.platforms, args.state_db).to_string(index=False))
@@ -0,0 +1,167 @@
+import atexit
+from contextlib import contextmanager
+import functools
+import inspect
+import itertools
+import json
+import os
+import threading
+import time
+import pandas as pd
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, peak RSS is then left out
+    resource = None
+
+# Set PIPELINE_PROFILE=1 to record every stage and write the profile when the script exits
+PROFILING = os.environ.get('PIPELINE_PROFILE', '') == '1'
+
+# Directory the JSON profile and the trace are written to
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+
+# Queries slower than this get their EXPLAIN QUERY PLAN attached to the profile
+SLOW_QUERY_SECONDS = float(os.environ.get('SLOW_QUERY_SECONDS', 1.0))
+
+# Recorded stages of this process, and the clock they are measured against
+_events = []
+_lock = threading.Lock()
+_origin = time.perf_counter()
+_local = threading.local()
+
+# Numbers the profiles a process writes, so a pool worker running several tasks does not overwrite its own
+_profile_numbers = itertools.count(1)
+
+# Function to turn profiling on or off from code, e.g. in a notebook
+def enable_profiling(enabled=True):
+    global PROFILING
+    PROFILING = enabled
+
+# Function to read the peak resident memory of the process since it started in MB
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 1024 ** 2 if os.uname().sysname == 'Darwin' else peak / 1024
+
+# Function to measure the rows and bytes of a stage result; deep=False keeps it cheap on text columns
+def result_size(result):
+    if isinstance(result, pd.DataFrame):
+        return {'rows': len(result), 'bytes': int(result.memory_usage(index=True, deep=False).sum())}
+    if isinstance(result, pd.Series):
+        return {'rows': len(result), 'bytes': int(result.memory_usage(index=True, deep=False))}
+    return {}
+
+# Context manager recording the wall time of a stage and how much it raised the peak RSS of the process;
+# the yielded dict takes extra fields like rows
+@contextmanager
+def stage(name, platform=None, **fields):
+    if not PROFILING:
+        yield {}
+        return
+
+    record = {'stage': name, 'platform': platform, **fields}
+    # Stages started inside this one are its children in the trace
+    depth = getattr(_local, 'depth', 0)
+    _local.depth = depth + 1
+    peak_at_start = peak_rss_mb()
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        end = time.perf_counter()
+        _local.depth = depth
+        process_peak = peak_rss_mb()
+        record.update({
+            'start_s': start - _origin,
+            'wall_s': end - start,
+            # The peak only ever grows, a stage staying below an earlier peak raised it by 0
+            'rss_growth_mb': process_peak - peak_at_start if process_peak is not None else None,
+            'process_peak_rss_mb': process_peak,
+            'depth': depth,
+            'pid': os.getpid(),
+            'thread': threading.get_ident(),
+        })
+        with _lock:
+            _events.append(record)
+
+# Decorator recording every call of a function as a stage, with the platform argument and the size of the result
+def instrumented(name=None):
+    def decorator(function):
+        stage_name = name or function.__name__
+        signature = inspect.signature(function)
+        takes_platform = 'platform' in signature.parameters
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not PROFILING:
+                return function(*args, **kwargs)
+            platform = signature.bind_partial(*args, **kwargs).arguments.get('platform') if takes_platform else None
+            with stage(stage_name, platform) as record:
+                result = function(*args, **kwargs)
+                record.update(result_size(result))
+            return result
+        return wrapper
+    return decorator
+
+# Function to total the recorded stages per stage and platform
+def summarize(events=None):
+    events = _events if events is None else events
+    if not events:
+        return pd.DataFrame(columns=['stage', 'platform', 'calls', 'wall_s', 'rows', 'bytes', 'rss_growth_mb', 'process_peak_rss_mb'])
+    df = pd.DataFrame(events)
+    for column in ['rows', 'bytes']:
+        if column not in df:
+            df[column] = 0
+    df['platform'] = df['platform'].fillna('')
+    summary = df.groupby(['stage', 'platform']).agg(
+        calls=('wall_s', 'size'), wall_s=('wall_s', 'sum'), rows=('rows', 'sum'), bytes=('bytes', 'sum'),
+        rss_growth_mb=('rss_growth_mb', 'max'), process_peak_rss_mb=('process_peak_rss_mb', 'max'))
+    return summary.reset_index().sort_values('wall_s', ascending=False)
+
+# Function to turn the recorded stages into Chrome trace events, readable by Perfetto, chrome://tracing or speedscope as a flame graph
+def trace_events(events=None):
+    events = _events if events is None else events
+    trace = []
+    for event in events:
+        args = {key: value for key, value in event.items() if key not in ('stage', 'start_s', 'wall_s', 'pid', 'thread', 'depth')}
+        trace.append({
+            'name': event['stage'] if not event.get('platform') else f"{event['stage']} [{event['platform']}]",
+            'cat': event.get('platform') or 'pipeline',
+            'ph': 'X',
+            'ts': event['start_s'] * 1e6,
+            'dur': event['wall_s'] * 1e6,
+            'pid': event['pid'],
+            'tid': event['thread'],
+            'args': args,
+        })
+    return trace
+
+# Function to write the recorded stages as JSON (events plus per-stage summary) and optionally as a Chrome trace
+def write_profile(profile_dir=PROFILE_DIR, trace=True):
+    if not _events:
+        return None
+    os.makedirs(profile_dir, exist_ok=True)
+    stamp = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_profile_numbers)}"
+    with _lock:
+        events = list(_events)
+
+    path = os.path.join(profile_dir, f'profile-{stamp}.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'events': events, 'summary': summarize(events).to_dict(orient='records')}, f, indent=2, default=str)
+    if trace:
+        with open(os.path.join(profile_dir, f'trace-{stamp}.json'), 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': trace_events(events), 'displayTimeUnit': 'ms'}, f, default=str)
+    return path
+
+# Function to forget the recorded stages, e.g. after writing them
+def reset_profile():
+    with _lock:
+        _events.clear()
+
+@atexit.register
+def _write_profile_at_exit():
+    if PROFILING and _events:
+        print(f"Wrote pipeline profile to {write_profile()}")
@@ -0,0 +1,61 @@
+import matplotlib.pyplot as plt
+import pandas as pd
+from instrumentation import instrumented
+from platforms import PLATFORMS
+from menu_search import search_menu
+from regions import load_regions
+from rendering import MAP_EXTENT, platform_panels, plot_points
+from snapshot import load_restaurants
+
+# Dish mapped by this script
+KAPSALON_TERM = 'kapsalon'
+
+# Function to fetch the kapsalons on the menus of all platforms with the location of their restaurant
+@instrumented()
+def fetch_kapsalons():
+    items = search_menu(KAPSALON_TERM)[['platform', 'restaurant_id', 'price']]
+    items['restaurant_id'] = items['restaurant_id'].astype('string')
+    items['price'] = pd.to_numeric(items['price'], errors='coerce')
+    restaurants = load_restaurants(columns=['platform', 'restaurant_id', 'latitude', 'longitude'], valid_coordinates=True)
+    return items.merge(restaurants, on=['platform', 'restaurant_id'], how='left')
+
+# Function to plot the kapsalon restaurants of each platform and of all of them, titled with the average kapsalon price
+@instrumented()
+def plot_kapsalon_grid(kapsalons, platforms=None):
+    # Load the Belgium region boundaries, already reprojected to EPSG:4326 (WGS84) and simplified for a country map
+    region = load_regions(zoom='country')
+
+    platforms = list(platforms or PLATFORMS)
+    fig, axs = platform_panels(platforms)
+    panels = [(platform, kapsalons[kapsalons['platform'] == platform]) for platform in platforms]
+    panels.append(('All', kapsalons))
+
+    for ax, (platform, df) in zip(axs, panels):
+        region.plot(ax=ax, color='lightgray', edgecolor='black')
+
+        # One point per restaurant, however many kapsalons it sells
+        locations = df.drop_duplicates(subset=['platform', 'restaurant_id']).dropna(subset=['latitude', 'longitude'])
+        if platform == 'All':
+            for name in platforms:
+                plot_points(ax, locations[locations['platform'] == name], color=PLATFORMS[name]['color'], alpha=0.6)
+            title = f"All Kapsalons Restaurants, avg. {df['price'].mean():.2f} €"
+        else:
+            plot_points(ax, locations, color=PLATFORMS[platform]['color'])
+            title = f"{platform} Kapsalons, avg. {df['price'].mean():.2f} €"
+
+        ax.set_xlim(MAP_EXTENT[0], MAP_EXTENT[1])
+        ax.set_ylim(MAP_EXTENT[2], MAP_EXTENT[3])
+        ax.set_xlabel('Longitude')
+        ax.set_ylabel('Latitude')
+        ax.set_title(title)
+
+    plt.tight_layout()
+    return fig
+
+# Main function to fetch the kapsalons and show where they are sold
+def main():
+    plot_kapsalon_grid(fetch_kapsalons())
+    plt.show()
+
+if __name__ == "__main__":
+    main()
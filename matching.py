@@ -0,0 +1,155 @@
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix, csr_matrix
+from scipy.sparse.csgraph import connected_components
+from sklearn.feature_extraction.text import TfidfVectorizer
+from instrumentation import instrumented
+from snapshot import load_restaurants
+
+# Size of the blocking grid cells in degrees (about 1 km), pairs are only compared within neighbouring cells
+BLOCK_CELL_SIZE = 0.01
+
+# Two restaurants match when their names are this similar (cosine of character trigrams) ...
+NAME_THRESHOLD = 0.75
+
+# ... and they are at most this far apart
+MAX_DISTANCE_KM = 0.3
+
+# Restaurants without coordinates are only compared within their postal code, with a stricter name threshold
+POSTAL_CODE_NAME_THRESHOLD = 0.9
+
+# Words that say nothing about which restaurant it is
+STOP_WORDS = ['restaurant', 'resto', 'snack', 'the', 'le', 'la', 'de', 'het']
+
+# Function to normalize restaurant names: lowercase, no accents, no punctuation, no filler words
+def normalize_names(names):
+    names = names.astype('string').fillna('').str.lower()
+    names = names.str.normalize('NFKD').str.encode('ascii', errors='ignore').str.decode('ascii')
+    names = names.str.replace(r'[^a-z0-9]+', ' ', regex=True)
+    names = names.str.replace(r'\b(?:' + '|'.join(STOP_WORDS) + r')\b', ' ', regex=True)
+    return names.str.replace(r'\s+', ' ', regex=True).str.strip()
+
+# Function to compute the distance in km between two arrays of coordinates
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371.0 * np.arcsin(np.sqrt(a))
+
+# Function to list candidate pairs of restaurants from different platforms in neighbouring grid cells
+def block_by_cell(restaurants, cell_size=BLOCK_CELL_SIZE):
+    located = restaurants.dropna(subset=['latitude', 'longitude'])
+    cells = pd.DataFrame({
+        'left': located.index,
+        'cell_x': np.floor(located['longitude'].to_numpy() / cell_size).astype(np.int64),
+        'cell_y': np.floor(located['latitude'].to_numpy() / cell_size).astype(np.int64),
+    })
+
+    # Each restaurant is also looked up in the eight cells around its own
+    neighbours = []
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            neighbours.append(pd.DataFrame({'right': cells['left'], 'cell_x': cells['cell_x'] + dx, 'cell_y': cells['cell_y'] + dy}))
+    neighbours = pd.concat(neighbours, ignore_index=True)
+
+    pairs = cells.merge(neighbours, on=['cell_x', 'cell_y'])[['left', 'right']]
+    return _cross_platform(pairs, restaurants)
+
+# Function to list candidate pairs of restaurants from different platforms without coordinates but with the same postal code
+def block_by_postal_code(restaurants):
+    unlocated = restaurants[restaurants['latitude'].isna() | restaurants['longitude'].isna()]
+    left = pd.DataFrame({'left': unlocated.index, 'postal_code': unlocated['postal_code'].to_numpy()}).dropna()
+    right = pd.DataFrame({'right': restaurants.index, 'postal_code': restaurants['postal_code'].to_numpy()}).dropna()
+    pairs = left.merge(right, on='postal_code')[['left', 'right']]
+    return _cross_platform(pairs, restaurants)
+
+# Function to keep each pair of restaurants from two different platforms once
+def _cross_platform(pairs, restaurants):
+    platforms = restaurants['platform'].to_numpy()
+    left_platform = platforms[pairs['left'].to_numpy()]
+    right_platform = platforms[pairs['right'].to_numpy()]
+    return pairs[left_platform < right_platform].drop_duplicates().reset_index(drop=True)
+
+# Function to score candidate pairs on name similarity and distance
+def score_pairs(pairs, restaurants, name_vectors):
+    left = pairs['left'].to_numpy()
+    right = pairs['right'].to_numpy()
+
+    # Rows are L2-normalized, so the row-wise dot product is the cosine similarity
+    similarity = np.asarray(name_vectors[left].multiply(name_vectors[right]).sum(axis=1)).ravel()
+    latitudes = restaurants['latitude'].to_numpy(dtype=float, na_value=np.nan)
+    longitudes = restaurants['longitude'].to_numpy(dtype=float, na_value=np.nan)
+    distance = haversine_km(latitudes[left], longitudes[left], latitudes[right], longitudes[right])
+
+    return pairs.assign(name_similarity=similarity, distance_km=distance)
+
+# Function to find the representative of a row in a union-find forest, shortening the path on the way
+def _find(parent, row):
+    while parent[row] != row:
+        parent[row] = parent[parent[row]]
+        row = parent[row]
+    return row
+
+# Function to split the components holding several listings of one platform, which a chain of matches (A~B~C) can join.
+# Their pairs are merged again best first, skipping every merge that would put two listings of a platform together
+def split_conflicts(components, matches, platforms):
+    codes = pd.factorize(platforms)[0]
+    keys = pd.DataFrame({'component': components, 'platform': codes})
+    conflicting = keys.loc[keys.duplicated(), 'component'].unique()
+    if len(conflicting) == 0:
+        return components
+
+    in_conflict = np.isin(components, conflicting)
+    pairs = matches[in_conflict[matches['left'].to_numpy()]]
+    pairs = pairs.sort_values(['name_similarity', 'distance_km'], ascending=[False, True], na_position='last')
+    parent = {row: row for row in np.flatnonzero(in_conflict)}
+    listed_on = {row: {codes[row]} for row in parent}
+    for left, right in zip(pairs['left'], pairs['right']):
+        left, right = _find(parent, left), _find(parent, right)
+        if left != right and not listed_on[left] & listed_on[right]:
+            parent[right] = left
+            listed_on[left] |= listed_on.pop(right)
+
+    # Split rows take new ids past the existing ones, then the ids are made consecutive again
+    components = components.copy()
+    offset = components.max() + 1
+    for row in parent:
+        components[row] = offset + _find(parent, row)
+    return pd.factorize(components)[0]
+
+# Function to give every restaurant a canonical id shared by its listings on the other platforms
+@instrumented()
+def match_restaurants(restaurants=None):
+    if restaurants is None:
+        restaurants = load_restaurants(columns=['platform', 'restaurant_id', 'name', 'postal_code', 'latitude', 'longitude', 'coordinate_issue'])
+    restaurants = restaurants.reset_index(drop=True)
+    # Rows whose coordinates were rejected on load are matched like the ones without coordinates
+    if 'coordinate_issue' in restaurants:
+        restaurants.loc[restaurants['coordinate_issue'].notna(), ['latitude', 'longitude']] = np.nan
+    names = normalize_names(restaurants['name'])
+
+    names = names.fillna('')
+    if names.str.len().gt(0).any():
+        vectorizer = TfidfVectorizer(analyzer='char_wb', ngram_range=(3, 3), dtype=np.float32)
+        name_vectors = vectorizer.fit_transform(names).tocsr()
+    else:
+        # Without a single name there is no vocabulary to fit, and no pair can be similar
+        name_vectors = csr_matrix((len(names), 1), dtype=np.float32)
+
+    located = score_pairs(block_by_cell(restaurants), restaurants, name_vectors)
+    located = located[(located['name_similarity'] >= NAME_THRESHOLD) & (located['distance_km'] <= MAX_DISTANCE_KM)]
+    unlocated = score_pairs(block_by_postal_code(restaurants), restaurants, name_vectors)
+    unlocated = unlocated[unlocated['name_similarity'] >= POSTAL_CODE_NAME_THRESHOLD]
+    matches = pd.concat([located, unlocated], ignore_index=True)
+
+    # Listings linked by a chain of matches form one restaurant, with at most one listing per platform
+    n = len(restaurants)
+    graph = coo_matrix((np.ones(len(matches)), (matches['left'], matches['right'])), shape=(n, n))
+    _, components = connected_components(graph, directed=False)
+    components = split_conflicts(components, matches, restaurants['platform'])
+
+    return pd.DataFrame({
+        'platform': restaurants['platform'],
+        'restaurant_id': restaurants['restaurant_id'],
+        'name': restaurants['name'],
+        'canonical_id': components,
+    })
@@ -0,0 +1,126 @@
+from functools import partial
+import re
+from sqlalchemy import create_engine, text
+import pandas as pd
+from database import DATABASES, dispose_engines, read_query, run_per_platform
+from platforms import CANONICAL_COLUMNS
+from snapshot import CANONICAL_QUERIES
+
+# Columns every search returns, whether it runs on the index or on the tables
+SEARCH_COLUMNS = ['restaurant_id', 'item_id', 'name', 'description', 'category', 'price']
+
+# Letters that come with accents in the scraped names (é, è, ü, ç, ñ, ...), folded away by the index
+ACCENTED_LETTERS = set('aceinouy')
+
+# Platforms whose missing index has been reported already
+_reported_missing = set()
+
+# Full-text index over menu items and restaurant categories; unicode61 folds case and strips accents
+CREATE_MENU_SEARCH = """
+    CREATE VIRTUAL TABLE menu_search USING fts5(
+        kind UNINDEXED,
+        restaurant_id UNINDEXED,
+        item_id UNINDEXED,
+        price UNINDEXED,
+        name,
+        description,
+        category,
+        tokenize = "unicode61 remove_diacritics 2",
+        prefix = '3 4'
+    )
+"""
+
+# Function to fill the menu_search index of a platform database from its canonical menu items and categories
+def build_menu_search(platform):
+    engine = create_engine(f'sqlite:///{DATABASES[platform]}')
+    with engine.begin() as con:
+        con.execute(text('DROP TABLE IF EXISTS menu_search'))
+        con.execute(text(CREATE_MENU_SEARCH))
+        con.execute(text(f"""
+            INSERT INTO menu_search (kind, restaurant_id, item_id, price, name, description, category)
+            SELECT 'item', restaurant_id, item_id, price, name, description, NULL
+            FROM ({CANONICAL_QUERIES['menu_items'][platform]})
+        """))
+        con.execute(text(f"""
+            INSERT INTO menu_search (kind, restaurant_id, item_id, price, name, description, category)
+            SELECT 'category', restaurant_id, NULL, NULL, NULL, NULL, category
+            FROM ({CANONICAL_QUERIES['categories'][platform]})
+        """))
+        con.execute(text("INSERT INTO menu_search (menu_search) VALUES ('optimize')"))
+    engine.dispose()
+    # The read-only engines open the files as immutable, so they must not keep serving the old pages
+    dispose_engines()
+
+# Function to check whether a platform database has the menu_search index
+def has_menu_search(platform):
+    tables = read_query(platform, "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'menu_search'")
+    return not tables.empty
+
+# Function to turn a search term into an FTS5 query on one column, matching words that start with the term
+def fts_query(term, column):
+    phrase = '"' + term.replace('"', '""') + '"'
+    return f'{{{column}}} : {phrase}*'
+
+# Function to fold case and accents like the unicode61 tokenizer with remove_diacritics 2
+def fold_text(texts):
+    texts = texts.astype('string').fillna('').str.normalize('NFKD')
+    return texts.str.replace(r'[\u0300-\u036f]', '', regex=True).str.lower()
+
+# Function to split a term into the words the tokenizer sees: runs of letters and digits
+def term_words(term):
+    return [word for word in re.split(r'[\W_]+', fold_text(pd.Series([term])).iloc[0]) if word]
+
+# Function to build a LIKE pattern finding every text a term can match, and more: letters that may carry an accent
+# in the text (or be written without one) match any character, the exact check is done on the rows it returns
+def like_pattern(term):
+    words = [''.join('_' if char in ACCENTED_LETTERS else char for char in word) for word in term_words(term)]
+    return '%' + '%'.join(words) + '%'
+
+# Function to flag the texts matching a term like the FTS phrase query: its words in a row, the last one as a prefix
+def matches_term(texts, term):
+    words = term_words(term)
+    if not words:
+        return pd.Series(False, index=texts.index)
+    pattern = r'(?:^|[\W_])' + r'[\W_]+'.join(re.escape(word) for word in words)
+    return fold_text(texts).str.contains(pattern, regex=True)
+
+# Function to search one platform, through the index when it exists or else with a LIKE scan giving the same rows and columns
+def search_platform(platform, term, kind, indexed=None):
+    column = 'name' if kind == 'item' else 'category'
+    if has_menu_search(platform) if indexed is None else indexed:
+        query = f"""
+            SELECT {', '.join(SEARCH_COLUMNS)}
+            FROM menu_search
+            WHERE menu_search MATCH :query AND kind = :kind
+        """
+        return read_query(platform, query, params={'query': fts_query(term, column), 'kind': kind})
+
+    table = 'menu_items' if kind == 'item' else 'categories'
+    # Same columns as the index, NULL where the table has none (e.g. no price on a category)
+    select = ', '.join(name if name in CANONICAL_COLUMNS[table] else f'NULL AS {name}' for name in SEARCH_COLUMNS)
+    query = f"""
+        SELECT {select}
+        FROM ({CANONICAL_QUERIES[table][platform]})
+        WHERE {column} LIKE :pattern
+    """
+    candidates = read_query(platform, query, params={'pattern': like_pattern(term)})
+    return candidates[matches_term(candidates[column], term).to_numpy()].reset_index(drop=True)
+
+# Function to find the menu items (kind='item') or restaurant categories (kind='category') matching a term
+def search_menu(term, platforms=None, kind='item'):
+    platforms = platforms or list(DATABASES)
+    indexed = {platform: has_menu_search(platform) for platform in platforms}
+    missing = [platform for platform in platforms if not indexed[platform] and platform not in _reported_missing]
+    if missing:
+        # Said once per platform, not on every search
+        _reported_missing.update(missing)
+        print(f"No menu_search index for {', '.join(missing)}, scanning the menus (run 'python menu_search.py' to build it)")
+    results = run_per_platform({platform: partial(search_platform, platform, term, kind, indexed[platform]) for platform in platforms})
+    frames = [results[platform].assign(platform=platform) for platform in platforms]
+    # Columns a search leaves all NULL (e.g. the price of categories) are left out of the concat and put back after it
+    return pd.concat([frame.dropna(axis=1, how='all') for frame in frames], ignore_index=True).reindex(columns=frames[0].columns)
+
+if __name__ == "__main__":
+    for platform in DATABASES:
+        build_menu_search(platform)
+        print(f"Built menu search index for {platform}")
@@ -0,0 +1,231 @@
+import json
+import os
+
+# Optional JSON file with more platforms, or overrides of the built-in ones, in the same layout as PLATFORMS
+PLATFORMS_CONFIG = os.environ.get('PLATFORMS_CONFIG')
+
+# Columns of each table of the canonical schema, in order
+CANONICAL_COLUMNS = {
+    'restaurants': ['restaurant_id', 'name', 'address', 'city', 'postal_code', 'region',
+                    'latitude', 'longitude', 'rating', 'rating_count', 'delivery_fee'],
+    'menu_items': ['restaurant_id', 'item_id', 'name', 'description', 'price'],
+    'categories': ['restaurant_id', 'category'],
+    'locations': ['restaurant_id', 'location_id', 'name', 'postal_code', 'region', 'latitude', 'longitude'],
+}
+
+# Identifiers are compared across platforms as text
+ID_COLUMNS = ['restaurant_id', 'item_id', 'location_id']
+
+# Stored price units and how many of them make one euro
+PRICE_UNITS = {
+    'euros': 1,
+    'cents': 100,
+}
+
+# Declarative description of each platform database: where it is, which source column feeds each canonical column,
+# the unit of its prices and how it names regions. Vegetarian and other tags come from tagging.py, the same on every platform.
+# Canonical columns missing from a table's 'columns' come out as NULL.
+PLATFORMS = {
+    'Deliveroo': {
+        'database': 'databases/deliveroo.db',
+        'color': 'blue',
+        'price_unit': 'euros',
+        'region_names': {},
+        # Indexes that make the province count query covering (see province_index.py)
+        'province_indexes': [
+            'CREATE INDEX IF NOT EXISTS idx_restaurants_postal_code ON restaurants(postal_code, name)',
+        ],
+        'tables': {
+            'restaurants': {
+                'from': 'restaurants',
+                'columns': {
+                    'restaurant_id': 'id', 'name': 'name', 'address': 'address', 'postal_code': 'postal_code',
+                    'latitude': 'latitude', 'longitude': 'longitude', 'rating': 'rating',
+                    'rating_count': 'rating_number', 'delivery_fee': 'delivery_fee',
+                },
+            },
+            'menu_items': {
+                'from': 'menu_items',
+                'columns': {'restaurant_id': 'restaurant_id', 'item_id': 'id', 'name': 'name', 'description': 'description', 'price': 'price'},
+            },
+            # The category sits on the restaurant; the categories table holds menu sections (see menu_items.categorie_id), not cuisines
+            'categories': {
+                'from': 'restaurants',
+                'columns': {'restaurant_id': 'id', 'category': 'category'},
+                'where': 'category IS NOT NULL',
+            },
+            'locations': {
+                'from': 'locations_to_restaurants AS l JOIN locations AS loc ON l.location_id = loc.id',
+                'columns': {
+                    'restaurant_id': 'l.restaurant_id', 'location_id': 'loc.id', 'name': 'loc.name',
+                    'postal_code': 'loc.postalcode', 'latitude': 'loc.latitude', 'longitude': 'loc.longitude',
+                },
+            },
+        },
+    },
+    'UberEats': {
+        'database': 'databases/ubereats.db',
+        'color': 'red',
+        # Many UberEats places are vegetarian, they are drawn lighter on that map
+        'alpha': {'vegetarian': 0.5},
+        'price_unit': 'cents',
+        # Region names used by UberEats (location__geo__region), once repaired when double encoded, and the province they stand for
+        'region_names': {
+            'anvers': 'Antwerp',
+            'bruxelles-capitale': 'Brussels-Capital Region',
+            'flandre-orientale': 'East Flanders',
+            'brabant-flamand': 'Flemish Brabant',
+            'flandre-occidentale': 'West Flanders',
+            'brabant-wallon': 'Walloon Brabant',
+            'limbourg': 'Limburg',
+            'liège': 'Liège',
+            'hainaut': 'Hainaut',
+            'namur': 'Namur',
+            'luxembourg': 'Luxembourg',
+        },
+        'tables': {
+            'restaurants': {
+                'from': 'restaurants',
+                'columns': {
+                    'restaurant_id': 'id', 'name': 'title', 'address': 'location__street_address', 'city': 'location__city',
+                    'postal_code': 'location__postal_code', 'region': 'location__geo__region',
+                    'latitude': 'location__latitude', 'longitude': 'location__longitude',
+                    'rating': 'rating__rating_value', 'rating_count': 'rating__review_count',
+                },
+            },
+            'menu_items': {
+                'from': 'menu_items',
+                'columns': {'restaurant_id': 'restaurant_id', 'item_id': 'id', 'name': 'name', 'description': 'description', 'price': 'price'},
+            },
+            'categories': {
+                'from': 'restaurant_to_categories',
+                'columns': {'restaurant_id': 'restaurant_id', 'category': 'category'},
+            },
+            'locations': {
+                'from': 'locations_to_restaurants AS l JOIN locations AS loc ON l.location_id = loc.id',
+                'columns': {
+                    'restaurant_id': 'l.restaurant_id', 'location_id': 'loc.id', 'name': 'loc.name',
+                    'region': 'loc.region', 'latitude': 'loc.latitude', 'longitude': 'loc.longitude',
+                },
+            },
+        },
+    },
+    'Takeaway': {
+        'database': 'databases/takeaway.db',
+        'color': 'green',
+        # Takeaway lists the most restaurants, they are drawn lighter on the restaurant map
+        'alpha': {'restaurants': 0.5},
+        'price_unit': 'euros',
+        'region_names': {},
+        'province_indexes': [
+            'CREATE INDEX IF NOT EXISTS idx_locations_to_restaurants_restaurant ON locations_to_restaurants(restaurant_id, location_id)',
+        ],
+        'tables': {
+            # Restaurants have no postal code of their own, they take the lowest one of the locations they deliver to
+            'restaurants': {
+                'from': """restaurants AS r
+                    LEFT JOIN locations_to_restaurants AS l ON r.primarySlug = l.restaurant_id
+                    LEFT JOIN locations AS loc ON l.location_id = loc.id""",
+                'columns': {
+                    'restaurant_id': 'r.primarySlug', 'name': 'r.name', 'address': 'r.address', 'city': 'r.city',
+                    'postal_code': 'MIN(loc.postalCode)', 'latitude': 'r.latitude', 'longitude': 'r.longitude',
+                    'rating': 'r.ratings', 'rating_count': 'r.ratingsNumber', 'delivery_fee': 'r.deliveryFee',
+                },
+                'group_by': 'r.primarySlug',
+            },
+            'menu_items': {
+                'from': 'menuItems',
+                'columns': {'restaurant_id': 'primarySlug', 'item_id': 'id', 'name': 'name', 'description': 'description', 'price': 'price'},
+            },
+            'categories': {
+                'from': 'categories_restaurants',
+                'columns': {'restaurant_id': 'restaurant_id', 'category': 'category_id'},
+            },
+            'locations': {
+                'from': 'locations_to_restaurants AS l JOIN locations AS loc ON l.location_id = loc.id',
+                'columns': {
+                    'restaurant_id': 'l.restaurant_id', 'location_id': 'loc.id', 'name': 'loc.name',
+                    'postal_code': 'loc.postalCode', 'latitude': 'loc.latitude', 'longitude': 'loc.longitude',
+                },
+            },
+        },
+    },
+}
+
+# Keys every platform spec needs, and the values of the optional ones a spec leaves out
+REQUIRED_KEYS = ['database', 'tables']
+DEFAULT_SPEC = {
+    'price_unit': 'euros',
+    'region_names': {},
+    'province_indexes': [],
+    # Transparency of the points of the platform per map (e.g. 'restaurants', 'vegetarian'), opaque when missing
+    'alpha': {},
+}
+
+# Colours given in turn to the platforms whose spec has none
+SPARE_COLORS = ['orange', 'purple', 'brown', 'pink', 'olive', 'cyan']
+
+# Function to check the spec of every platform and fill in the optional keys it leaves out
+def complete_platforms(platforms):
+    used = {spec['color'] for spec in platforms.values() if 'color' in spec}
+    spare = (color for color in SPARE_COLORS if color not in used)
+    for name, spec in platforms.items():
+        missing = [key for key in REQUIRED_KEYS if key not in spec]
+        if missing:
+            raise ValueError(f"Platform {name} has no {', '.join(missing)} in its spec")
+        if spec.get('price_unit', DEFAULT_SPEC['price_unit']) not in PRICE_UNITS:
+            raise ValueError(f"Platform {name} has an unknown price_unit {spec['price_unit']!r}, expected one of {', '.join(PRICE_UNITS)}")
+        for key, value in DEFAULT_SPEC.items():
+            spec.setdefault(key, type(value)(value))
+        if 'color' not in spec:
+            spec['color'] = next(spare, 'grey')
+    return platforms
+
+# Function to get the transparency of a platform's points on a map
+def platform_alpha(platform, figure):
+    return PLATFORMS[platform]['alpha'].get(figure, 1)
+
+# Function to add the platforms of a JSON config file, replacing built-in platforms of the same name
+def load_platforms(path):
+    with open(path, encoding='utf-8') as f:
+        PLATFORMS.update(json.load(f))
+    complete_platforms(PLATFORMS)
+
+if PLATFORMS_CONFIG:
+    load_platforms(PLATFORMS_CONFIG)
+complete_platforms(PLATFORMS)
+
+# Function to compile one SELECT of a table spec into SQL returning the canonical columns
+def _compile_select(table, spec, price_unit):
+    expressions = []
+    for column in CANONICAL_COLUMNS[table]:
+        source = spec['columns'].get(column)
+        if source is None:
+            expressions.append(f'NULL AS {column}')
+        elif column in ID_COLUMNS:
+            expressions.append(f'CAST({source} AS TEXT) AS {column}')
+        elif column == 'price' and PRICE_UNITS[price_unit] != 1:
+            expressions.append(f'CAST({source} AS REAL) / {PRICE_UNITS[price_unit]} AS {column}')
+        elif column == 'price':
+            expressions.append(f'CAST({source} AS REAL) AS {column}')
+        else:
+            expressions.append(f'{source} AS {column}')
+
+    query = f"SELECT {', '.join(expressions)}\nFROM {spec['from']}"
+    if 'where' in spec:
+        query += f"\nWHERE {spec['where']}"
+    if 'group_by' in spec:
+        query += f"\nGROUP BY {spec['group_by']}"
+    return query
+
+# Function to compile the spec of a platform table into the query returning it in the canonical schema
+def compile_query(platform, table):
+    spec = PLATFORMS[platform]['tables'][table]
+    return _compile_select(table, spec, PLATFORMS[platform]['price_unit'])
+
+# Function to compile the queries of every table and platform
+def compile_queries():
+    return {table: {platform: compile_query(platform, table) for platform in PLATFORMS} for table in CANONICAL_COLUMNS}
+
+# Queries returning each table of the canonical schema from every platform database
+CANONICAL_QUERIES = compile_queries()
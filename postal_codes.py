@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+# Belgian postal code ranges and the province they belong to
+POSTAL_CODE_RANGES = [
+    (1000, 1300, 'Brussels-Capital Region'),
+    (1300, 1500, 'Walloon Brabant'),
+    (1500, 2000, 'Flemish Brabant'),
+    (2000, 3000, 'Antwerp'),
+    (3000, 3500, 'Flemish Brabant'),
+    (3500, 4000, 'Limburg'),
+    (4000, 5000, 'Liège'),
+    (5000, 6000, 'Namur'),
+    (6000, 6600, 'Hainaut'),
+    (6600, 7000, 'Luxembourg'),
+    (7000, 8000, 'Hainaut'),
+    (8000, 9000, 'West Flanders'),
+    (9000, 10000, 'East Flanders'),
+]
+
+ALL_PROVINCES = ['Brussels-Capital Region', 'Walloon Brabant', 'Flemish Brabant', 'Antwerp', 'Limburg', 'Liège', 'Namur', 'Luxembourg', 'Hainaut', 'West Flanders', 'East Flanders']
+
+UNKNOWN_PROVINCE = 'Unknown'
+
+# Dense lookup table: position i holds the index in _PROVINCE_NAMES of postal code i
+_PROVINCE_NAMES = np.array(ALL_PROVINCES + [UNKNOWN_PROVINCE], dtype=object)
+_UNKNOWN_INDEX = len(ALL_PROVINCES)
+_LOOKUP = np.full(10000, _UNKNOWN_INDEX, dtype=np.int8)
+for start, stop, province in POSTAL_CODE_RANGES:
+    _LOOKUP[start:stop] = ALL_PROVINCES.index(province)
+
+# Function to strip non-digit characters (e.g. "B-1000") and convert postal codes to numbers
+def clean_postal_codes(postal_codes):
+    numeric = pd.to_numeric(postal_codes, errors='coerce')
+    if pd.api.types.is_numeric_dtype(postal_codes):
+        return numeric
+    # Only the values that are not numbers yet are stripped, so 1070.0 in a mixed column does not become 10700
+    digits = postal_codes.astype('string').str.replace(r'\D', '', regex=True)
+    return numeric.fillna(pd.to_numeric(digits, errors='coerce'))
+
+# Function to map a whole column of postal codes to provinces in one vectorized step
+def postal_code_to_province(postal_codes):
+    codes = pd.to_numeric(postal_codes, errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    missing = np.isnan(codes)
+    in_range = ~missing & (codes >= 0) & (codes < len(_LOOKUP))
+
+    indices = np.full(len(codes), _UNKNOWN_INDEX, dtype=np.int8)
+    indices[in_range] = _LOOKUP[codes[in_range].astype(np.int64)]
+
+    provinces = _PROVINCE_NAMES[indices]
+    provinces[missing] = None
+    return pd.Series(provinces, index=postal_codes.index, name='province')
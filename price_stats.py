@@ -0,0 +1,171 @@
+from functools import partial
+import numpy as np
+from database import DATABASES, read_query, run_per_platform
+from instrumentation import instrumented
+from menu_search import search_menu
+from snapshot import CANONICAL_QUERIES, SNAPSHOT_DIR, snapshot_exists
+
+# Prices are counted in fixed bins of 5 cents between 0 and 250 euros, prices outside land in the edge bins
+HISTOGRAM_RANGE = (0.0, 250.0)
+HISTOGRAM_BINS = 5000
+
+# Rows of prices read at a time
+CHUNK_SIZE = 500_000
+
+# Function to create an empty price sketch: running moments plus a fixed-bin histogram
+def new_sketch():
+    return {
+        'count': 0,
+        'mean': 0.0,
+        'm2': 0.0,
+        'min': np.inf,
+        'max': -np.inf,
+        'histogram': np.zeros(HISTOGRAM_BINS, dtype=np.int64),
+    }
+
+# Function to merge two sketches (Chan et al. parallel update of mean and variance)
+def merge_sketches(a, b):
+    count = a['count'] + b['count']
+    if count == 0:
+        return new_sketch()
+    delta = b['mean'] - a['mean']
+    return {
+        'count': count,
+        'mean': a['mean'] + delta * b['count'] / count,
+        'm2': a['m2'] + b['m2'] + delta ** 2 * a['count'] * b['count'] / count,
+        'min': min(a['min'], b['min']),
+        'max': max(a['max'], b['max']),
+        'histogram': a['histogram'] + b['histogram'],
+    }
+
+# Function to find the histogram bin of each price
+def histogram_bins(prices):
+    low, high = HISTOGRAM_RANGE
+    bins = ((np.clip(prices, low, high) - low) / (high - low) * HISTOGRAM_BINS).astype(np.int64)
+    return np.minimum(bins, HISTOGRAM_BINS - 1)
+
+# Function to build the sketch of an array of prices
+def sketch_of(prices):
+    prices = np.asarray(prices, dtype=float)
+    prices = prices[np.isfinite(prices)]
+    sketch = new_sketch()
+    if len(prices) == 0:
+        return sketch
+
+    sketch.update({
+        'count': len(prices),
+        'mean': prices.mean(),
+        'm2': ((prices - prices.mean()) ** 2).sum(),
+        'min': prices.min(),
+        'max': prices.max(),
+        'histogram': np.bincount(histogram_bins(prices), minlength=HISTOGRAM_BINS),
+    })
+    return sketch
+
+# Function to add a chunk of prices to a sketch
+def update_sketch(sketch, prices):
+    return merge_sketches(sketch, sketch_of(prices))
+
+# Function to estimate a quantile from the histogram, exact to within one bin (5 cents)
+def sketch_quantile(sketch, q):
+    if sketch['count'] == 0:
+        return np.nan
+    low, high = HISTOGRAM_RANGE
+    width = (high - low) / HISTOGRAM_BINS
+    cumulative = np.cumsum(sketch['histogram'])
+    target = q * sketch['count']
+    i = min(int(np.searchsorted(cumulative, target)), HISTOGRAM_BINS - 1)
+    before = cumulative[i - 1] if i > 0 else 0
+    # Interpolate linearly inside the bin
+    fraction = (target - before) / max(sketch['histogram'][i], 1)
+    return float(np.clip(low + (i + fraction) * width, sketch['min'], sketch['max']))
+
+# Function to summarize a sketch as mean, standard deviation, min, max and the main quantiles
+def sketch_summary(sketch):
+    variance = sketch['m2'] / (sketch['count'] - 1) if sketch['count'] > 1 else np.nan
+    return {
+        'count': sketch['count'],
+        'mean': sketch['mean'] if sketch['count'] else np.nan,
+        'std': np.sqrt(variance),
+        'min': sketch['min'] if sketch['count'] else np.nan,
+        'q25': sketch_quantile(sketch, 0.25),
+        'median': sketch_quantile(sketch, 0.5),
+        'q75': sketch_quantile(sketch, 0.75),
+        'max': sketch['max'] if sketch['count'] else np.nan,
+    }
+
+# Function to compute a smoothed density curve from the histogram, a KDE with a Gaussian kernel of the given bandwidth
+def sketch_density(sketch, bandwidth=1.0):
+    low, high = HISTOGRAM_RANGE
+    width = (high - low) / HISTOGRAM_BINS
+    centers = low + (np.arange(HISTOGRAM_BINS) + 0.5) * width
+    if sketch['count'] == 0:
+        return centers, np.zeros(HISTOGRAM_BINS)
+
+    offsets = np.arange(-4 * bandwidth, 4 * bandwidth + width, width)
+    kernel = np.exp(-0.5 * (offsets / bandwidth) ** 2)
+    kernel /= kernel.sum()
+    density = np.convolve(sketch['histogram'], kernel, mode='same') / (sketch['count'] * width)
+    return centers, density
+
+# Function to stream the prices of one platform into a sketch, from the Parquet snapshot or from SQLite
+@instrumented()
+def platform_price_sketch(platform, chunksize=CHUNK_SIZE):
+    sketch = new_sketch()
+    if snapshot_exists('menu_items'):
+        import pyarrow.dataset as ds
+
+        dataset = ds.dataset(f'{SNAPSHOT_DIR}/menu_items', format='parquet', partitioning='hive')
+        scanner = dataset.scanner(columns=['price_cents'], filter=ds.field('platform') == platform, batch_size=chunksize)
+        for batch in scanner.to_batches():
+            # The snapshot keeps prices as whole cents
+            sketch = update_sketch(sketch, batch.column('price_cents').to_numpy(zero_copy_only=False) / 100)
+        return sketch
+
+    query = f"SELECT price FROM ({CANONICAL_QUERIES['menu_items'][platform]})"
+    for chunk in read_query(platform, query, chunksize=chunksize):
+        sketch = update_sketch(sketch, chunk['price'].to_numpy(dtype=float, na_value=np.nan))
+    return sketch
+
+# Function to compute the price sketch of every platform in parallel, plus their merge under 'All'
+def price_sketches(platforms=None):
+    platforms = platforms or list(DATABASES)
+    sketches = run_per_platform({platform: partial(platform_price_sketch, platform) for platform in platforms})
+    total = new_sketch()
+    for platform in platforms:
+        total = merge_sketches(total, sketches[platform])
+    sketches['All'] = total
+    return sketches
+
+# Function to compute the price sketches of the menu items matching a dish, e.g. 'kapsalon'
+def dish_price_sketches(term, platforms=None):
+    platforms = platforms or list(DATABASES)
+    items = search_menu(term, platforms)
+    sketches = {platform: sketch_of(items.loc[items['platform'] == platform, 'price']) for platform in platforms}
+    sketches['All'] = sketch_of(items['price'])
+    return sketches
+
+# Function to draw the price density of a sketch
+def plot_price_density(ax, sketch, color, label=None, bandwidth=1.0):
+    x, y = sketch_density(sketch, bandwidth)
+    ax.plot(x, y, color=color, label=label)
+    ax.fill_between(x, y, color=color, alpha=0.25)
+    ax.set_xlabel('price')
+    ax.set_ylabel('Density')
+
+# Function to draw the price distribution of a sketch as its own figure, optionally marking the mean and median
+@instrumented()
+def plot_price_distribution(sketch, color, title, show_summary=False, bandwidth=1.0):
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(6, 5))
+    plot_price_density(ax, sketch, color, label='price distribution', bandwidth=bandwidth)
+    if show_summary:
+        summary = sketch_summary(sketch)
+        ax.axvline(x=summary['mean'], linewidth=2, color='red', label=f"mean {summary['mean']:.2f}", alpha=0.6)
+        ax.axvline(x=summary['median'], linewidth=2, color='green', label=f"median {summary['median']:.2f}", alpha=0.6, ls='--')
+        ax.legend()
+    ax.set_xlim(-1.5, 100)
+    ax.set_title(title)
+    fig.tight_layout()
+    return fig
@@ -0,0 +1,59 @@
+from sqlalchemy import create_engine, text
+import pandas as pd
+from database import DATABASES, dispose_engines, read_query
+from platforms import CANONICAL_QUERIES, PLATFORMS
+from postal_codes import clean_postal_codes, postal_code_to_province
+
+# Function to compile the query returning the restaurant count per province of a platform
+def province_count_query(platform):
+    return f"""
+        SELECT p.province, COUNT(*) AS restaurant_count
+        FROM ({CANONICAL_QUERIES['restaurants'][platform]}) AS r
+        JOIN postal_province AS p ON p.postal_code = r.postal_code
+        GROUP BY p.province
+    """
+
+# Function to attach the postal_province dimension table and covering indexes to a platform database
+def build_province_index(platform):
+    engine = create_engine(f'sqlite:///{DATABASES[platform]}')
+
+    with engine.begin() as con:
+        postal_codes = pd.read_sql(text(f"""
+            SELECT DISTINCT postal_code FROM ({CANONICAL_QUERIES['restaurants'][platform]}) WHERE postal_code IS NOT NULL
+        """), con).iloc[:, 0]
+        provinces = postal_code_to_province(clean_postal_codes(postal_codes)).fillna('Unknown')
+
+        # The key keeps the raw postal code so the aggregate query joins without cleaning it again
+        con.execute(text('DROP TABLE IF EXISTS postal_province'))
+        con.execute(text('CREATE TABLE postal_province (postal_code PRIMARY KEY, province TEXT NOT NULL)'))
+        con.execute(text('CREATE INDEX idx_postal_province_province ON postal_province(province)'))
+        rows = [{'postal_code': code, 'province': province} for code, province in zip(postal_codes.tolist(), provinces.tolist())]
+        if rows:
+            con.execute(text('INSERT INTO postal_province (postal_code, province) VALUES (:postal_code, :province)'), rows)
+
+        for statement in PLATFORMS[platform].get('province_indexes', []):
+            con.execute(text(statement))
+        con.execute(text('ANALYZE'))
+
+    engine.dispose()
+    # The read-only engines open the files as immutable, so they must not keep serving the old pages
+    dispose_engines()
+
+# Function to check whether a platform database already has the postal_province table
+def has_province_index(platform):
+    # Platforms that name regions fall back on them for unknown postal codes, which the SQL join cannot do
+    if PLATFORMS[platform]['region_names']:
+        return False
+    tables = read_query(platform, "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'postal_province'")
+    return not tables.empty
+
+# Function to fetch the restaurant count per province computed inside SQLite
+def get_province_counts(platform):
+    return read_query(platform, province_count_query(platform))
+
+if __name__ == "__main__":
+    for platform, spec in PLATFORMS.items():
+        if spec['region_names']:
+            continue
+        build_province_index(platform)
+        print(f"Built province index for {platform}")
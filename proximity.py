@@ -0,0 +1,139 @@
+import argparse
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+from sklearn.neighbors import BallTree
+from grid_cube import cell_size
+from instrumentation import instrumented, stage
+from menu_search import search_menu
+from platforms import PLATFORMS
+from regions import assign_regions, get_region_index
+from snapshot import load_restaurants
+from tagging import TAGS, has_tag
+
+# Radius of the earth in km, the haversine metric works on the unit sphere
+EARTH_RADIUS_KM = 6371.0
+
+# Radii the competitors of each restaurant are counted within
+RADII_KM = [1, 3, 5]
+
+# Areas further than this from the nearest place are coverage gaps
+GAP_DISTANCE_KM = 5
+
+# Grid cube level whose cells are the areas of the coverage analysis (0.02 degrees, about 1.4 x 2.2 km)
+GAP_LEVEL = 5
+
+# Function to turn the coordinates of a frame into the (latitude, longitude) radians the haversine metric expects
+def to_radians(df):
+    return np.radians(df[['latitude', 'longitude']].to_numpy(dtype=float))
+
+# Function to build a BallTree with the haversine metric over the points of each group, e.g. per platform or platform and category
+@instrumented()
+def build_trees(points, by='platform'):
+    return {key: BallTree(to_radians(group), metric='haversine') for key, group in points.groupby(by, observed=True, sort=False)}
+
+# Function to keep the restaurants with a category matching a term, e.g. 'pizza', the way the menu search and rankings match it
+def restaurants_in_category(restaurants, term):
+    platforms = [platform for platform in PLATFORMS if (restaurants['platform'] == platform).any()]
+    matches = search_menu(term, platforms, kind='category')[['platform', 'restaurant_id']].astype('string')
+    keys = pd.MultiIndex.from_frame(restaurants[['platform', 'restaurant_id']].astype('string'))
+    return restaurants[keys.isin(pd.MultiIndex.from_frame(matches))]
+
+# Function to count, for every restaurant, the competitors of each platform within each radius, optionally only those of a category
+@instrumented()
+def competitor_counts(restaurants=None, radii=RADII_KM, category=None):
+    if restaurants is None:
+        restaurants = load_restaurants(columns=['platform', 'restaurant_id', 'latitude', 'longitude'], valid_coordinates=True)
+    restaurants = restaurants.reset_index(drop=True)
+    competitors = restaurants if category is None else restaurants_in_category(restaurants, category)
+    points = to_radians(restaurants)
+    is_competitor = restaurants.index.isin(competitors.index)
+
+    counts = restaurants[['platform', 'restaurant_id']].copy()
+    trees = build_trees(competitors)
+    for platform in PLATFORMS:
+        # Every platform gets its columns, with no competitors when none of its restaurants is in the category
+        tree = trees.get(platform)
+        if tree is None:
+            for radius in radii:
+                counts[f'{platform}_{radius}km'] = np.zeros(len(restaurants), dtype=np.int64)
+            continue
+        # A restaurant is not its own competitor
+        itself = (is_competitor & (restaurants['platform'] == platform).to_numpy()).astype(np.int64)
+        for radius in radii:
+            with stage('query_radius', platform, radius_km=radius, rows=len(points)):
+                found = tree.query_radius(points, radius / EARTH_RADIUS_KM, count_only=True)
+            counts[f'{platform}_{radius}km'] = found - itself
+    return counts
+
+# Function to find the k nearest targets of every point, one row per point and neighbour with its distance in km
+@instrumented()
+def nearest_neighbours(points, targets, k=1, columns=('platform', 'restaurant_id')):
+    if targets.empty:
+        # Without targets every point has one neighbour, missing and infinitely far
+        neighbours = pd.DataFrame({column: pd.Series(pd.NA, index=range(len(points)), dtype=targets[column].dtype) for column in columns})
+        neighbours.insert(0, 'point', points.index.to_numpy())
+        neighbours.insert(1, 'neighbour', 1)
+        neighbours['distance_km'] = np.inf
+        return neighbours
+    k = min(k, len(targets))
+    tree = BallTree(to_radians(targets), metric='haversine')
+    distances, positions = tree.query(to_radians(points), k=k)
+    neighbours = targets.iloc[positions.ravel()][list(columns)].reset_index(drop=True)
+    neighbours.insert(0, 'point', np.repeat(points.index.to_numpy(), k))
+    neighbours.insert(1, 'neighbour', np.tile(np.arange(1, k + 1), len(points)))
+    neighbours['distance_km'] = distances.ravel() * EARTH_RADIUS_KM
+    return neighbours
+
+# Function to lay the cells of a grid cube level over Belgium, keeping those whose centre lies in a region polygon
+def belgium_cells(level=GAP_LEVEL):
+    size = cell_size(level)
+    _, polygons, _ = get_region_index()
+    min_x, min_y, max_x, max_y = shapely.total_bounds(polygons)
+    cell_x, cell_y = np.meshgrid(np.arange(np.floor(min_x / size), np.floor(max_x / size) + 1, dtype=np.int64),
+                                 np.arange(np.floor(min_y / size), np.floor(max_y / size) + 1, dtype=np.int64))
+    cells = pd.DataFrame({'cell_x': cell_x.ravel(), 'cell_y': cell_y.ravel()})
+    cells['longitude'] = (cells['cell_x'] + 0.5) * size
+    cells['latitude'] = (cells['cell_y'] + 0.5) * size
+    return cells[assign_regions(cells).notna().to_numpy()].reset_index(drop=True)
+
+# Function to measure how far every area of Belgium is from the nearest target place and flag the ones further than max_distance_km
+@instrumented()
+def coverage_gaps(targets, max_distance_km=GAP_DISTANCE_KM, level=GAP_LEVEL):
+    cells = belgium_cells(level)
+    if targets.empty:
+        # Without targets every area is a gap
+        cells['distance_km'] = np.inf
+    else:
+        tree = BallTree(to_radians(targets), metric='haversine')
+        with stage('nearest_target', rows=len(cells)):
+            distances, _ = tree.query(to_radians(cells), k=1)
+        cells['distance_km'] = distances[:, 0] * EARTH_RADIUS_KM
+    cells['gap'] = cells['distance_km'] > max_distance_km
+
+    size = cell_size(level)
+    boxes = shapely.box(cells['cell_x'] * size, cells['cell_y'] * size, (cells['cell_x'] + 1) * size, (cells['cell_y'] + 1) * size)
+    return gpd.GeoDataFrame(cells, geometry=boxes, crs='EPSG:4326')
+
+# Function to load the restaurants carrying a tag (see tagging.py) with usable coordinates, e.g. the vegetarian ones
+def tagged_places(tag):
+    restaurants = load_restaurants(columns=['platform', 'restaurant_id', 'latitude', 'longitude', 'tags'], valid_coordinates=True)
+    return restaurants[has_tag(restaurants['tags'], tag)].drop(columns='tags').reset_index(drop=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Count competitors around every restaurant, or find the areas far from veg/kapsalon places')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    competitors = subparsers.add_parser('competitors', help='competitors of each platform within the radii')
+    competitors.add_argument('--category', help="only count restaurants of this category, e.g. 'pizza'")
+    gaps = subparsers.add_parser('gaps', help='areas further than a distance from the nearest place')
+    gaps.add_argument('--tag', choices=list(TAGS), default='vegetarian', help='tag of the places to measure the distance to')
+    gaps.add_argument('--max-km', type=float, default=GAP_DISTANCE_KM, help='distance beyond which an area is a gap')
+    args = parser.parse_args()
+
+    if args.command == 'competitors':
+        counts = competitor_counts(category=args.category)
+        print(counts.groupby('platform', observed=True).mean(numeric_only=True).round(1).to_string())
+    else:
+        cells = coverage_gaps(tagged_places(args.tag), args.max_km)
+        print(f"{cells['gap'].sum()} of {len(cells)} areas ({cells['gap'].mean():.0%}) are further than {args.max_km} km from a {args.tag} place")
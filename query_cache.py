@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+import pandas as pd
+
+# Directory holding one Parquet file per cached query result
+CACHE_DIR = os.environ.get('QUERY_CACHE_DIR', '.cache/queries')
+
+# Least recently used results are evicted once the cache grows past this size
+CACHE_MAX_BYTES = int(os.environ.get('QUERY_CACHE_MAX_BYTES', 2 * 1024 ** 3))
+
+# Temporary files older than this are left over by writers that crashed or were killed, and are removed on eviction
+TMP_GRACE_SECONDS = 3600
+
+# Set QUERY_CACHE_DISABLE=1 to always query the databases
+CACHE_DISABLED = os.environ.get('QUERY_CACHE_DISABLE', '') == '1'
+
+# Function to normalize SQL text so formatting changes do not create new cache entries
+def normalize_query(query):
+    query = re.sub(r'\s+', ' ', query).strip()
+    return query.rstrip(';').strip()
+
+# Function to fingerprint a database file by size, modification time and SQLite header
+def database_fingerprint(db_path):
+    stat = os.stat(db_path)
+    # The first 100 bytes of a SQLite file hold the file change counter, bumped by every write transaction
+    with open(db_path, 'rb') as f:
+        header = f.read(100)
+    return f'{stat.st_size}-{stat.st_mtime_ns}-{hashlib.sha256(header).hexdigest()}'
+
+# Function to build the cache key of a query on a database
+def cache_key(db_path, query, params=None):
+    payload = json.dumps({
+        'database': os.path.abspath(db_path),
+        'fingerprint': database_fingerprint(db_path),
+        'query': normalize_query(query),
+        'params': params or {},
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+# Function to get the file a cached result is stored in
+def _cache_path(key):
+    return os.path.join(CACHE_DIR, f'{key}.parquet')
+
+# Function to read a cached result, or None when it is not cached
+def get_cached(key):
+    path = _cache_path(key)
+    try:
+        df = pd.read_parquet(path)
+    except (OSError, ImportError, ValueError):
+        return None
+    # Touch the file so eviction sees it as recently used; another process may have evicted it since the read
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+    return df
+
+# Function to store a query result in the cache
+def put_cached(key, df):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = _cache_path(key)
+    # A file of its own per writer, also for threads of the same process, renamed into place once complete
+    fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=CACHE_DIR)
+    os.close(fd)
+    try:
+        df.to_parquet(tmp_path, index=False)
+    except (ImportError, ValueError, TypeError, OSError) as e:
+        # Mixed-type object columns (or a missing pyarrow) cannot be written, skip caching them
+        print(f"Not caching query result: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return
+    os.replace(tmp_path, path)
+    evict_cache()
+
+# Function to delete the least recently used results until the cache fits in max_bytes, and the temporary files of dead writers
+def evict_cache(max_bytes=CACHE_MAX_BYTES):
+    if not os.path.isdir(CACHE_DIR):
+        return
+    entries = []
+    now = time.time()
+    for name in os.listdir(CACHE_DIR):
+        if name.endswith('.tmp'):
+            path = os.path.join(CACHE_DIR, name)
+            try:
+                if now - os.stat(path).st_mtime > TMP_GRACE_SECONDS:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+        elif name.endswith('.parquet'):
+            # Other processes evict and replace results at the same time, a file may be gone by now
+            try:
+                stat = os.stat(os.path.join(CACHE_DIR, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(os.path.join(CACHE_DIR, name))
+        except FileNotFoundError:
+            pass
+        total -= size
+
+# Function to remove every cached result
+def clear_cache():
+    evict_cache(max_bytes=0)
+
+# Function to return the cached result of a query, running load() and caching it on a miss
+def cached_query(db_path, query, params, load, bypass=False):
+    if bypass or CACHE_DISABLED:
+        return load()
+    key = cache_key(db_path, query, params)
+    df = get_cached(key)
+    if df is None:
+        df = load()
+        put_cached(key, df)
+    return df
@@ -0,0 +1,112 @@
+import argparse
+from functools import lru_cache
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from instrumentation import instrumented, stage
+from matching import match_restaurants
+from menu_search import search_menu
+from platforms import PLATFORMS
+from snapshot import load_restaurants, table_version
+
+# Places returned by a ranking
+TOP_N = 10
+
+# Restaurants with fewer ratings are left out, like the ">= 20 reviews" of the notebook queries
+MIN_RATINGS = 20
+
+# Ratings a restaurant needs before its own average weighs as much as the platform average (m of the Bayesian average)
+PRIOR_RATINGS = 20
+
+# Columns of the restaurants a ranking returns
+RANKING_COLUMNS = ['platform', 'restaurant_id', 'name', 'address', 'city', 'postal_code', 'latitude', 'longitude',
+                   'rating', 'rating_count', 'coordinate_issue']
+
+# Loads of the rated restaurants kept in memory, one per set of platforms and version of the data
+RATED_CACHE_SIZE = 8
+
+# Function to load the rated restaurants once per set of platforms and version of the data, with the average rating of their platform.
+# Rankings only read from it, so dozens of them share one load
+@lru_cache(maxsize=RATED_CACHE_SIZE)
+def _rated_restaurants(platforms, version):
+    restaurants = load_restaurants(columns=RANKING_COLUMNS, platforms=list(platforms))
+    restaurants = restaurants.dropna(subset=['rating', 'rating_count']).reset_index(drop=True)
+    # Rejected coordinates are not drawn, the restaurant is still ranked
+    restaurants.loc[restaurants['coordinate_issue'].notna(), ['latitude', 'longitude']] = np.nan
+    restaurants['platform_rating'] = restaurants.groupby('platform', observed=True)['rating'].transform('mean')
+    return restaurants.drop(columns='coordinate_issue')
+
+# Function to get the rated restaurants of a set of platforms, reloaded once the snapshot or the databases change.
+# The cached frame is shared between calls, so callers get their own copy
+def rated_restaurants(platforms):
+    platforms = tuple(platforms)
+    return _rated_restaurants(platforms, table_version('restaurants', platforms)).copy()
+
+# Function to list the restaurants whose categories (kind='category') or menu items (kind='item') match a term
+def matching_restaurants(term, platforms, kinds=('category', 'item')):
+    frames = [search_menu(term, list(platforms), kind=kind)[['platform', 'restaurant_id']] for kind in kinds]
+    matches = pd.concat(frames, ignore_index=True)
+    matches['restaurant_id'] = matches['restaurant_id'].astype('string')
+    return matches.drop_duplicates()
+
+# Function to find the positions of the n best scores, best first, without sorting the others (ties go to more ratings)
+def top_positions(scores, counts, n):
+    if len(scores) > n:
+        candidates = np.argpartition(-scores, n - 1)[:n]
+    else:
+        candidates = np.arange(len(scores))
+    order = np.lexsort((-counts[candidates], -scores[candidates]))
+    return candidates[order]
+
+# Function to keep the best-scored listing of each restaurant listed on several platforms
+def collapse_listings(ranked):
+    if len(ranked) < 2:
+        return ranked
+    listings = match_restaurants(ranked[['platform', 'restaurant_id', 'name', 'postal_code', 'latitude', 'longitude']])
+    ranked = ranked.assign(canonical_id=listings['canonical_id'].to_numpy())
+    ranked = ranked.sort_values(['adjusted_rating', 'rating_count'], ascending=False, kind='stable')
+    return ranked.drop_duplicates('canonical_id').drop(columns='canonical_id').reset_index(drop=True)
+
+# Function to rank the restaurants matching a dish or category across the platforms by their Bayesian-adjusted rating:
+# (v * R + m * C) / (v + m) with v the number of ratings, R the rating, m the prior weight and C the platform average
+@instrumented()
+def rank_restaurants(term, n=TOP_N, kinds=('category', 'item'), platforms=None, min_ratings=MIN_RATINGS,
+                     prior_ratings=PRIOR_RATINGS, per_platform=False):
+    platforms = tuple(platforms or PLATFORMS)
+    # Merging leaves the cached frame untouched, so it is read without a copy
+    restaurants = _rated_restaurants(platforms, table_version('restaurants', platforms))
+    matches = matching_restaurants(term, platforms, kinds)
+    candidates = restaurants.merge(matches, on=['platform', 'restaurant_id'])
+    candidates = candidates[candidates['rating_count'] >= min_ratings]
+
+    counts = candidates['rating_count'].to_numpy(dtype=float)
+    ratings = candidates['rating'].to_numpy(dtype=float)
+    scores = (counts * ratings + prior_ratings * candidates['platform_rating'].to_numpy(dtype=float)) / (counts + prior_ratings)
+    candidates = candidates.assign(adjusted_rating=scores)
+
+    # One partial sort per platform; the best n restaurants overall have their best listing among the best n of its platform
+    best = []
+    for platform, group in candidates.groupby('platform', observed=True, sort=False):
+        with stage('top_positions', platform, rows=len(group)):
+            positions = top_positions(group['adjusted_rating'].to_numpy(), group['rating_count'].to_numpy(dtype=float), n)
+        best.append(group.iloc[positions].assign(rank=np.arange(1, len(positions) + 1)))
+    columns = list(candidates.columns) + ['rank']
+    ranked = pd.concat(best, ignore_index=True) if best else pd.DataFrame(columns=columns)
+
+    if not per_platform:
+        # The same restaurant on several platforms takes one place, with its best listing
+        ranked = collapse_listings(ranked)
+        positions = top_positions(ranked['adjusted_rating'].to_numpy(dtype=float), ranked['rating_count'].to_numpy(dtype=float), n)
+        ranked = ranked.iloc[positions].assign(rank=np.arange(1, len(positions) + 1))
+    ranked = ranked.drop(columns='platform_rating').reset_index(drop=True)
+    return gpd.GeoDataFrame(ranked, geometry=gpd.points_from_xy(ranked['longitude'], ranked['latitude']), crs='EPSG:4326')
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Rank the best places for a dish or category across the platforms')
+    parser.add_argument('term', help="dish or category, e.g. 'pizza'")
+    parser.add_argument('-n', type=int, default=TOP_N, help='places to return')
+    parser.add_argument('--kinds', nargs='*', default=['category', 'item'], choices=['category', 'item'], help='match the categories, the menu items or both')
+    parser.add_argument('--per-platform', action='store_true', help='rank each platform on its own')
+    args = parser.parse_args()
+    ranked = rank_restaurants(args.term, args.n, args.kinds, per_platform=args.per_platform)
+    print(ranked[['rank', 'platform', 'name', 'city', 'rating', 'rating_count', 'adjusted_rating']].to_string(index=False))
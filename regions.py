@@ -0,0 +1,104 @@
+from functools import lru_cache
+import hashlib
+import os
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+from shapely.strtree import STRtree
+from instrumentation import instrumented
+
+# Shapefile of the three Belgian regions (Flanders, Wallonia and Brussels-Capital)
+REGION_SHAPEFILE = 'map/régions_08.shp'
+
+# Column of the shapefile holding the region name
+REGION_NAME_COLUMN = 'Nom'
+
+# Regions that are also a province on their own
+REGION_PROVINCES = {
+    'Bruxelles-Capitale': 'Brussels-Capital Region',
+}
+
+# Points tested against the polygons at a time, keeps memory flat for menu-level point counts
+BATCH_SIZE = 1_000_000
+
+# Directory holding the reprojected (and simplified) copies of the shapefile
+REGION_CACHE_DIR = os.environ.get('REGION_CACHE_DIR', '.cache/regions')
+
+# Simplification tolerance in metres for each zoom level, None keeps every vertex
+ZOOM_TOLERANCES = {
+    'country': 250,
+    'province': 50,
+    'city': 10,
+    'full': None,
+}
+
+# Function to fingerprint the shapefile and its sidecar files by size and modification time
+def shapefile_fingerprint(path=REGION_SHAPEFILE):
+    base, _ = os.path.splitext(path)
+    parts = []
+    for extension in ['.shp', '.shx', '.dbf', '.prj', '.cpg']:
+        if os.path.exists(base + extension):
+            stat = os.stat(base + extension)
+            parts.append(f'{extension}:{stat.st_size}:{stat.st_mtime_ns}')
+    return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()[:16]
+
+# Function to read and reproject the shapefile, simplifying it first when a tolerance is given
+def read_regions(tolerance=None):
+    region = gpd.read_file(REGION_SHAPEFILE)
+    if tolerance:
+        # The shapefile is in Belgian Lambert 2008, so the tolerance is in metres
+        region['geometry'] = region.geometry.simplify(tolerance, preserve_topology=True)
+    return region.to_crs(epsg=4326)
+
+# Function to load the region polygons in WGS84, from the GeoParquet cache unless the shapefile changed
+def load_regions(zoom='full', tolerance=None):
+    if tolerance is None:
+        tolerance = ZOOM_TOLERANCES[zoom]
+    cache_path = os.path.join(REGION_CACHE_DIR, f'regions-{shapefile_fingerprint()}-{tolerance or 0}.parquet')
+    try:
+        return gpd.read_parquet(cache_path)
+    except (OSError, ImportError, ValueError):
+        pass
+
+    region = read_regions(tolerance)
+    try:
+        os.makedirs(REGION_CACHE_DIR, exist_ok=True)
+        # Drop the copies made from an older version of the shapefile
+        for name in os.listdir(REGION_CACHE_DIR):
+            if not name.startswith(f'regions-{shapefile_fingerprint()}-'):
+                os.remove(os.path.join(REGION_CACHE_DIR, name))
+        tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+        region.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, cache_path)
+    except (OSError, ImportError, ValueError) as e:
+        print(f"Not caching region boundaries: {e}")
+    return region
+
+# Function to build the spatial index over the region polygons once per process
+@lru_cache(maxsize=None)
+def get_region_index():
+    region = load_regions()
+    polygons = region.geometry.values
+    # Prepared polygons make the exact point-in-polygon test fast
+    shapely.prepare(polygons)
+    return STRtree(polygons), polygons, region[REGION_NAME_COLUMN].to_numpy(dtype=object)
+
+# Function to find the region polygon containing each point, in bulk
+@instrumented()
+def assign_regions(df, longitude='longitude', latitude='latitude', batch_size=BATCH_SIZE):
+    tree, polygons, names = get_region_index()
+    longitudes = pd.to_numeric(df[longitude], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    latitudes = pd.to_numeric(df[latitude], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+
+    regions = np.full(len(df), None, dtype=object)
+    for start in range(0, len(df), batch_size):
+        x = longitudes[start:start + batch_size]
+        y = latitudes[start:start + batch_size]
+        # The tree only returns the polygons whose bounding box holds the point, missing coordinates match none
+        point_index, region_index = tree.query(shapely.points(x, y))
+        for i in np.unique(region_index):
+            candidates = point_index[region_index == i]
+            inside = shapely.contains_xy(polygons[i], x[candidates], y[candidates])
+            regions[start + candidates[inside]] = names[i]
+    return pd.Series(regions, index=df.index, name='region')
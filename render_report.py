@@ -0,0 +1,157 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import json
+import os
+import matplotlib
+
+# No display on the report machine, every figure is drawn straight to a file
+matplotlib.use('Agg')
+
+import matplotlib.pyplot as plt
+from database import DATABASES, MAX_WORKERS
+from distribution_across_provinces import get_combined_counts, plot_province_counts
+from distribution_map import create_dataframe, plot_individual_and_combined_restaurants
+import instrumentation
+from instrumentation import stage
+from kapsalons import fetch_kapsalons, plot_kapsalon_grid
+from platforms import PLATFORMS
+from price_stats import plot_price_distribution, price_sketches
+from query_cache import database_fingerprint
+from regions import shapefile_fingerprint
+from snapshot import SNAPSHOT_DIR, load_restaurants
+from vegetarian import fetch_data, plot_vegetarian_restaurants
+from venn import fetch_restaurant_ids, plot_venn
+
+# Directory the figures are written to
+REPORT_DIR = os.environ.get('REPORT_DIR', 'report')
+
+# File formats every figure is saved in
+REPORT_FORMATS = ['png', 'svg']
+
+# Fingerprint of the inputs of every figure at the time it was last rendered
+FINGERPRINT_FILE = 'fingerprints.json'
+
+# Function to draw the restaurant count per province
+def render_provinces():
+    return {'distribution_across_provinces': plot_province_counts(get_combined_counts())}
+
+# Function to draw the restaurant maps per platform and combined
+def render_restaurant_maps():
+    restaurants = load_restaurants(columns=['platform', 'latitude', 'longitude'], valid_coordinates=True)
+    frames = {platform: create_dataframe(restaurants, platform) for platform in PLATFORMS}
+    return {'distribution_of_restaurants': plot_individual_and_combined_restaurants(frames)}
+
+# Function to draw the overlap of the platforms
+def render_venn():
+    return {'restaurants_between_platforms': plot_venn(fetch_restaurant_ids())}
+
+# Function to draw the vegetarian restaurant maps
+def render_vegetarian():
+    return {'vegetarian_restaurants': plot_vegetarian_restaurants(fetch_data())}
+
+# Function to draw the menu price distribution of each platform and of all of them
+def render_prices():
+    sketches = price_sketches()
+    figures = {f'price_distribution_{platform.lower()}': plot_price_distribution(sketches[platform], spec['color'], f'{platform} price distribution')
+               for platform, spec in PLATFORMS.items()}
+    figures['price_distribution_all'] = plot_price_distribution(sketches['All'], 'purple', 'All prices distribution', show_summary=True)
+    return figures
+
+# Function to draw where kapsalons are sold
+def render_kapsalons():
+    return {'kapsalons': plot_kapsalon_grid(fetch_kapsalons())}
+
+# Every figure task with the canonical tables it reads and whether it draws the region boundaries
+FIGURES = {
+    'provinces': {'render': render_provinces, 'tables': ['restaurants'], 'regions': False},
+    'restaurant_maps': {'render': render_restaurant_maps, 'tables': ['restaurants'], 'regions': True},
+    'venn': {'render': render_venn, 'tables': ['restaurants'], 'regions': False},
+    'vegetarian': {'render': render_vegetarian, 'tables': ['restaurants'], 'regions': True},
+    'prices': {'render': render_prices, 'tables': ['menu_items'], 'regions': False},
+    'kapsalons': {'render': render_kapsalons, 'tables': ['restaurants', 'menu_items'], 'regions': True},
+}
+
+# Function to fingerprint a table of the Parquet snapshot by the size and modification time of its files
+def snapshot_fingerprint(table, snapshot_dir=SNAPSHOT_DIR):
+    parts = []
+    for root, _, files in os.walk(os.path.join(snapshot_dir, table)):
+        for name in sorted(files):
+            stat = os.stat(os.path.join(root, name))
+            parts.append(f'{os.path.relpath(os.path.join(root, name), snapshot_dir)}:{stat.st_size}:{stat.st_mtime_ns}')
+    return hashlib.sha256('|'.join(sorted(parts)).encode('utf-8')).hexdigest()
+
+# Function to fingerprint everything a figure task reads: the platform specs and databases, its snapshot tables and the regions
+def input_fingerprint(figure):
+    spec = FIGURES[figure]
+    payload = {
+        'platforms': PLATFORMS,
+        'databases': {platform: database_fingerprint(path) for platform, path in DATABASES.items() if os.path.exists(path)},
+        'snapshot': {table: snapshot_fingerprint(table) for table in spec['tables']},
+        'regions': shapefile_fingerprint() if spec['regions'] else None,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+# Function to list the files a figure task wrote last time
+def _output_paths(output_dir, names, formats):
+    return [os.path.join(output_dir, f'{name}.{extension}') for name in names for extension in formats]
+
+# Function to run one figure task and save its figures, meant to run in a worker process
+def render_figure(figure, output_dir=REPORT_DIR, formats=REPORT_FORMATS):
+    with stage(f'render {figure}'):
+        figures = FIGURES[figure]['render']()
+        for name, fig in figures.items():
+            for path in _output_paths(output_dir, [name], formats):
+                with stage('savefig', file=os.path.basename(path)):
+                    fig.savefig(path, dpi=150, bbox_inches='tight')
+            plt.close(fig)
+    # Pool workers do not run exit handlers, so each task writes its own profile
+    if instrumentation.PROFILING:
+        instrumentation.write_profile()
+        instrumentation.reset_profile()
+    return sorted(figures)
+
+# Function to render every figure whose inputs changed since the last report, each task in its own process
+def render_report(output_dir=REPORT_DIR, figures=None, formats=REPORT_FORMATS, force=False, max_workers=MAX_WORKERS):
+    os.makedirs(output_dir, exist_ok=True)
+    state_path = os.path.join(output_dir, FINGERPRINT_FILE)
+    state = {}
+    if os.path.exists(state_path):
+        with open(state_path, encoding='utf-8') as f:
+            state = json.load(f)
+
+    to_render = {}
+    for figure in figures or FIGURES:
+        fingerprint = input_fingerprint(figure)
+        previous = state.get(figure, {})
+        outputs = _output_paths(output_dir, previous.get('outputs', []), formats)
+        if not force and previous.get('fingerprint') == fingerprint and outputs and all(os.path.exists(path) for path in outputs):
+            print(f"Skipping {figure}, its inputs have not changed")
+            continue
+        to_render[figure] = fingerprint
+
+    if to_render:
+        with ProcessPoolExecutor(max_workers=max_workers or min(len(to_render), os.cpu_count() or 1)) as executor:
+            futures = {figure: executor.submit(render_figure, figure, output_dir, formats) for figure in to_render}
+            for figure, future in futures.items():
+                # A failing figure keeps its old fingerprint so the next run tries it again, the others are still saved
+                try:
+                    outputs = future.result()
+                except Exception as e:
+                    print(f"Failed to render {figure}: {e}")
+                    continue
+                state[figure] = {'fingerprint': to_render[figure], 'outputs': outputs}
+                print(f"Rendered {figure}: {', '.join(outputs)}")
+
+        with open(state_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2, sort_keys=True)
+    return state
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Render every report figure to PNG/SVG without a display')
+    parser.add_argument('--output', default=REPORT_DIR, help='directory the figures are written to')
+    parser.add_argument('--figures', nargs='*', choices=list(FIGURES), help='figure tasks to render (default: all)')
+    parser.add_argument('--formats', nargs='*', default=REPORT_FORMATS, help='file formats to save')
+    parser.add_argument('--force', action='store_true', help='render even when the inputs have not changed')
+    args = parser.parse_args()
+    render_report(args.output, args.figures, args.formats, args.force)
@@ -0,0 +1,75 @@
+import math
+import os
+import matplotlib.pyplot as plt
+import numpy as np
+import seaborn as sns
+from matplotlib.colors import LinearSegmentedColormap, LogNorm, to_rgba
+from instrumentation import instrumented
+
+# Longitude and latitude range of the Belgium maps (xmin, xmax, ymin, ymax)
+MAP_EXTENT = (2.5, 6, 50.5, 51.7)
+
+# Grid cells of the density images, 0.005 degrees (about 350 m x 550 m) over Belgium
+DENSITY_RESOLUTION = (700, 240)
+
+# Above this many points the maps switch from one marker per point to a density image
+SCATTER_MAX_POINTS = 20_000
+
+# 'scatter', 'density' or 'auto' (picks by number of points)
+RENDER_MODE = os.environ.get('MAP_RENDER_MODE', 'auto')
+
+# Function to bin points into a fixed grid and draw the counts as a single image
+def plot_density(ax, df, color, label=None, alpha=1, extent=MAP_EXTENT, resolution=DENSITY_RESOLUTION):
+    longitudes = df['longitude'].to_numpy(dtype=float, na_value=np.nan)
+    latitudes = df['latitude'].to_numpy(dtype=float, na_value=np.nan)
+    valid = np.isfinite(longitudes) & np.isfinite(latitudes)
+
+    counts, _, _ = np.histogram2d(longitudes[valid], latitudes[valid], bins=resolution,
+                                  range=[[extent[0], extent[1]], [extent[2], extent[3]]])
+    counts = np.ma.masked_equal(counts.T, 0)
+
+    # Empty cells stay transparent, busy cells get the full platform colour
+    cmap = LinearSegmentedColormap.from_list(f'density_{color}', [to_rgba(color, 0.35), to_rgba(color, 1)])
+    aspect = ax.get_aspect()
+    ax.imshow(counts, extent=extent, origin='lower', cmap=cmap, norm=LogNorm(vmin=1, vmax=max(counts.max(), 1)),
+              alpha=alpha, interpolation='nearest', zorder=2)
+    ax.set_aspect(aspect)
+
+    # Images have no legend entry, so add an empty marker for it
+    if label is not None:
+        ax.scatter([], [], color=color, s=20, label=label)
+
+# Function to draw points as a scatter plot or a density image depending on the render mode
+@instrumented()
+def plot_points(ax, df, color=None, label=None, mode=None, s=20, alpha=1, hue=None, palette=None):
+    mode = mode or RENDER_MODE
+    if mode == 'auto':
+        mode = 'scatter' if len(df) <= SCATTER_MAX_POINTS else 'density'
+
+    if mode == 'scatter':
+        if hue is not None:
+            sns.scatterplot(x='longitude', y='latitude', data=df, hue=hue, palette=palette, s=s, ax=ax, alpha=alpha)
+        else:
+            sns.scatterplot(x='longitude', y='latitude', data=df, color=color, s=s, ax=ax, alpha=alpha, label=label)
+        return
+
+    # One image per layer, coloured like the scatter plot would be
+    if hue is not None:
+        # Same order of appearance as seaborn's hue levels, so colours match the scatter mode
+        names = df[hue].dropna().unique()
+        colors = [palette[name] for name in names] if isinstance(palette, dict) else sns.color_palette(palette, len(names))
+        for name, group_color in zip(names, colors):
+            plot_density(ax, df[df[hue] == name], group_color, label=name, alpha=alpha)
+    else:
+        plot_density(ax, df, color, label=label, alpha=alpha)
+
+# Function to lay out one map per platform plus a combined one, two per row, and hide the cells left over
+def platform_panels(platforms, panel_size=(7, 6)):
+    panels = len(platforms) + 1
+    columns = min(panels, 2)
+    rows = math.ceil(panels / columns)
+    fig, axes = plt.subplots(rows, columns, figsize=(panel_size[0] * columns, panel_size[1] * rows), squeeze=False)
+    axes = axes.ravel()
+    for ax in axes[panels:]:
+        ax.set_visible(False)
+    return fig, axes[:panels]
@@ -0,0 +1,335 @@
+import argparse
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from database import DATABASES, read_platforms, read_query
+from coordinates import COORDINATE_ISSUES, find_coordinate_issues
+from instrumentation import instrumented
+from platforms import CANONICAL_QUERIES, PLATFORMS
+from regions import REGION_PROVINCES, assign_regions
+from tagging import TAG_KEYS, count_tags, merge_tag_counts, restaurant_tags, tag_texts
+from postal_codes import ALL_PROVINCES, UNKNOWN_PROVINCE, clean_postal_codes, postal_code_to_province
+from query_cache import database_fingerprint
+
+# Directory of the unified Parquet dataset built by this script
+SNAPSHOT_DIR = os.environ.get('SNAPSHOT_DIR', 'snapshot')
+
+# File of the dataset holding the fingerprints of the databases it was built from
+FINGERPRINT_FILE = 'fingerprints.json'
+
+# Rows read from SQLite and written to Parquet at a time
+CHUNK_SIZE = 500_000
+
+# Columns each table is partitioned by on disk
+PARTITION_COLUMNS = {
+    'restaurants': ['platform', 'province'],
+    'menu_items': ['platform', 'province'],
+    'categories': ['platform', 'province'],
+    'locations': ['platform', 'province'],
+}
+
+# Function to undo the double encoding of scraped texts, UTF-8 bytes read as Latin-1 (e.g. 'liÃ¨ge' for 'liège').
+# Texts that are not double encoded are kept, and each distinct text is repaired once
+def repair_encoding(texts):
+    codes, uniques = pd.factorize(texts.astype('string'))
+    repaired = []
+    for text in uniques:
+        try:
+            repaired.append(text.encode('latin1').decode('utf8'))
+        except UnicodeError:
+            repaired.append(text)
+    # The extra last slot is for missing texts, whose code is -1
+    return pd.Series(np.array(repaired + [None], dtype=object)[codes], index=texts.index, dtype='string')
+
+# Function to derive the province from the postal code, falling back on the platform's region name
+def assign_province(df, platform):
+    postal_codes = clean_postal_codes(df['postal_code'])
+    province = postal_code_to_province(postal_codes)
+    from_region = repair_encoding(df['region']).str.lower().map(PLATFORMS[platform]['region_names'])
+    unknown = province.isna() | (province == UNKNOWN_PROVINCE)
+    province = province.where(~unknown, from_region)
+    return postal_codes.astype('Int64'), province.fillna(UNKNOWN_PROVINCE)
+
+# Platforms and provinces have a fixed set of values, so every chunk and platform shares the same categories
+PLATFORM_DTYPE = pd.CategoricalDtype(list(PLATFORMS))
+PROVINCE_DTYPE = pd.CategoricalDtype(ALL_PROVINCES + [UNKNOWN_PROVINCE])
+
+# Type of every column of the canonical schema, as small as the values allow:
+# repeated labels are categoricals, coordinates float32 (well under a metre at Belgian latitudes) and prices whole cents
+COLUMN_TYPES = {
+    'platform': PLATFORM_DTYPE,
+    'restaurant_id': 'string',
+    'item_id': 'string',
+    'location_id': 'string',
+    'name': 'string',
+    'address': 'string',
+    'city': 'category',
+    'description': 'string',
+    'category': 'category',
+    'province': PROVINCE_DTYPE,
+    'region': 'category',
+    'postal_code': 'Int16',
+    'latitude': 'float32',
+    'longitude': 'float32',
+    'rating': 'float32',
+    'rating_count': 'float32',
+    'delivery_fee': 'float32',
+    'price_cents': 'Int32',
+    'coordinate_issue': pd.CategoricalDtype(COORDINATE_ISSUES),
+    'tags': 'uint32',
+}
+
+# Text column whose words give the tags of each row (see tagging.py)
+TAGGED_COLUMNS = {
+    'menu_items': 'name',
+    'categories': 'category',
+}
+
+# Categoricals whose categories depend on the data, so frames concatenated across platforms have to be cast again
+OPEN_CATEGORIES = [column for column, dtype in COLUMN_TYPES.items() if dtype == 'category']
+
+# Function to cast a column to its canonical type; numbers outside the range of an integer type become missing
+def _cast(values, dtype):
+    if isinstance(dtype, pd.CategoricalDtype) or dtype in ('string', 'category'):
+        return values.astype(dtype)
+    # Coordinates, ratings and prices are stored as text on some platforms
+    numbers = pd.to_numeric(values, errors='coerce')
+    if dtype.startswith('Int'):
+        limits = np.iinfo(dtype.lower())
+        numbers = numbers.where(numbers.between(limits.min, limits.max)).round()
+    return numbers.astype(dtype)
+
+# Function to cast the columns of a frame, or only the given ones, to the canonical schema
+def apply_schema(df, columns=None):
+    for column in columns or COLUMN_TYPES:
+        if column in df:
+            df[column] = _cast(df[column], COLUMN_TYPES[column])
+    return df
+
+# Function to turn a chunk of a platform table into the canonical column types
+@instrumented()
+def to_canonical(table, df, platform):
+    df = df.copy()
+    df['platform'] = platform
+    if 'postal_code' in df:
+        df['postal_code'], df['province'] = assign_province(df, platform)
+        df = df.drop(columns='region')
+    if 'latitude' in df:
+        # Region polygons give the same geography on every platform, also without a postal code
+        df['region'] = assign_regions(df)
+        from_region = df['region'].map(REGION_PROVINCES)
+        df['province'] = df['province'].where((df['province'] != UNKNOWN_PROVINCE) | from_region.isna(), from_region)
+        # Rows keep their coordinates, the reason they are unusable is checked once here and stored next to them
+        df['coordinate_issue'] = find_coordinate_issues(df, df['region'], platform)
+
+    if 'rating_count' in df and not pd.api.types.is_numeric_dtype(df['rating_count']):
+        # Review counts are text like '500+' on some platforms
+        df['rating_count'] = df['rating_count'].astype('string').str.replace(r'[^\d.]', '', regex=True)
+    if table in TAGGED_COLUMNS:
+        df['tags'] = tag_texts(df[TAGGED_COLUMNS[table]])
+    if 'price' in df:
+        df['price_cents'] = pd.to_numeric(df.pop('price'), errors='coerce') * 100
+    return apply_schema(df)
+
+# Function to add the tags bitmask of each restaurant from the tag counts of its categories and menu items
+def with_restaurant_tags(restaurants, category_counts, item_counts):
+    tags = restaurant_tags(category_counts, item_counts)
+    tags['platform'] = tags['platform'].astype(restaurants['platform'].dtype)
+    tags['restaurant_id'] = tags['restaurant_id'].astype('string')
+    restaurants = restaurants.drop(columns='tags', errors='ignore').merge(tags, on=TAG_KEYS, how='left')
+    restaurants['tags'] = restaurants['tags'].fillna(0).astype(COLUMN_TYPES['tags'])
+    return restaurants
+
+# Function to write a chunk of a table into the partitioned dataset
+def write_chunk(df, table, output_dir, part):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    pq.write_to_dataset(
+        pa.Table.from_pandas(df, preserve_index=False),
+        root_path=os.path.join(output_dir, table),
+        partition_cols=PARTITION_COLUMNS[table],
+        basename_template=f'part-{part}-{{i}}.parquet',
+    )
+
+# Function to read the fingerprints of the databases the dataset was built from, per platform
+def read_fingerprints(snapshot_dir=SNAPSHOT_DIR):
+    try:
+        with open(os.path.join(snapshot_dir, FINGERPRINT_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+# Function to write the fingerprints of the databases the dataset was built from
+def write_fingerprints(fingerprints, snapshot_dir=SNAPSHOT_DIR):
+    with open(os.path.join(snapshot_dir, FINGERPRINT_FILE), 'w', encoding='utf-8') as f:
+        json.dump(fingerprints, f, indent=2, sort_keys=True)
+
+# Function to compile the SQLite scrapes into one partitioned Parquet dataset. Only the partitions of the exported
+# platforms are replaced, so `--platforms X` refreshes X and keeps the other platforms of the dataset
+def build_snapshot(output_dir=SNAPSHOT_DIR, platforms=None, chunksize=CHUNK_SIZE):
+    platforms = platforms or list(CANONICAL_QUERIES['restaurants'])
+    os.makedirs(output_dir, exist_ok=True)
+    # The exported platforms lose their fingerprints until they are fully written, so an interrupted export reads as stale
+    fingerprints = {platform: fingerprint for platform, fingerprint in read_fingerprints(output_dir).items()
+                    if platform in PLATFORMS and platform not in platforms}
+    write_fingerprints(fingerprints, output_dir)
+    for platform in platforms:
+        for table in PARTITION_COLUMNS:
+            shutil.rmtree(os.path.join(output_dir, table, f'platform={platform}'), ignore_errors=True)
+    # Taken before reading, so a database written to during the export leaves the dataset stale
+    exported = {platform: database_fingerprint(DATABASES[platform]) for platform in platforms}
+
+    for platform in platforms:
+        # Rows of the child tables take the province of their restaurant
+        restaurants = to_canonical('restaurants', read_query(platform, CANONICAL_QUERIES['restaurants'][platform], use_cache=False), platform)
+        provinces = restaurants.set_index('restaurant_id')['province']
+
+        tag_counts = {table: [] for table in TAGGED_COLUMNS}
+        for table in ['menu_items', 'categories', 'locations']:
+            chunks = read_query(platform, CANONICAL_QUERIES[table][platform], chunksize=chunksize)
+            for i, chunk in enumerate(chunks):
+                chunk = to_canonical(table, chunk, platform)
+                if 'province' not in chunk:
+                    chunk['province'] = chunk['restaurant_id'].map(provinces).fillna(UNKNOWN_PROVINCE)
+                    chunk = apply_schema(chunk, ['province'])
+                if table in tag_counts:
+                    tag_counts[table].append(count_tags(chunk))
+                write_chunk(chunk, table, output_dir, f'{platform}-{i}')
+
+        # Restaurants are written last, tagged once from all their categories and their whole menu
+        restaurants = with_restaurant_tags(restaurants, merge_tag_counts(tag_counts['categories']), merge_tag_counts(tag_counts['menu_items']))
+        write_chunk(restaurants, 'restaurants', output_dir, f'{platform}-0')
+        print(f"Exported {platform} to {output_dir}")
+
+    # Written last, a platform without its fingerprint was not fully exported
+    write_fingerprints(dict(fingerprints, **exported), output_dir)
+
+# Stale datasets already reported, so the warning is not repeated on every read
+_reported_stale = set()
+
+# Function to list the platforms missing from the dataset or whose database changed since they were exported
+def stale_platforms(snapshot_dir=SNAPSHOT_DIR):
+    fingerprints = read_fingerprints(snapshot_dir)
+    stale = []
+    for platform in PLATFORMS:
+        if platform not in fingerprints:
+            stale.append(platform)
+        # A database that is gone leaves the dataset as the only copy of its rows
+        elif os.path.exists(DATABASES[platform]) and database_fingerprint(DATABASES[platform]) != fingerprints[platform]:
+            stale.append(platform)
+    return stale
+
+# Function to check whether the Parquet dataset has been built from the current databases.
+# A stale dataset is not read, the tables come from SQLite until it is built again
+def snapshot_exists(table='restaurants', snapshot_dir=SNAPSHOT_DIR):
+    if not os.path.isdir(os.path.join(snapshot_dir, table)):
+        return False
+    stale = stale_platforms(snapshot_dir)
+    if stale:
+        state = (os.path.abspath(snapshot_dir), tuple(database_fingerprint(DATABASES[platform]) for platform in stale if os.path.exists(DATABASES[platform])))
+        if state not in _reported_stale:
+            _reported_stale.add(state)
+            print(f"Snapshot in {snapshot_dir} is missing or older than the {', '.join(stale)} database, reading SQLite instead (run 'python snapshot.py' to rebuild it)")
+        return False
+    return True
+
+# Function to read a table of the dataset, keeping only the requested columns, platforms and provinces
+def read_snapshot(table, columns=None, platforms=None, provinces=None, snapshot_dir=SNAPSHOT_DIR):
+    filters = []
+    if platforms is not None:
+        filters.append(('platform', 'in', list(platforms)))
+    if provinces is not None:
+        filters.append(('province', 'in', list(provinces)))
+
+    df = pd.read_parquet(
+        os.path.join(snapshot_dir, table),
+        engine='pyarrow',
+        columns=columns,
+        filters=filters or None,
+        memory_map=True,
+    )
+    # Partition columns come back with the categories found on disk, give them the same ones as the SQLite path
+    return apply_schema(df)
+
+# Function to load a table in the canonical schema, from the dataset when it exists or else from SQLite
+@instrumented()
+def load_table(table, columns=None, platforms=None, valid_coordinates=False):
+    platforms = platforms or list(CANONICAL_QUERIES[table])
+    # Dropping the rows with unusable coordinates needs their coordinate_issue, even when it is not asked for
+    read_columns = columns
+    if valid_coordinates and columns and 'coordinate_issue' not in columns:
+        read_columns = columns + ['coordinate_issue']
+
+    if snapshot_exists(table):
+        df = read_snapshot(table, columns=read_columns, platforms=platforms)
+    else:
+        df = read_platforms({platform: CANONICAL_QUERIES[table][platform] for platform in platforms})
+        frames = [to_canonical(table, group.drop(columns='platform'), platform) for platform, group in df.groupby('platform', sort=False)]
+        if not frames:
+            # No platform has rows, the empty frame still gets the canonical columns and types
+            frames = [to_canonical(table, df.drop(columns='platform'), platforms[0])]
+        # Columns a platform does not have (e.g. no city on Deliveroo) are left out of the concat and typed again afterwards,
+        # like the categoricals whose categories differ per platform
+        df = pd.concat([frame.dropna(axis=1, how='all') for frame in frames], ignore_index=True).reindex(columns=frames[0].columns)
+        df = apply_schema(df, [column for column in df if column in OPEN_CATEGORIES or df[column].dtype != frames[0][column].dtype])
+
+        if table == 'restaurants' and read_columns and 'tags' in read_columns:
+            # Without the dataset the tags come from scanning the categories and menus of the platforms
+            categories = load_table('categories', columns=TAG_KEYS + ['tags'], platforms=platforms)
+            items = load_table('menu_items', columns=TAG_KEYS + ['tags'], platforms=platforms)
+            df = with_restaurant_tags(df, count_tags(categories), count_tags(items))
+
+    if valid_coordinates:
+        df = df[df['coordinate_issue'].isna()].reset_index(drop=True)
+    return df[columns] if columns else df
+
+# Function to tell which version of a table load_table would read: the modification time of the dataset,
+# or without it the fingerprints of the platform databases. Caches of loaded tables are keyed on it
+def table_version(table, platforms=None):
+    if snapshot_exists(table):
+        return os.stat(os.path.join(SNAPSHOT_DIR, table)).st_mtime_ns
+    return tuple(database_fingerprint(DATABASES[platform]) for platform in platforms or CANONICAL_QUERIES[table])
+
+# Function to load the canonical restaurants table, optionally only the rows with usable coordinates
+def load_restaurants(columns=None, platforms=None, valid_coordinates=False):
+    return load_table('restaurants', columns, platforms, valid_coordinates)
+
+# Function to compare, per column, the memory of each table as read from SQLite with the same rows in the canonical schema
+def memory_report(tables=None, platforms=None):
+    platforms = platforms or list(CANONICAL_QUERIES['restaurants'])
+    rows = []
+    for table in tables or list(CANONICAL_QUERIES):
+        for platform in platforms:
+            raw = read_query(platform, CANONICAL_QUERIES[table][platform], use_cache=False)
+            lean = to_canonical(table, raw, platform)
+            before = raw.memory_usage(index=False, deep=True).rename({'price': 'price_cents'})
+            after = lean.memory_usage(index=False, deep=True)
+            for column in after.index:
+                rows.append({'table': table, 'platform': platform, 'column': column, 'dtype': str(lean[column].dtype),
+                             'before_bytes': int(before.get(column, 0)), 'after_bytes': int(after[column])})
+
+    report = pd.DataFrame(rows, columns=['table', 'platform', 'column', 'dtype', 'before_bytes', 'after_bytes'])
+    report['saved_bytes'] = report['before_bytes'] - report['after_bytes']
+    return report
+
+# Function to print the memory saved per table and column, summed over the platforms
+def print_memory_report(report):
+    per_column = report.groupby(['table', 'column', 'dtype'], sort=False)[['before_bytes', 'after_bytes', 'saved_bytes']].sum()
+    for table, columns in per_column.groupby(level='table', sort=False):
+        before, after = columns['before_bytes'].sum(), columns['after_bytes'].sum()
+        print(f"{table}: {before / 1024 ** 2:.1f} MB -> {after / 1024 ** 2:.1f} MB ({1 - after / max(before, 1):.0%} saved)")
+        print((columns.droplevel('table') / 1024 ** 2).round(2).rename(columns=lambda c: c.replace('_bytes', '_mb')).to_string())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Export the platform databases to a partitioned Parquet dataset')
+    parser.add_argument('--output', default=SNAPSHOT_DIR, help='directory of the dataset')
+    parser.add_argument('--platforms', nargs='*', help='platforms to export (default: all)')
+    parser.add_argument('--memory-report', action='store_true', help='only report the memory the canonical schema saves per table')
+    args = parser.parse_args()
+    if args.memory_report:
+        print_memory_report(memory_report(platforms=args.platforms))
+    else:
+        build_snapshot(args.output, args.platforms)
@@ -0,0 +1,291 @@
+import argparse
+import os
+import sqlite3
+import numpy as np
+from postal_codes import postal_code_to_province
+import pandas as pd
+
+# Delivery hubs with their postal codes, centre and share of the restaurants
+CITIES = [
+    ('Brussels', [1000, 1020, 1030, 1040, 1050, 1060, 1070, 1080, 1090, 1140, 1150, 1180, 1200], 50.8466, 4.3528, 20),
+    ('Antwerp', [2000, 2018, 2020, 2030, 2060, 2100, 2140, 2600], 51.2194, 4.4025, 12),
+    ('Ghent', [9000, 9030, 9040, 9050], 51.0543, 3.7174, 9),
+    ('Liège', [4000, 4020, 4030], 50.6326, 5.5797, 7),
+    ('Charleroi', [6000, 6001, 6010, 6040], 50.4108, 4.4446, 5),
+    ('Bruges', [8000, 8200], 51.2093, 3.2247, 4),
+    ('Leuven', [3000, 3001, 3010], 50.8798, 4.7005, 4),
+    ('Namur', [5000, 5002, 5100], 50.4674, 4.8720, 3),
+    ('Mons', [7000, 7020], 50.4542, 3.9523, 3),
+    ('Mechelen', [2800], 51.0259, 4.4776, 3),
+    ('Hasselt', [3500, 3510], 50.9307, 5.3325, 3),
+    ('Kortrijk', [8500, 8510], 50.8279, 3.2649, 3),
+    ('Ostend', [8400], 51.2154, 2.9275, 2),
+    ('Aalst', [9300], 50.9378, 4.0403, 2),
+    ('Sint-Niklaas', [9100], 51.1650, 4.1437, 2),
+    ('Genk', [3600], 50.9650, 5.5000, 2),
+    ('Wavre', [1300, 1301], 50.7170, 4.6014, 2),
+    ('Louvain-la-Neuve', [1348], 50.6681, 4.6118, 1),
+    ('Vilvoorde', [1800], 50.9281, 4.4245, 1),
+    ('Tournai', [7500], 50.6056, 3.3878, 1),
+    ('Verviers', [4800], 50.5891, 5.8624, 1),
+    ('Arlon', [6700], 49.6833, 5.8167, 1),
+]
+
+# Spread of the restaurants around their city centre, in degrees (about 3 km)
+CITY_SPREAD = 0.03
+
+# Cuisines with the dishes their menus are drawn from
+CUISINES = {
+    'Pizza': ['Pizza Margherita', 'Pizza Quattro Formaggi', 'Pizza Pepperoni', 'Pizza Vegetariana', 'Calzone', 'Tiramisu'],
+    'Burgers': ['Cheeseburger', 'Bacon Burger', 'Veggie Burger', 'Chicken Burger', 'Frites', 'Milkshake'],
+    'Kebab': ['Kapsalon', 'Durum Kebab', 'Pita Kebab', 'Kebab Plate', 'Falafel Durum', 'Frites'],
+    'Friterie': ['Frites', 'Kapsalon', 'Fricadelle', 'Mitraillette', 'Boulets Liégeois', 'Cervela'],
+    'Sushi': ['Salmon Maki', 'California Roll', 'Sashimi Mix', 'Edamame', 'Miso Soup', 'Poke Bowl'],
+    'Lebanese': ['Hummus', 'Falafel', 'Shawarma Plate', 'Tabbouleh', 'Baba Ganoush', 'Baklava'],
+    'Indian': ['Butter Chicken', 'Chicken Tikka Masala', 'Palak Paneer', 'Naan', 'Vegetable Biryani', 'Samosa'],
+    'Thai': ['Pad Thai', 'Green Curry', 'Tom Yum', 'Spring Rolls', 'Massaman Curry', 'Mango Sticky Rice'],
+    'Italian': ['Spaghetti Bolognese', 'Lasagna', 'Penne Arrabbiata', 'Risotto ai Funghi', 'Bruschetta', 'Panna Cotta'],
+    'Vegetarian': ['Buddha Bowl', 'Vegan Burger', 'Lentil Curry', 'Hummus Wrap', 'Quinoa Salad', 'Vegan Brownie'],
+    'Chicken': ['Fried Chicken Bucket', 'Chicken Wings', 'Chicken Nuggets', 'Coleslaw', 'Frites', 'Sundae'],
+    'Salads': ['Caesar Salad', 'Greek Salad', 'Chicken Salad', 'Vegan Salad', 'Smoothie', 'Granola Bowl'],
+}
+
+# Share of the restaurants of each cuisine
+CUISINE_WEIGHTS = [14, 14, 9, 9, 8, 6, 7, 5, 10, 5, 7, 6]
+
+# Words restaurant names are made of
+NAME_PREFIXES = ['La', 'Chez', 'Snack', 'Le Petit', 'Royal', 'Golden', 'Bella', 'Mama', 'Urban', 'Green', 'Sultan', 'Little', 'Casa', 'Dolce', 'Big']
+NAME_SUFFIXES = ['Express', 'House', 'Corner', 'Palace', 'Kitchen', 'Factory', 'Station', 'Garden', 'Lounge', 'Bistro']
+
+# Menu items per restaurant follow a log-normal distribution with about this mean
+MEAN_MENU_SIZE = 40
+
+# Share of one pool of restaurants listed on each platform; the overlaps are what the Venn diagram counts
+PLATFORM_SHARE = 0.4
+
+# Scraping noise: missing postal codes, (0, 0) coordinates and latitude/longitude swapped
+MISSING_POSTAL_CODE_RATE = 0.02
+ZERO_COORDINATES_RATE = 0.005
+SWAPPED_COORDINATES_RATE = 0.002
+
+# Restaurants generated and written at a time
+CHUNK_RESTAURANTS = 20_000
+
+# UberEats region slug of each province, as scraped (Liège comes with a broken encoding)
+REGION_SLUGS = {
+    'Antwerp': 'anvers',
+    'Brussels-Capital Region': 'bruxelles-capitale',
+    'East Flanders': 'flandre-orientale',
+    'Flemish Brabant': 'brabant-flamand',
+    'West Flanders': 'flandre-occidentale',
+    'Walloon Brabant': 'brabant-wallon',
+    'Limburg': 'limbourg',
+    'Liège': 'liÃ¨ge',
+    'Hainaut': 'hainaut',
+    'Namur': 'namur',
+    'Luxembourg': 'luxembourg',
+}
+
+# Tables of the three scrapes, as in databases_schema/
+SCHEMAS = {
+    'Deliveroo': """
+        CREATE TABLE restaurants (id INTEGER PRIMARY KEY, name TEXT, visited_time TEXT, latitude TEXT, longitude TEXT, menu_id INTEGER,
+            category TEXT, address TEXT, postal_code TEXT, prep_time INTEGER, delivery_time INTEGER, delivery_fee REAL,
+            fullfillment_method TEXT, min_order REAL, phonenumber TEXT, rating REAL, rating_number TEXT, uname TEXT);
+        CREATE TABLE categories (categorie_id INTEGER PRIMARY KEY, restaurant_id INTEGER, name TEXT);
+        CREATE TABLE menu_items (id INTEGER, restaurant_id INTEGER, categorie_id INTEGER, alcohol INTEGER, name TEXT, description TEXT,
+            price TEXT, PRIMARY KEY (id, restaurant_id));
+        CREATE TABLE locations (id INTEGER PRIMARY KEY, name TEXT, postalcode TEXT, latitude REAL, longitude REAL);
+        CREATE TABLE locations_to_restaurants (location_id INTEGER, restaurant_id INTEGER);
+    """,
+    'UberEats': """
+        CREATE TABLE restaurants (id INTEGER PRIMARY KEY, menu_uuid TEXT, visited_time TEXT, title TEXT, slug TEXT, cityslug TEXT,
+            location__address TEXT, location__street_address TEXT, location__city TEXT, location__country TEXT,
+            location__postal_code TEXT, location__region TEXT, location__latitude TEXT, location__longitude TEXT,
+            location__geo__city TEXT, location__geo__country TEXT, location__geo__neighborhood TEXT, location__geo__region TEXT,
+            location__location_type TEXT, is_delivery_third_party INTEGER, is_delivery_over_the_top INTEGER,
+            rating__rating_value REAL, rating__review_count TEXT, sanitized_title TEXT, city_id INTEGER,
+            is_delivery_bandwagon INTEGER, menu_display_type TEXT, has_multiple_menus INTEGER, parent_chain_uuid TEXT,
+            parent_chain_name TEXT);
+        CREATE TABLE restaurant_to_categories (restaurant_id INTEGER, category TEXT);
+        CREATE TABLE menu_sections (id INTEGER PRIMARY KEY, restaurant_id INTEGER, title TEXT);
+        CREATE TABLE menu_items (id INTEGER PRIMARY KEY, restaurant_id INTEGER, menu_section_id INTEGER, subsection_uuid TEXT,
+            name TEXT, description TEXT, price INTEGER, display_type TEXT, is_sold_out INTEGER, has_customizations INTEGER,
+            is_available INTEGER, price_tagline__accessibility_text TEXT);
+        CREATE TABLE locations (id INTEGER PRIMARY KEY, name TEXT, region TEXT, latitude REAL, longitude REAL, visited_time TEXT);
+        CREATE TABLE locations_to_restaurants (location_id INTEGER, restaurant_id INTEGER);
+    """,
+    'Takeaway': """
+        CREATE TABLE restaurants (primarySlug TEXT PRIMARY KEY, restaurant_id TEXT, name TEXT, address TEXT, city TEXT,
+            supportsDelivery INTEGER, supportsPickup INTEGER, paymentMethods TEXT, ratings REAL, ratingsNumber INTEGER,
+            deliveryScoober INTEGER, durationRangeMin INTEGER, durationRangeMax INTEGER, deliveryFee REAL, minOrder REAL,
+            latitude TEXT, longitude TEXT);
+        CREATE TABLE categories_restaurants (category_id TEXT, restaurant_id TEXT);
+        CREATE TABLE menuItems (ID INTEGER PRIMARY KEY, primarySlug TEXT, name TEXT, description TEXT, price REAL,
+            alcoholContent REAL, caffeineContent REAL);
+        CREATE TABLE categories (id INTEGER PRIMARY KEY, restaurant_id TEXT, name TEXT, item_id INTEGER);
+        CREATE TABLE locations (ID INTEGER PRIMARY KEY, name TEXT, postalCode INTEGER, latitude REAL, longitude REAL, city TEXT);
+        CREATE TABLE locations_to_restaurants (restaurant_id TEXT, location_id INTEGER);
+    """,
+}
+
+# Function to draw the pool of restaurants the platforms list, with name, city, postal code, coordinates, cuisine and menu size
+def restaurant_pool(size, rng):
+    city_weights = np.array([city[4] for city in CITIES], dtype=float)
+    cities = rng.choice(len(CITIES), size=size, p=city_weights / city_weights.sum())
+    cuisine_weights = np.array(CUISINE_WEIGHTS, dtype=float)
+    cuisine_names = np.array(list(CUISINES))
+
+    pool = pd.DataFrame({
+        'city': np.array([city[0] for city in CITIES], dtype=object)[cities],
+        'postal_code': pd.Series([int(rng.choice(CITIES[city][1])) for city in cities], dtype=object),
+        'latitude': np.array([city[2] for city in CITIES])[cities] + rng.normal(0, CITY_SPREAD, size),
+        'longitude': np.array([city[3] for city in CITIES])[cities] + rng.normal(0, CITY_SPREAD * 1.5, size),
+        'cuisine': cuisine_names[rng.choice(len(cuisine_names), size=size, p=cuisine_weights / cuisine_weights.sum())],
+        'menu_size': np.maximum(rng.lognormal(np.log(MEAN_MENU_SIZE) - 0.32, 0.8, size).astype(int), 1),
+        'rating': np.round(np.clip(rng.normal(4.2, 0.4, size), 1, 5), 1),
+        'rating_count': rng.negative_binomial(1, 0.01, size),
+        'delivery_fee': np.round(rng.choice([0, 1.5, 2, 2.5, 2.99, 3.5], size), 2),
+    })
+    prefixes = rng.choice(NAME_PREFIXES, size)
+    suffixes = rng.choice(NAME_SUFFIXES, size)
+    pool['name'] = [f'{prefix} {cuisine} {suffix}' for prefix, cuisine, suffix in zip(prefixes, pool['cuisine'], suffixes)]
+    pool['province'] = postal_code_to_province(pool['postal_code']).to_numpy()
+    return pool
+
+# Function to add the scraping noise to a platform's copy of the restaurants
+def add_noise(restaurants, rng):
+    restaurants = restaurants.copy()
+    n = len(restaurants)
+    restaurants.loc[rng.random(n) < MISSING_POSTAL_CODE_RATE, 'postal_code'] = None
+    zero = rng.random(n) < ZERO_COORDINATES_RATE
+    restaurants.loc[zero, ['latitude', 'longitude']] = 0.0
+    swapped = ~zero & (rng.random(n) < SWAPPED_COORDINATES_RATE)
+    restaurants.loc[swapped, ['latitude', 'longitude']] = restaurants.loc[swapped, ['longitude', 'latitude']].to_numpy()
+    return restaurants
+
+# Function to draw the menu items of a chunk of restaurants: one row per item with its restaurant position, dish and price
+def draw_menus(restaurants, rng):
+    sizes = restaurants['menu_size'].to_numpy()
+    owner = np.repeat(np.arange(len(restaurants)), sizes)
+    cuisines = np.repeat(restaurants['cuisine'].to_numpy(), sizes)
+    position = np.arange(len(owner)) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+
+    dishes = np.empty(len(owner), dtype=object)
+    for cuisine, names in CUISINES.items():
+        mask = cuisines == cuisine
+        dishes[mask] = np.array(names, dtype=object)[rng.integers(0, len(names), mask.sum())]
+    # Larger menus repeat dishes in variants
+    variants = position // 6
+    names = np.where(variants > 0, dishes + ' ' + (variants + 1).astype(str), dishes)
+
+    prices = np.round(np.clip(rng.lognormal(np.log(9), 0.45, len(owner)), 0.5, 80), 2)
+    return pd.DataFrame({'owner': owner, 'position': position, 'name': names, 'price': prices})
+
+# Function to write the Deliveroo tables of a chunk of restaurants
+def write_deliveroo(con, restaurants, menus, first_id, rng):
+    ids = np.arange(first_id, first_id + len(restaurants))
+    postal_codes = [None if code is None else (f'B-{code}' if noisy else str(code))
+                    for code, noisy in zip(restaurants['postal_code'], rng.random(len(restaurants)) < 0.1)]
+    con.executemany('INSERT INTO restaurants (id, name, visited_time, latitude, longitude, category, address, postal_code, delivery_fee, rating, rating_number) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', zip(
+        ids.tolist(), restaurants['name'], ['2024-10-01'] * len(ids), restaurants['latitude'].astype(str), restaurants['longitude'].astype(str),
+        restaurants['cuisine'], restaurants['city'], postal_codes, restaurants['delivery_fee'].tolist(),
+        restaurants['rating'].tolist(), restaurants['rating_count'].astype(str)))
+    # One menu section per restaurant, named after its cuisine
+    con.executemany('INSERT INTO categories (categorie_id, restaurant_id, name) VALUES (?, ?, ?)', zip(ids.tolist(), ids.tolist(), restaurants['cuisine']))
+    con.executemany('INSERT INTO menu_items (id, restaurant_id, categorie_id, name, description, price) VALUES (?, ?, ?, ?, ?, ?)', zip(
+        menus['position'].tolist(), ids[menus['owner']].tolist(), ids[menus['owner']].tolist(), menus['name'], menus['name'], menus['price'].astype(str)))
+    # Search locations are keyed by postal code, see write_locations
+    con.executemany('INSERT INTO locations_to_restaurants (location_id, restaurant_id) VALUES (?, ?)', (
+        (code, restaurant_id) for code, restaurant_id in zip(restaurants['postal_code'], ids.tolist()) if code is not None))
+
+# Function to write the UberEats tables of a chunk of restaurants
+def write_ubereats(con, restaurants, menus, first_id, rng):
+    ids = np.arange(first_id, first_id + len(restaurants))
+    # Half of the titles carry the neighbourhood, as on the website
+    titles = [f'{name} - {city}' if long else name for name, city, long in zip(restaurants['name'], restaurants['city'], rng.random(len(ids)) < 0.5)]
+    regions = [REGION_SLUGS.get(province) for province in restaurants['province']]
+    con.executemany('INSERT INTO restaurants (id, visited_time, title, location__street_address, location__city, location__postal_code, location__latitude, location__longitude, location__geo__region, rating__rating_value, rating__review_count) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', zip(
+        ids.tolist(), ['2024-10-01'] * len(ids), titles, restaurants['city'], restaurants['city'],
+        [None if code is None else str(code) for code in restaurants['postal_code']],
+        restaurants['latitude'].astype(str), restaurants['longitude'].astype(str), regions,
+        restaurants['rating'].tolist(), restaurants['rating_count'].astype(str)))
+    con.executemany('INSERT INTO restaurant_to_categories (restaurant_id, category) VALUES (?, ?)', zip(ids.tolist(), restaurants['cuisine']))
+    con.executemany('INSERT INTO menu_sections (id, restaurant_id, title) VALUES (?, ?, ?)', zip(ids.tolist(), ids.tolist(), restaurants['cuisine']))
+    # Prices are stored in cents
+    con.executemany('INSERT INTO menu_items (restaurant_id, menu_section_id, name, description, price) VALUES (?, ?, ?, ?, ?)', zip(
+        ids[menus['owner']].tolist(), ids[menus['owner']].tolist(), menus['name'], menus['name'], np.round(menus['price'] * 100).astype(int).tolist()))
+
+# Function to write the Takeaway tables of a chunk of restaurants
+def write_takeaway(con, restaurants, menus, first_id, rng):
+    ids = np.arange(first_id, first_id + len(restaurants))
+    slugs = [f"{name.lower().replace(' ', '-')}-{i}" for name, i in zip(restaurants['name'], ids)]
+    con.executemany('INSERT INTO restaurants (primarySlug, restaurant_id, name, address, city, ratings, ratingsNumber, deliveryFee, latitude, longitude) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', zip(
+        slugs, ids.astype(str), restaurants['name'], restaurants['city'], restaurants['city'], restaurants['rating'].tolist(),
+        restaurants['rating_count'].tolist(), restaurants['delivery_fee'].tolist(), restaurants['latitude'].astype(str), restaurants['longitude'].astype(str)))
+    con.executemany('INSERT INTO categories_restaurants (category_id, restaurant_id) VALUES (?, ?)', zip(restaurants['cuisine'].str.lower(), slugs))
+    slug_array = np.array(slugs, dtype=object)
+    con.executemany('INSERT INTO menuItems (primarySlug, name, description, price) VALUES (?, ?, ?, ?)', zip(
+        slug_array[menus['owner']], menus['name'], menus['name'], menus['price'].tolist()))
+    # Takeaway restaurants have no postal code of their own, only the areas they deliver to
+    con.executemany('INSERT INTO locations_to_restaurants (restaurant_id, location_id) VALUES (?, ?)', (
+        (slug, int(code)) for slug, code in zip(slugs, restaurants['postal_code']) if code is not None))
+
+WRITERS = {
+    'Deliveroo': write_deliveroo,
+    'UberEats': write_ubereats,
+    'Takeaway': write_takeaway,
+}
+
+# Function to write the search locations of a platform: one per postal code of the delivery hubs
+def write_locations(con, platform):
+    locations = pd.DataFrame([(code, city, lat, lon) for city, codes, lat, lon, _ in CITIES for code in codes],
+                             columns=['postal_code', 'name', 'latitude', 'longitude'])
+    regions = postal_code_to_province(locations['postal_code']).map(REGION_SLUGS)
+    rows = [(code, name, code, lat, lon, region) for (code, name, lat, lon), region in zip(locations.itertuples(index=False), regions)]
+    if platform == 'Deliveroo':
+        con.executemany('INSERT INTO locations (id, name, postalcode, latitude, longitude) VALUES (?, ?, ?, ?, ?)', [row[:5] for row in rows])
+    elif platform == 'UberEats':
+        con.executemany('INSERT INTO locations (id, name, region, latitude, longitude) VALUES (?, ?, ?, ?, ?)', [(row[0], row[1], row[5], row[3], row[4]) for row in rows])
+    else:
+        con.executemany('INSERT INTO locations (ID, name, postalCode, latitude, longitude, city) VALUES (?, ?, ?, ?, ?, ?)', [row[:5] + (row[1],) for row in rows])
+
+# Function to write synthetic deliveroo.db, ubereats.db and takeaway.db with about menu_items menu items per platform
+def generate(output_dir='databases', menu_items=100_000, seed=0, platforms=None):
+    rng = np.random.default_rng(seed)
+    os.makedirs(output_dir, exist_ok=True)
+    platforms = platforms or list(WRITERS)
+
+    # Each platform lists a share of one pool of restaurants, so the same restaurant appears on several platforms
+    restaurants_per_platform = max(menu_items // MEAN_MENU_SIZE, 1)
+    pool = restaurant_pool(int(restaurants_per_platform / PLATFORM_SHARE) + 1, rng)
+
+    paths = {}
+    for platform in platforms:
+        path = os.path.join(output_dir, f'{platform.lower()}.db')
+        if os.path.exists(path):
+            os.remove(path)
+        con = sqlite3.connect(path)
+        con.execute('PRAGMA journal_mode = OFF')
+        con.execute('PRAGMA synchronous = OFF')
+        con.executescript(SCHEMAS[platform])
+        write_locations(con, platform)
+
+        listed = pool.iloc[np.sort(rng.choice(len(pool), size=min(restaurants_per_platform, len(pool)), replace=False))]
+        listed = add_noise(listed, rng)
+        for start in range(0, len(listed), CHUNK_RESTAURANTS):
+            chunk = listed.iloc[start:start + CHUNK_RESTAURANTS]
+            WRITERS[platform](con, chunk, draw_menus(chunk, rng), start, rng)
+            con.commit()
+        con.close()
+        paths[platform] = path
+    return paths
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Write synthetic Deliveroo, UberEats and Takeaway databases')
+    parser.add_argument('--output', default='databases', help='directory of the databases')
+    parser.add_argument('--menu-items', type=int, default=100_000, help='approximate number of menu items per platform (10k to 10M)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random generator')
+    args = parser.parse_args()
+    for platform, path in generate(args.output, args.menu_items, args.seed).items():
+        print(f"Wrote {platform} to {path}")
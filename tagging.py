@@ -0,0 +1,101 @@
+import argparse
+import re
+import numpy as np
+import pandas as pd
+
+# Tags a restaurant can carry, with the words marking them in category and menu item names (whole words, any case)
+# and the share of its menu items that has to carry a tag for the restaurant to get it; 0 means one item is enough.
+# A category carrying a tag always gives it to the restaurant.
+TAGS = {
+    'vegetarian': {'pattern': r'vegetari\w*|v[eé]g[eé]tarien\w*|vegetarisch\w*|veggie\w*|veg|falafel|tofu|seitan|tempeh|paneer|halloumi', 'item_share': 0.5},
+    'vegan': {'pattern': r'vegan\w*|v[eé]gane?s?|plant[- ]based', 'item_share': 0.5},
+    'halal': {'pattern': r'halal', 'item_share': 0},
+    'pizza': {'pattern': r'pizz\w*', 'item_share': 0},
+    'kapsalon': {'pattern': r'kapsalon\w*', 'item_share': 0},
+    'hummus': {'pattern': r'hummus|houmous|hoummos', 'item_share': 0},
+    'kebab': {'pattern': r'kebab\w*|d[oö]ner|d[uü]r[uü]m|shawarma', 'item_share': 0},
+    'burger': {'pattern': r'\w*burgers?', 'item_share': 0},
+    'sushi': {'pattern': r'sushi\w*|sashimi|nigiri|maki', 'item_share': 0},
+}
+
+# Tags that imply others: whatever is vegan is also vegetarian
+IMPLIED_TAGS = {
+    'vegan': ['vegetarian'],
+}
+
+# Bit of each tag in the tags bitmask columns
+TAG_BITS = {tag: 1 << i for i, tag in enumerate(TAGS)}
+
+# One regex holding every tag as a named group, so each text is scanned once whatever the number of tags
+TAG_REGEX = re.compile(r'\b(?:' + '|'.join(f"(?P<{tag}>{spec['pattern']})" for tag, spec in TAGS.items()) + r')\b', re.IGNORECASE)
+
+# Columns a restaurant is identified by
+TAG_KEYS = ['platform', 'restaurant_id']
+
+# Function to compute the tags bitmask of one text
+def tag_text(text):
+    bits = 0
+    for match in TAG_REGEX.finditer(text):
+        bits |= TAG_BITS[match.lastgroup]
+        for implied in IMPLIED_TAGS.get(match.lastgroup, []):
+            bits |= TAG_BITS[implied]
+    return bits
+
+# Function to compute the tags bitmask of every text; names repeat a lot, so each distinct text is scanned once
+def tag_texts(texts):
+    texts = pd.Series(texts) if not isinstance(texts, pd.Series) else texts
+    codes, uniques = pd.factorize(texts)
+    # The extra last slot is for missing texts, whose code is -1
+    bits = np.zeros(len(uniques) + 1, dtype=np.uint32)
+    for i, text in enumerate(uniques):
+        bits[i] = tag_text(str(text))
+    return pd.Series(bits[codes], index=texts.index, name='tags')
+
+# Function to flag the rows whose tags bitmask holds a tag
+def has_tag(tags, tag):
+    return (tags & TAG_BITS[tag]) != 0
+
+# Function to list the tags of a bitmask
+def tag_names(bits):
+    return [tag for tag, bit in TAG_BITS.items() if bits & bit]
+
+# Function to count per restaurant its rows (categories or menu items) and how many of them carry each tag.
+# Counts of several chunks add up, so a menu can be counted chunk by chunk
+def count_tags(df, keys=TAG_KEYS):
+    counts = pd.DataFrame({tag: has_tag(df['tags'], tag).to_numpy(dtype=np.int64) for tag in TAGS})
+    for key in keys:
+        counts[key] = df[key].to_numpy()
+    counts['rows'] = 1
+    return counts.groupby(keys, observed=True, sort=False).sum().reset_index()
+
+# Function to add up the tag counts of several chunks
+def merge_tag_counts(frames, keys=TAG_KEYS):
+    frames = [frame for frame in frames if len(frame)]
+    if not frames:
+        return pd.DataFrame(columns=keys + list(TAGS) + ['rows'])
+    return pd.concat(frames, ignore_index=True).groupby(keys, observed=True, sort=False).sum().reset_index()
+
+# Function to combine the tag counts of the categories and menu items of each restaurant into its tags bitmask
+def restaurant_tags(category_counts, item_counts, keys=TAG_KEYS):
+    df = category_counts.merge(item_counts, on=keys, how='outer', suffixes=('_category', '_item'))
+    items = df['rows_item'].fillna(0).to_numpy()
+    tags = np.zeros(len(df), dtype=np.uint32)
+    for tag, spec in TAGS.items():
+        from_categories = df[f'{tag}_category'].fillna(0).to_numpy() > 0
+        tagged_items = df[f'{tag}_item'].fillna(0).to_numpy()
+        from_items = (tagged_items > 0) & (tagged_items >= spec['item_share'] * items)
+        tags |= np.where(from_categories | from_items, TAG_BITS[tag], 0).astype(np.uint32)
+    for tag, implied in IMPLIED_TAGS.items():
+        for other in implied:
+            tags |= np.where(tags & TAG_BITS[tag], TAG_BITS[other], 0).astype(np.uint32)
+    return df[keys].assign(tags=tags)
+
+if __name__ == "__main__":
+    from snapshot import load_restaurants
+
+    parser = argparse.ArgumentParser(description='Count the restaurants of each platform carrying each tag')
+    parser.add_argument('--platforms', nargs='*', help='platforms to count (default: all)')
+    args = parser.parse_args()
+    restaurants = load_restaurants(columns=['platform', 'tags'], platforms=args.platforms)
+    counts = pd.DataFrame({tag: has_tag(restaurants['tags'], tag) for tag in TAGS}).groupby(restaurants['platform'], observed=True).sum()
+    print(counts.to_string())
@@ -0,0 +1,113 @@
+import os
+import sqlite3
+import matplotlib
+
+# Tests draw into memory, never on a display
+matplotlib.use('Agg')
+
+import pytest
+import query_cache
+from database import DATABASES, dispose_engines
+from synthetic_data import SCHEMAS
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Function to open a test database without syncing every statement to disk
+def _connect(path):
+    con = sqlite3.connect(path)
+    con.execute('PRAGMA synchronous = OFF')
+    return con
+
+# Function to insert rows, given as dicts, into a table of a SQLite file
+def _insert_rows(path, table, rows):
+    con = _connect(path)
+    for row in rows:
+        con.execute(f"INSERT INTO {table} ({', '.join(row)}) VALUES ({', '.join('?' for _ in row)})", list(row.values()))
+    con.commit()
+    con.close()
+
+# Function to run a statement on a SQLite file, e.g. to edit a row between two refreshes
+def _execute(path, statement, params=()):
+    con = _connect(path)
+    con.execute(statement, params)
+    con.commit()
+    con.close()
+
+# Function to run the test in a directory holding empty platform databases, which the test fills with its own rows.
+# The read-only engines open the files as immutable, so a test changing a database calls dispose_engines() before reading it again
+@pytest.fixture
+def market(tmp_path, monkeypatch):
+    os.makedirs(tmp_path / 'databases')
+    for platform, path in DATABASES.items():
+        con = _connect(tmp_path / path)
+        con.executescript(SCHEMAS[platform])
+        con.close()
+    os.symlink(os.path.join(REPO_DIR, 'map'), tmp_path / 'map')
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(query_cache, 'CACHE_DISABLED', True)
+    dispose_engines()
+    yield {platform: str(tmp_path / path) for platform, path in DATABASES.items()}
+    dispose_engines()
+
+# Function giving the tests the helper that inserts rows into a platform database
+@pytest.fixture
+def insert_rows():
+    return _insert_rows
+
+# Function giving the tests the helper that runs a statement on a platform database
+@pytest.fixture
+def execute():
+    return _execute
+
+# Function to fill the platform databases with a handful of restaurants: the same pizzeria on Deliveroo and UberEats,
+# a vegetarian place in Antwerp, a friterie in Liège listed without postal code and a kebab in Ghent delivering to two areas
+@pytest.fixture
+def small_market(market):
+    _insert_rows(market['Deliveroo'], 'restaurants', [
+        {'id': 1, 'name': 'Pizza Roma', 'latitude': '50.8466', 'longitude': '4.3528', 'category': 'Pizza', 'address': 'Brussels',
+         'postal_code': '1000', 'delivery_fee': 2.5, 'rating': 4.6, 'rating_number': '120'},
+        {'id': 2, 'name': 'Green Garden', 'latitude': '51.2194', 'longitude': '4.4025', 'category': 'Vegetarian', 'address': 'Antwerp',
+         'postal_code': 'B-2000', 'delivery_fee': 1.5, 'rating': 4.4, 'rating_number': '80'},
+    ])
+    _insert_rows(market['Deliveroo'], 'menu_items', [
+        {'id': 1, 'restaurant_id': 1, 'name': 'Pizza Margherita', 'description': 'Tomato, mozzarella', 'price': '12.5'},
+        {'id': 2, 'restaurant_id': 1, 'name': 'Tiramisu', 'description': 'Dessert', 'price': '6'},
+        {'id': 3, 'restaurant_id': 2, 'name': 'Buddha Bowl', 'description': 'Quinoa', 'price': '11'},
+        {'id': 4, 'restaurant_id': 2, 'name': 'Vegan Burger', 'description': 'Plant-based', 'price': '13'},
+    ])
+    _insert_rows(market['UberEats'], 'restaurants', [
+        {'id': 10, 'title': 'Pizza Roma', 'location__city': 'Brussels', 'location__postal_code': '1000', 'location__latitude': '50.8467',
+         'location__longitude': '4.3529', 'location__geo__region': 'bruxelles-capitale', 'rating__rating_value': 4.5, 'rating__review_count': '200+'},
+        {'id': 11, 'title': 'Friterie du Perron', 'location__city': 'Liège', 'location__postal_code': None, 'location__latitude': '50.6326',
+         'location__longitude': '5.5797', 'location__geo__region': 'liÃ¨ge', 'rating__rating_value': 4.1, 'rating__review_count': '40'},
+    ])
+    _insert_rows(market['UberEats'], 'restaurant_to_categories', [
+        {'restaurant_id': 10, 'category': 'Pizza'},
+        {'restaurant_id': 11, 'category': 'Friterie'},
+    ])
+    _insert_rows(market['UberEats'], 'menu_items', [
+        {'id': 100, 'restaurant_id': 10, 'name': 'Pizza Margherita', 'description': 'Tomato, mozzarella', 'price': 1300},
+        {'id': 101, 'restaurant_id': 10, 'name': 'Pizza Hawai', 'description': 'Ham, pineapple', 'price': 1450},
+        {'id': 110, 'restaurant_id': 11, 'name': 'Kapsalon', 'description': 'Fries, shoarma, cheese', 'price': 900},
+        {'id': 111, 'restaurant_id': 11, 'name': 'Frites', 'description': 'Belgian fries', 'price': 350},
+    ])
+    _insert_rows(market['Takeaway'], 'restaurants', [
+        {'primarySlug': 'kebab-gent', 'name': 'Kebab Gent', 'city': 'Ghent', 'ratings': 4.0, 'ratingsNumber': 60, 'deliveryFee': 2.0,
+         'latitude': '51.0543', 'longitude': '3.7174'},
+    ])
+    _insert_rows(market['Takeaway'], 'categories_restaurants', [{'category_id': 'kebab', 'restaurant_id': 'kebab-gent'}])
+    _insert_rows(market['Takeaway'], 'menuItems', [
+        {'ID': 1, 'primarySlug': 'kebab-gent', 'name': 'Durum Kebab', 'description': 'Wrap', 'price': 8.0},
+        {'ID': 2, 'primarySlug': 'kebab-gent', 'name': 'Kapsalon', 'description': 'Fries, doner, cheese', 'price': 10.0},
+        {'ID': 3, 'primarySlug': 'kebab-gent', 'name': 'Falafel Durum', 'description': 'Wrap', 'price': 7.5},
+    ])
+    _insert_rows(market['Takeaway'], 'locations', [
+        {'ID': 9050, 'name': 'Gentbrugge', 'postalCode': 9050, 'latitude': 51.04, 'longitude': 3.76},
+        {'ID': 9000, 'name': 'Gent', 'postalCode': 9000, 'latitude': 51.05, 'longitude': 3.72},
+    ])
+    _insert_rows(market['Takeaway'], 'locations_to_restaurants', [
+        {'restaurant_id': 'kebab-gent', 'location_id': 9050},
+        {'restaurant_id': 'kebab-gent', 'location_id': 9000},
+    ])
+    return market
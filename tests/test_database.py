@@ -0,0 +1,41 @@
+import pandas as pd
+import pytest
+import database
+from database import _read_query_chunks, _read_query_rows, get_engine, read_query
+from platforms import CANONICAL_QUERIES
+from snapshot import to_canonical
+
+pytest.importorskip('adbc_driver_sqlite')
+
+# Function to read a query of a platform row by row, the path taken without the ADBC driver
+def _rows(platform, query):
+    return _read_query_rows(get_engine(platform), query, None, platform)
+
+@pytest.mark.parametrize('table', list(CANONICAL_QUERIES))
+def test_columnar_reads_give_the_canonical_rows_of_the_row_path(small_market, table):
+    for platform, query in CANONICAL_QUERIES[table].items():
+        columnar = to_canonical(table, read_query(platform, query), platform)
+        rows = to_canonical(table, _rows(platform, query), platform)
+        assert columnar.astype(str).equals(rows.astype(str))
+
+def test_chunks_go_on_row_by_row_when_a_later_batch_changes_type(market, insert_rows):
+    # The first batches type restaurant_id as a number, the third one holds a text id
+    insert_rows(market['Takeaway'], 'menuItems', [{'ID': i, 'primarySlug': 'a' if i < 4 else 'b', 'name': f'Dish {i}', 'price': i} for i in range(6)])
+    query = "SELECT ID AS item_id, CASE WHEN ID < 4 THEN ID ELSE 'x' || ID END AS code FROM menuItems ORDER BY ID"
+    chunks = list(_read_query_chunks(get_engine('Takeaway'), query, None, 2, 'Takeaway'))
+    assert [len(chunk) for chunk in chunks] == [2, 2, 2]
+    combined = pd.concat(chunks, ignore_index=True)
+    assert combined['code'].astype(str).tolist() == ['0', '1', '2', '3', 'x4', 'x5']
+
+def test_empty_results_keep_their_columns(market):
+    df = read_query('Deliveroo', CANONICAL_QUERIES['menu_items']['Deliveroo'])
+    assert df.empty
+    assert df.columns.tolist() == _rows('Deliveroo', CANONICAL_QUERIES['menu_items']['Deliveroo']).columns.tolist()
+    chunks = list(_read_query_chunks(get_engine('Deliveroo'), CANONICAL_QUERIES['menu_items']['Deliveroo'], None, 10, 'Deliveroo'))
+    assert len(chunks) == 1 and chunks[0].empty and chunks[0].columns.tolist() == df.columns.tolist()
+
+def test_missing_driver_reads_row_by_row(small_market, monkeypatch):
+    query = CANONICAL_QUERIES['menu_items']['UberEats']
+    columnar = read_query('UberEats', query)
+    monkeypatch.setattr(database, 'adbc_sqlite', None)
+    assert read_query('UberEats', query).astype(str).equals(columnar.astype(str))
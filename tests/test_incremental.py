@@ -0,0 +1,83 @@
+import pandas as pd
+from sqlalchemy import text
+from database import dispose_engines
+from incremental import get_state_engine, load_locations, load_province_counts, refresh
+from snapshot import load_restaurants
+
+# Function to read every persisted table of a state database, sorted so two states can be compared
+def _state(state_db):
+    engine = get_state_engine(state_db)
+    tables = {}
+    with engine.connect() as con:
+        for table in ['restaurant_state', 'restaurant_price_bins', 'province_counts', 'price_histogram']:
+            df = pd.read_sql(text(f'SELECT * FROM {table}'), con)
+            if 'restaurant_count' in df:
+                df = df[df['restaurant_count'] > 0]
+            if 'count' in df:
+                df = df[df['count'] > 0]
+            tables[table] = df.sort_values(list(df.columns)).reset_index(drop=True)
+    engine.dispose()
+    return tables
+
+# Function to assert two state databases hold the same rows
+def _assert_same_state(left, right):
+    left, right = _state(left), _state(right)
+    for table in left:
+        pd.testing.assert_frame_equal(left[table], right[table], check_dtype=False, obj=table)
+
+def test_first_refresh_counts_every_restaurant(small_market):
+    summary = refresh(state_db='state/incremental.db')
+    assert summary['inserted'].sum() == 5
+    counts = load_province_counts('state/incremental.db').set_index(['platform', 'province'])['restaurant_count']
+    restaurants = load_restaurants(columns=['platform', 'province'])
+    expected = restaurants.groupby(['platform', 'province'], observed=True).size()
+    assert counts.sort_index().tolist() == expected.sort_index().tolist()
+
+def test_veg_and_kapsalon_sets(small_market):
+    refresh(state_db='state/incremental.db')
+    veg = load_locations('veg', 'state/incremental.db')
+    kapsalon = load_locations('kapsalon', 'state/incremental.db')
+    assert sorted(veg['restaurant_id']) == ['2']
+    assert sorted(kapsalon['restaurant_id']) == ['11', 'kebab-gent']
+
+def test_incremental_refresh_matches_full_rebuild(small_market, insert_rows, execute):
+    refresh(state_db='state/incremental.db')
+
+    execute(small_market['Deliveroo'], 'DELETE FROM restaurants WHERE id = 2')
+    execute(small_market['Deliveroo'], 'DELETE FROM menu_items WHERE restaurant_id = 2')
+    execute(small_market['UberEats'], "UPDATE restaurants SET location__postal_code = '4000' WHERE id = 11")
+    insert_rows(small_market['Takeaway'], 'restaurants', [
+        {'primarySlug': 'sushi-leuven', 'name': 'Sushi Leuven', 'city': 'Leuven', 'latitude': '50.8798', 'longitude': '4.7005'},
+    ])
+    insert_rows(small_market['Takeaway'], 'menuItems', [{'ID': 4, 'primarySlug': 'sushi-leuven', 'name': 'Salmon Maki', 'price': 6.5}])
+    dispose_engines()
+
+    summary = refresh(state_db='state/incremental.db').set_index('platform')
+    assert summary.loc['Deliveroo', 'deleted'] == 1
+    assert summary.loc['UberEats', 'updated'] == 1
+    assert summary.loc['Takeaway', 'inserted'] == 1
+
+    refresh(state_db='state/rebuilt.db')
+    _assert_same_state('state/incremental.db', 'state/rebuilt.db')
+
+def test_menu_edits_refresh_the_restaurant(small_market, execute):
+    refresh(state_db='state/incremental.db')
+    assert '10' not in load_locations('kapsalon', 'state/incremental.db')['restaurant_id'].tolist()
+
+    # Same length name and the same price total, only the rows themselves changed
+    execute(small_market['UberEats'], "UPDATE menu_items SET name = 'Kapsalon XL' WHERE id = 101")
+    execute(small_market['Deliveroo'], "UPDATE menu_items SET price = CASE id WHEN 3 THEN '13' ELSE '11' END WHERE id IN (3, 4)")
+    dispose_engines()
+
+    summary = refresh(state_db='state/incremental.db').set_index('platform')
+    assert summary.loc['UberEats', 'updated'] == 1
+    assert summary.loc['Deliveroo', 'updated'] == 1
+    assert '10' in load_locations('kapsalon', 'state/incremental.db')['restaurant_id'].tolist()
+
+    refresh(state_db='state/rebuilt.db')
+    _assert_same_state('state/incremental.db', 'state/rebuilt.db')
+
+def test_unchanged_databases_refresh_nothing(small_market):
+    refresh(state_db='state/incremental.db')
+    summary = refresh(state_db='state/incremental.db')
+    assert summary[['inserted', 'updated', 'deleted']].to_numpy().sum() == 0
@@ -0,0 +1,32 @@
+import pytest
+import instrumentation
+from instrumentation import stage, summarize
+
+@pytest.fixture
+def profiling(monkeypatch):
+    monkeypatch.setattr(instrumentation, 'PROFILING', True)
+    monkeypatch.setattr(instrumentation, '_events', [])
+    return instrumentation._events
+
+def test_stage_reports_how_much_it_raised_the_peak(profiling, monkeypatch):
+    # Peak of the process read at the start and end of each stage: the outer one raises it from 500 to 800 MB,
+    # the inner one from 500 to 700 MB, and the last one stays below the earlier peak
+    readings = iter([500.0, 500.0, 700.0, 800.0, 800.0, 800.0])
+    monkeypatch.setattr(instrumentation, 'peak_rss_mb', lambda: next(readings))
+    with stage('outer'):
+        with stage('inner'):
+            pass
+    with stage('idle'):
+        pass
+
+    growth = {event['stage']: event['rss_growth_mb'] for event in profiling}
+    assert growth == {'inner': 200.0, 'outer': 300.0, 'idle': 0.0}
+    assert [event['process_peak_rss_mb'] for event in profiling] == [700.0, 800.0, 800.0]
+    assert summarize(profiling).set_index('stage')['rss_growth_mb'].to_dict() == growth
+
+def test_stage_without_resource_module(profiling, monkeypatch):
+    monkeypatch.setattr(instrumentation, 'resource', None)
+    with stage('anything'):
+        pass
+    assert profiling[0]['rss_growth_mb'] is None
+    assert profiling[0]['process_peak_rss_mb'] is None
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+from matching import MAX_DISTANCE_KM, match_restaurants, normalize_names
+
+# Function to build restaurants from (platform, id, name, postal code, latitude, longitude) rows
+def _restaurants(rows):
+    return pd.DataFrame(rows, columns=['platform', 'restaurant_id', 'name', 'postal_code', 'latitude', 'longitude'])
+
+# Function to tell whether two listings got the same canonical id
+def _same(matches, left, right):
+    ids = matches.set_index('restaurant_id')['canonical_id']
+    return ids[left] == ids[right]
+
+def test_normalize_names():
+    names = normalize_names(pd.Series(['Snack Le Liégeois!', 'THE  Burger-House', None], dtype=object))
+    assert names.tolist() == ['liegeois', 'burger house', '']
+
+def test_close_listings_with_similar_names_match():
+    matches = match_restaurants(_restaurants([
+        ('Deliveroo', 'd1', 'Pizza Roma', 1000, 50.8466, 4.3528),
+        ('UberEats', 'u1', 'PIZZA ROMA!', 1000, 50.8470, 4.3530),
+    ]))
+    assert _same(matches, 'd1', 'u1')
+
+def test_far_listings_do_not_match():
+    # About 0.7 km north, further than MAX_DISTANCE_KM
+    assert MAX_DISTANCE_KM < 0.7
+    matches = match_restaurants(_restaurants([
+        ('Deliveroo', 'd1', 'Pizza Roma', 1000, 50.8466, 4.3528),
+        ('UberEats', 'u1', 'Pizza Roma', 1000, 50.8530, 4.3528),
+    ]))
+    assert not _same(matches, 'd1', 'u1')
+
+def test_different_names_do_not_match():
+    matches = match_restaurants(_restaurants([
+        ('Deliveroo', 'd1', 'Pizza Roma', 1000, 50.8466, 4.3528),
+        ('UberEats', 'u1', 'Sushi House', 1000, 50.8466, 4.3528),
+    ]))
+    assert not _same(matches, 'd1', 'u1')
+
+def test_listings_without_coordinates_match_on_postal_code_with_a_stricter_threshold():
+    matches = match_restaurants(_restaurants([
+        ('Deliveroo', 'd1', 'Burger Palace', 1050, np.nan, np.nan),
+        ('Takeaway', 't1', 'Burger Palace', 1050, 50.83, 4.37),
+        ('UberEats', 'u1', 'Burger Palace', 1060, np.nan, np.nan),
+        ('UberEats', 'u2', 'Burger Palace Express', 1050, np.nan, np.nan),
+    ]))
+    assert _same(matches, 'd1', 't1')
+    assert not _same(matches, 'd1', 'u1')
+    assert not _same(matches, 'd1', 'u2')
+
+def test_chain_of_matches_keeps_one_listing_per_platform():
+    # u1 matches both Deliveroo listings, which must not end up as one restaurant
+    matches = match_restaurants(_restaurants([
+        ('Deliveroo', 'd1', 'Pizza Roma', 1000, 50.8466, 4.3528),
+        ('UberEats', 'u1', 'Pizza Roma', 1000, 50.8467, 4.3528),
+        ('Deliveroo', 'd2', 'Pizza Roma 2', 1000, 50.8468, 4.3528),
+        ('Takeaway', 't1', 'Pizza Roma 2', 1000, 50.8469, 4.3528),
+    ]))
+    assert _same(matches, 'd1', 'u1')
+    assert _same(matches, 'd2', 't1')
+    assert not _same(matches, 'd1', 'd2')
+    assert matches.groupby(['canonical_id', 'platform']).size().max() == 1
+
+def test_blank_names_match_nothing():
+    matches = match_restaurants(_restaurants([
+        ('Deliveroo', 'd1', '', 1000, 50.8466, 4.3528),
+        ('UberEats', 'u1', None, 1000, 50.8466, 4.3528),
+        ('Takeaway', 't1', 'Restaurant', 1000, 50.8466, 4.3528),
+    ]))
+    assert matches['canonical_id'].nunique() == 3
+
+def test_no_restaurants():
+    assert match_restaurants(_restaurants([])).empty
@@ -0,0 +1,50 @@
+import pandas as pd
+import pytest
+from menu_search import SEARCH_COLUMNS, build_menu_search, like_pattern, matches_term, search_menu
+
+# Searches whose results must not depend on the index: word prefixes, phrases, case and accents
+SEARCHES = [('kapsalon', 'item'), ('KAPS', 'item'), ('pizza marg', 'item'), ('liegeois', 'item'), ('Liégeois', 'item'),
+            ('hummus', 'item'), ('pizza', 'category'), ('kebab', 'category'), ('frit', 'category')]
+
+# Function to add menu items that tell a word prefix from a substring, and accented names
+@pytest.fixture
+def search_market(small_market, insert_rows):
+    insert_rows(small_market['UberEats'], 'menu_items', [
+        {'id': 112, 'restaurant_id': 11, 'name': 'Kipkapsalon', 'price': 1100},
+        {'id': 113, 'restaurant_id': 11, 'name': 'Boulets Liégeois', 'price': 1250},
+        {'id': 114, 'restaurant_id': 11, 'name': 'Mini-kapsalon', 'price': 700},
+    ])
+    insert_rows(small_market['Deliveroo'], 'menu_items', [
+        {'id': 5, 'restaurant_id': 2, 'name': 'Boulets liegeois', 'price': '12'},
+        {'id': 6, 'restaurant_id': 2, 'name': 'Pizza_margherita', 'price': '9'},
+    ])
+    return small_market
+
+# Function to sort search results so the two paths can be compared row by row
+def _sorted(df):
+    return df[['platform'] + SEARCH_COLUMNS].astype('string').sort_values(['platform', 'restaurant_id', 'item_id', 'category']).reset_index(drop=True)
+
+def test_matches_term_is_a_word_prefix():
+    texts = pd.Series(['Kapsalon XL', 'Kipkapsalon', 'mini-kapsalon', 'Pizza Margherita', 'Margherita Pizza', None], dtype=object)
+    assert matches_term(texts, 'kapsalon').tolist() == [True, False, True, False, False, False]
+    assert matches_term(texts, 'pizza marg').tolist() == [False, False, False, True, False, False]
+
+def test_like_pattern_finds_accented_texts():
+    assert like_pattern('Liégeois') == '%l__g___s%'
+    assert like_pattern('pizza marg') == '%p_zz_%m_rg%'
+
+def test_index_and_scan_give_the_same_results(search_market, capsys):
+    scanned = {(term, kind): search_menu(term, kind=kind) for term, kind in SEARCHES}
+    # The missing index is reported once, not on every search
+    assert capsys.readouterr().out.count('No menu_search index') == 1
+
+    for platform in search_market:
+        build_menu_search(platform)
+    for search, expected in scanned.items():
+        found = search_menu(search[0], kind=search[1])
+        assert list(found.columns) == list(expected.columns)
+        pd.testing.assert_frame_equal(_sorted(found), _sorted(expected), obj=str(search))
+
+def test_kapsalon_search_results(search_market):
+    found = search_menu('kapsalon')
+    assert sorted(found['name']) == ['Kapsalon', 'Kapsalon', 'Mini-kapsalon']
@@ -0,0 +1,27 @@
+import pytest
+from platforms import PLATFORMS, complete_platforms, platform_alpha
+
+TABLES = {'restaurants': {'from': 'restaurants', 'columns': {'restaurant_id': 'id'}}}
+
+def test_missing_optional_keys_get_defaults():
+    platforms = complete_platforms({'Glovo': {'database': 'databases/glovo.db', 'tables': TABLES},
+                                    'Wolt': {'database': 'databases/wolt.db', 'tables': TABLES, 'color': 'orange'}})
+    assert platforms['Glovo']['region_names'] == {}
+    assert platforms['Glovo']['price_unit'] == 'euros'
+    assert platforms['Glovo']['alpha'] == {}
+    # Spare colours skip the ones already taken
+    assert platforms['Glovo']['color'] == 'purple'
+    assert platforms['Wolt']['color'] == 'orange'
+
+def test_spec_without_database_or_tables_is_rejected():
+    with pytest.raises(ValueError, match='Glovo has no tables'):
+        complete_platforms({'Glovo': {'database': 'databases/glovo.db'}})
+    with pytest.raises(ValueError, match='unknown price_unit'):
+        complete_platforms({'Glovo': {'database': 'databases/glovo.db', 'tables': TABLES, 'price_unit': 'pence'}})
+
+def test_built_in_platforms_are_complete():
+    for spec in PLATFORMS.values():
+        assert {'color', 'region_names', 'price_unit', 'province_indexes', 'alpha'} <= set(spec)
+    assert platform_alpha('Takeaway', 'restaurants') == 0.5
+    assert platform_alpha('Takeaway', 'vegetarian') == 1
+    assert platform_alpha('UberEats', 'vegetarian') == 0.5
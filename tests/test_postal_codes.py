@@ -0,0 +1,26 @@
+import pandas as pd
+from postal_codes import UNKNOWN_PROVINCE, clean_postal_codes, postal_code_to_province
+
+def test_clean_postal_codes_strips_prefixes():
+    codes = clean_postal_codes(pd.Series(['B-1000', '1070.0', 'BE 9000', None, 'unknown'], dtype=object))
+    assert codes.tolist()[:3] == [1000, 1070, 9000]
+    assert codes.iloc[3:].isna().all()
+
+def test_clean_postal_codes_keeps_numbers():
+    codes = clean_postal_codes(pd.Series([1070.0, 4000], dtype=object))
+    assert codes.tolist() == [1070, 4000]
+
+def test_postal_code_to_province_range_edges():
+    codes = pd.Series([1000, 1299, 1300, 1499, 1500, 3000, 3499, 3500, 4000, 6599, 6600, 7000, 9999])
+    assert postal_code_to_province(codes).tolist() == [
+        'Brussels-Capital Region', 'Brussels-Capital Region', 'Walloon Brabant', 'Walloon Brabant', 'Flemish Brabant',
+        'Flemish Brabant', 'Flemish Brabant', 'Limburg', 'Liège', 'Hainaut', 'Luxembourg', 'Hainaut', 'East Flanders']
+
+def test_postal_code_to_province_unknown_and_missing():
+    provinces = postal_code_to_province(pd.Series([0, 999, 10000, -5, None], dtype=object))
+    assert provinces.tolist()[:4] == [UNKNOWN_PROVINCE] * 4
+    assert provinces.iloc[4] is None
+
+def test_postal_code_to_province_keeps_index():
+    codes = pd.Series([2000, 8000], index=[7, 3])
+    assert postal_code_to_province(codes).index.tolist() == [7, 3]
@@ -0,0 +1,37 @@
+import numpy as np
+from platforms import PLATFORMS
+from proximity import RADII_KM, competitor_counts, coverage_gaps, nearest_neighbours, restaurants_in_category, tagged_places
+from snapshot import load_restaurants
+
+COUNT_COLUMNS = [f'{platform}_{radius}km' for platform in PLATFORMS for radius in RADII_KM]
+
+def test_pizzerias_compete_across_platforms(small_market):
+    counts = competitor_counts(category='pizza').set_index('restaurant_id')
+    assert counts.columns.tolist() == ['platform'] + COUNT_COLUMNS
+    assert counts.loc['1', 'UberEats_1km'] == 1
+    assert counts.loc['1', 'Deliveroo_1km'] == 0
+    assert counts.loc['10', 'Deliveroo_1km'] == 1
+    assert (counts[[f'Takeaway_{radius}km' for radius in RADII_KM]] == 0).all(axis=None)
+
+def test_category_without_restaurants_counts_zero_everywhere(small_market):
+    counts = competitor_counts(category='sushi')
+    assert counts.columns.tolist() == ['platform', 'restaurant_id'] + COUNT_COLUMNS
+    assert (counts[COUNT_COLUMNS] == 0).all(axis=None)
+
+def test_category_matches_like_the_menu_search(small_market):
+    restaurants = load_restaurants(columns=['platform', 'restaurant_id', 'latitude', 'longitude'])
+    assert sorted(restaurants_in_category(restaurants, 'veget')['restaurant_id']) == ['2']
+    assert restaurants_in_category(restaurants, 'eta').empty
+
+def test_no_targets_leaves_every_area_a_gap(small_market):
+    cells = coverage_gaps(tagged_places('sushi'))
+    assert len(cells) > 0
+    assert np.isinf(cells['distance_km']).all()
+    assert cells['gap'].all()
+
+def test_no_targets_gives_infinitely_far_neighbours(small_market):
+    points = load_restaurants(columns=['platform', 'restaurant_id', 'latitude', 'longitude'], valid_coordinates=True)
+    neighbours = nearest_neighbours(points, tagged_places('sushi'), k=3)
+    assert neighbours['point'].tolist() == points.index.tolist()
+    assert neighbours['restaurant_id'].isna().all()
+    assert np.isinf(neighbours['distance_km']).all()
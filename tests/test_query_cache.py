@@ -0,0 +1,73 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+import time
+import pandas as pd
+import query_cache
+from database import dispose_engines, read_query
+from query_cache import cache_key, evict_cache, get_cached, put_cached
+
+def test_cache_key_ignores_formatting(market):
+    path = market['Takeaway']
+    assert cache_key(path, 'SELECT name\n  FROM restaurants;') == cache_key(path, 'SELECT name FROM restaurants')
+    assert cache_key(path, 'SELECT name FROM restaurants', {'id': 1}) != cache_key(path, 'SELECT name FROM restaurants', {'id': 2})
+
+def test_cache_is_invalidated_by_a_database_change(market, insert_rows, monkeypatch):
+    monkeypatch.setattr(query_cache, 'CACHE_DISABLED', False)
+    insert_rows(market['Takeaway'], 'restaurants', [{'primarySlug': 'a', 'name': 'A'}])
+    assert read_query('Takeaway', 'SELECT name FROM restaurants')['name'].tolist() == ['A']
+    assert os.listdir(query_cache.CACHE_DIR)
+
+    insert_rows(market['Takeaway'], 'restaurants', [{'primarySlug': 'b', 'name': 'B'}])
+    dispose_engines()
+    assert read_query('Takeaway', 'SELECT name FROM restaurants ORDER BY name')['name'].tolist() == ['A', 'B']
+
+def test_evict_cache_removes_least_recently_used(market):
+    for i, key in enumerate(['old', 'new']):
+        put_cached(key, pd.DataFrame({'value': range(1000)}))
+        path = os.path.join(query_cache.CACHE_DIR, f'{key}.parquet')
+        os.utime(path, (i, i))
+    evict_cache(max_bytes=os.path.getsize(os.path.join(query_cache.CACHE_DIR, 'new.parquet')))
+    assert sorted(os.listdir(query_cache.CACHE_DIR)) == ['new.parquet']
+
+def test_evict_cache_skips_files_removed_meanwhile(market, monkeypatch):
+    for key in ['a', 'b']:
+        put_cached(key, pd.DataFrame({'value': range(1000)}))
+    listdir, remove = os.listdir, os.remove
+    # Another process evicts 'a' between the listing and the stat, then 'b' between the stat and the remove
+    monkeypatch.setattr(query_cache.os, 'listdir', lambda path: listdir(path) + ['gone.parquet'])
+
+    def remove_twice(path):
+        remove(path)
+        remove(path)
+    monkeypatch.setattr(query_cache.os, 'remove', remove_twice)
+    evict_cache(max_bytes=0)
+    assert listdir(query_cache.CACHE_DIR) == []
+
+def test_concurrent_writers_leave_one_complete_result(market):
+    df = pd.DataFrame({'value': range(10000)})
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda _: put_cached('same', df), range(16)))
+    assert os.listdir(query_cache.CACHE_DIR) == ['same.parquet']
+    assert get_cached('same').equals(df)
+
+def test_get_cached_returns_the_result_evicted_after_the_read(market, monkeypatch):
+    df = pd.DataFrame({'value': range(10)})
+    put_cached('key', df)
+    read_parquet = pd.read_parquet
+
+    def read_then_evict(path, *args, **kwargs):
+        result = read_parquet(path, *args, **kwargs)
+        os.remove(path)
+        return result
+    monkeypatch.setattr(query_cache.pd, 'read_parquet', read_then_evict)
+    assert get_cached('key').equals(df)
+
+def test_evict_cache_removes_temporary_files_of_dead_writers(market):
+    os.makedirs(query_cache.CACHE_DIR, exist_ok=True)
+    for name, age in [('dead.tmp', query_cache.TMP_GRACE_SECONDS + 60), ('writing.tmp', 0)]:
+        path = os.path.join(query_cache.CACHE_DIR, name)
+        open(path, 'wb').close()
+        modified = time.time() - age
+        os.utime(path, (modified, modified))
+    evict_cache()
+    assert os.listdir(query_cache.CACHE_DIR) == ['writing.tmp']
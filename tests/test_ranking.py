@@ -0,0 +1,23 @@
+from database import dispose_engines
+from ranking import rank_restaurants, rated_restaurants
+
+def test_restaurant_on_two_platforms_is_ranked_once(small_market):
+    per_platform = rank_restaurants('pizza', per_platform=True)
+    assert sorted(per_platform['platform'].astype(str)) == ['Deliveroo', 'UberEats']
+
+    ranked = rank_restaurants('pizza')
+    assert ranked['name'].tolist() == ['Pizza Roma']
+    assert ranked['rank'].tolist() == [1]
+    # The listing kept is the better scored one
+    assert ranked['adjusted_rating'].iloc[0] == per_platform['adjusted_rating'].max()
+
+def test_rated_restaurants_is_a_copy(small_market):
+    restaurants = rated_restaurants(('Deliveroo',))
+    restaurants['rating'] = 0
+    assert (rated_restaurants(('Deliveroo',))['rating'] > 0).all()
+
+def test_rated_restaurants_reloads_after_a_database_change(small_market, execute):
+    assert rated_restaurants(('Deliveroo',)).set_index('name')['rating']['Green Garden'] == 4.4
+    execute(small_market['Deliveroo'], "UPDATE restaurants SET rating = 3.0 WHERE id = 2")
+    dispose_engines()
+    assert rated_restaurants(('Deliveroo',)).set_index('name')['rating']['Green Garden'] == 3.0
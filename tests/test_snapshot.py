@@ -0,0 +1,91 @@
+import warnings
+import matplotlib.pyplot as plt
+from database import dispose_engines, read_query
+from distribution_across_provinces import get_combined_counts, plot_province_counts
+from platforms import CANONICAL_QUERIES
+from snapshot import COLUMN_TYPES, build_snapshot, load_restaurants, load_table, snapshot_exists
+from tagging import has_tag
+
+COLUMNS = ['platform', 'restaurant_id', 'name', 'postal_code', 'province', 'tags']
+
+# Function to sort the restaurants the same way whichever path they were loaded from
+def _sorted(df):
+    return df.astype({'platform': 'string'}).sort_values(['platform', 'restaurant_id']).reset_index(drop=True)
+
+def test_takeaway_restaurant_is_one_row_with_its_lowest_postal_code(small_market):
+    restaurants = read_query('Takeaway', CANONICAL_QUERIES['restaurants']['Takeaway'])
+    assert restaurants['restaurant_id'].tolist() == ['kebab-gent']
+    assert restaurants['postal_code'].tolist() == [9000]
+
+def test_load_restaurants_provinces(small_market):
+    restaurants = _sorted(load_restaurants(columns=COLUMNS))
+    assert restaurants['restaurant_id'].tolist() == ['1', '2', 'kebab-gent', '10', '11']
+    assert restaurants['postal_code'].tolist()[:3] == [1000, 2000, 9000]
+    assert restaurants['province'].astype(str).tolist()[:4] == ['Brussels-Capital Region', 'Antwerp', 'East Flanders', 'Brussels-Capital Region']
+
+def test_platforms_without_rows_give_an_empty_canonical_table(market, insert_rows):
+    menu = load_table('menu_items', platforms=['Deliveroo'])
+    assert menu.empty
+    assert menu['price_cents'].dtype == COLUMN_TYPES['price_cents']
+    assert menu['platform'].dtype == COLUMN_TYPES['platform']
+
+    # Restaurants without a single category, e.g. a scrape that stopped early
+    insert_rows(market['UberEats'], 'restaurants', [{'id': 1, 'title': 'Pizza Roma', 'location__latitude': '50.85', 'location__longitude': '4.35'}])
+    assert load_table('categories', platforms=['UberEats']).empty
+    from vegetarian import fetch_data
+    assert fetch_data().empty
+
+def test_deliveroo_menu_sections_are_not_restaurant_categories(small_market, insert_rows):
+    insert_rows(small_market['Deliveroo'], 'categories', [{'categorie_id': 1, 'restaurant_id': 1, 'name': 'Vegetarian'}])
+    categories = load_table('categories', platforms=['Deliveroo'])
+    assert sorted(zip(categories['restaurant_id'], categories['category'])) == [('1', 'Pizza'), ('2', 'Vegetarian')]
+    restaurants = load_restaurants(columns=COLUMNS, platforms=['Deliveroo']).set_index('restaurant_id')
+    assert not has_tag(restaurants['tags'], 'vegetarian')['1']
+
+def test_double_encoded_region_gives_the_province(small_market):
+    restaurants = load_restaurants(columns=COLUMNS).set_index('restaurant_id')
+    # The friterie has no postal code and its region is stored as 'liÃ¨ge'
+    assert restaurants.loc['11', 'province'] == 'Liège'
+
+def test_snapshot_matches_sqlite(small_market):
+    from_sqlite = _sorted(load_restaurants(columns=COLUMNS))
+    build_snapshot()
+    assert snapshot_exists()
+    from_snapshot = _sorted(load_restaurants(columns=COLUMNS))
+    assert from_snapshot.astype(str).equals(from_sqlite.astype(str))
+
+def test_stale_snapshot_is_not_read(small_market, execute, capsys):
+    build_snapshot()
+    execute(small_market['Deliveroo'], "UPDATE restaurants SET name = 'Green Garden Deli' WHERE id = 2")
+    dispose_engines()
+    assert not snapshot_exists()
+    assert not snapshot_exists()
+    assert capsys.readouterr().out.count('older than the Deliveroo database') == 1
+    names = load_restaurants(columns=['name'])['name'].tolist()
+    assert 'Green Garden Deli' in names
+
+    build_snapshot()
+    assert snapshot_exists()
+
+def test_partial_build_keeps_the_other_platforms(small_market, execute):
+    build_snapshot(platforms=['Deliveroo'])
+    # The other platforms were never exported, so the dataset is not read yet
+    assert not snapshot_exists()
+
+    build_snapshot()
+    execute(small_market['Deliveroo'], "UPDATE restaurants SET name = 'Green Garden Deli' WHERE id = 2")
+    dispose_engines()
+    build_snapshot(platforms=['Deliveroo'])
+    assert snapshot_exists()
+    restaurants = _sorted(load_restaurants(columns=COLUMNS))
+    assert restaurants['platform'].value_counts().to_dict() == {'Deliveroo': 2, 'UberEats': 2, 'Takeaway': 1}
+    assert 'Green Garden Deli' in restaurants['name'].tolist()
+    assert 'Green Garden' not in restaurants['name'].tolist()
+
+def test_province_counts_plot_without_observed_warning(small_market):
+    build_snapshot()
+    counts = get_combined_counts()
+    assert counts.groupby('platform', observed=True)['restaurant_count'].sum().to_dict() == {'Deliveroo': 2, 'UberEats': 2, 'Takeaway': 1}
+    with warnings.catch_warnings():
+        warnings.filterwarnings('error', message='.*observed=False.*', category=FutureWarning)
+        plt.close(plot_province_counts(counts))
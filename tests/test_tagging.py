@@ -0,0 +1,42 @@
+import pandas as pd
+from tagging import TAG_BITS, count_tags, has_tag, restaurant_tags, tag_names, tag_text, tag_texts
+
+# Function to build the tag counts of hand-written category and menu item names of one restaurant
+def _counts(categories, items, restaurant_id='r1', platform='Deliveroo'):
+    def frame(names):
+        return pd.DataFrame({'platform': platform, 'restaurant_id': restaurant_id, 'tags': tag_texts(pd.Series(names, dtype=object))})
+    return count_tags(frame(categories)), count_tags(frame(items))
+
+def test_tag_text_matches_whole_words_only():
+    assert tag_text('Vegas Grill') == 0
+    assert tag_names(tag_text('Veggie Burger')) == ['vegetarian', 'burger']
+    assert tag_names(tag_text('PIZZA margherita')) == ['pizza']
+
+def test_vegan_implies_vegetarian():
+    assert tag_names(tag_text('Vegan Brownie')) == ['vegetarian', 'vegan']
+
+def test_tag_texts_missing_names_have_no_tags():
+    tags = tag_texts(pd.Series(['Kapsalon', None, 'Kapsalon'], dtype=object))
+    assert tags.tolist() == [TAG_BITS['kapsalon'], 0, TAG_BITS['kapsalon']]
+
+def test_one_item_is_enough_for_a_dish():
+    categories, items = _counts(['Snacks'], ['Kapsalon', 'Frites', 'Cola', 'Mitraillette'])
+    tags = restaurant_tags(categories, items)['tags'].iloc[0]
+    assert tag_names(tags) == ['kapsalon']
+
+def test_diet_needs_half_of_the_menu():
+    _, few = _counts(['Snacks'], ['Falafel Wrap', 'Frites', 'Cola', 'Chicken Wings'])
+    categories, half = _counts(['Snacks'], ['Falafel Wrap', 'Tofu Bowl', 'Cola', 'Chicken Wings'])
+    assert not has_tag(restaurant_tags(categories, few)['tags'], 'vegetarian').iloc[0]
+    assert has_tag(restaurant_tags(categories, half)['tags'], 'vegetarian').iloc[0]
+
+def test_category_tags_the_restaurant():
+    categories, items = _counts(['Vegetarian'], ['Chicken Wings', 'Cola'])
+    assert has_tag(restaurant_tags(categories, items)['tags'], 'vegetarian').iloc[0]
+
+def test_restaurant_without_menu_keeps_category_tags():
+    categories, _ = _counts(['Pizza'], [])
+    items = count_tags(pd.DataFrame({'platform': [], 'restaurant_id': [], 'tags': pd.Series([], dtype='uint32')}))
+    tags = restaurant_tags(categories, items)
+    assert tags['restaurant_id'].tolist() == ['r1']
+    assert tag_names(tags['tags'].iloc[0]) == ['pizza']
@@ -0,0 +1,208 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from database import MAX_WORKERS
+import instrumentation
+from instrumentation import instrumented, stage
+from platforms import PLATFORMS
+from snapshot import load_restaurants
+from tagging import has_tag
+
+# Directory the tile pyramid and its viewer are written to, served with e.g. `python -m http.server -d tiles`
+TILES_DIR = os.environ.get('TILES_DIR', 'tiles')
+
+# Zoom levels of the pyramid; the viewer scales the tiles of the last level when zooming further in
+MIN_ZOOM = 6
+MAX_ZOOM = 15
+
+# First zoom level whose tiles hold the individual places; below it they hold the places counted per cell
+POINT_ZOOM = 13
+
+# Size in pixels of a tile and of the cells places are counted in below POINT_ZOOM
+TILE_PIXELS = 256
+CELL_PIXELS = 32
+
+# Columns of the places copied to the properties of the point features
+POINT_PROPERTIES = ['platform', 'name', 'rating', 'rating_count', 'rank']
+
+# Layers built from the restaurants, with the tag (see tagging.py) a restaurant needs to be in the layer
+LAYERS = {
+    'restaurants': {'tag': None},
+    'vegetarian': {'tag': 'vegetarian'},
+    'kapsalon': {'tag': 'kapsalon'},
+}
+
+# Settings and fingerprint of every layer at the time its tiles were last written
+FINGERPRINT_FILE = 'fingerprints.json'
+
+# Layer list the viewer reads, and the viewer page copied next to it
+LAYERS_FILE = 'layers.json'
+VIEWER_TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tile_viewer.html')
+
+# Function to load the restaurants of a layer with usable coordinates
+def load_layer(name):
+    restaurants = load_restaurants(columns=['platform', 'restaurant_id', 'name', 'latitude', 'longitude', 'rating', 'rating_count', 'tags'],
+                                   valid_coordinates=True)
+    tag = LAYERS[name]['tag']
+    if tag is not None:
+        restaurants = restaurants[has_tag(restaurants['tags'], tag)]
+    return restaurants.drop(columns='tags').reset_index(drop=True)
+
+# Function to turn places (a frame with latitude/longitude, or any point GeoDataFrame) into the plain frame the tiles are cut from
+def to_points(places):
+    if 'geometry' in places and hasattr(places, 'to_crs'):
+        places = places.to_crs('EPSG:4326') if places.crs is not None else places
+        points = pd.DataFrame({'longitude': places.geometry.x, 'latitude': places.geometry.y})
+    else:
+        points = places[['longitude', 'latitude']].astype(float)
+    for column in POINT_PROPERTIES:
+        if column in places:
+            values = places[column]
+            # Ratings are stored as float32, rounded they read as 4.2 instead of 4.199999809
+            points[column] = values.astype(float).round(2).to_numpy() if pd.api.types.is_float_dtype(values) else values.to_numpy()
+    # Web Mercator stops at about 85 degrees
+    return points[points['latitude'].abs().lt(85) & points['longitude'].notna()].reset_index(drop=True)
+
+# Function to project coordinates to fractional tile numbers at a zoom level (the Web Mercator tiling of OpenStreetMap)
+def tile_coordinates(longitudes, latitudes, zoom):
+    scale = 2 ** zoom
+    x = (np.asarray(longitudes, dtype=float) + 180) / 360 * scale
+    y = (1 - np.arcsinh(np.tan(np.radians(np.asarray(latitudes, dtype=float)))) / np.pi) / 2 * scale
+    return x, y
+
+# Function to build a GeoJSON point feature
+def _feature(longitude, latitude, properties):
+    return {'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [round(longitude, 6), round(latitude, 6)]}, 'properties': properties}
+
+# Function to cut the points into the features of every tile of a zoom level: the places themselves from point_zoom on,
+# one feature per cell below it, at the mean position of its places with their count in total and per platform
+def tile_features(points, zoom, point_zoom=POINT_ZOOM):
+    x, y = tile_coordinates(points['longitude'], points['latitude'], zoom)
+    keyed = points.assign(tile_x=np.floor(x).astype(np.int64), tile_y=np.floor(y).astype(np.int64))
+    tiles = {}
+    if zoom >= point_zoom:
+        properties = [column for column in POINT_PROPERTIES if column in points]
+        for (tile_x, tile_y), group in keyed.groupby(['tile_x', 'tile_y'], sort=False):
+            records = group[properties].astype(object).where(group[properties].notna(), None).to_dict('records')
+            tiles[(tile_x, tile_y)] = [_feature(lon, lat, dict(record, count=1))
+                                       for lon, lat, record in zip(group['longitude'], group['latitude'], records)]
+        return tiles
+
+    cells = TILE_PIXELS // CELL_PIXELS
+    keyed['cell_x'] = np.floor(x * cells).astype(np.int64)
+    keyed['cell_y'] = np.floor(y * cells).astype(np.int64)
+    has_platform = 'platform' in points
+    if has_platform:
+        keyed['platform'] = keyed['platform'].astype('string').fillna('Unknown')
+    for (tile_x, tile_y), group in keyed.groupby(['tile_x', 'tile_y'], sort=False):
+        per_cell = group.groupby(['cell_x', 'cell_y'], sort=False)
+        summary = per_cell.agg(longitude=('longitude', 'mean'), latitude=('latitude', 'mean'), count=('longitude', 'size'))
+        if has_platform:
+            summary = summary.join(per_cell['platform'].value_counts().unstack(fill_value=0))
+        features = []
+        for _, row in summary.iterrows():
+            counts = {key: int(value) for key, value in row.drop(['longitude', 'latitude']).items() if value}
+            features.append(_feature(row['longitude'], row['latitude'], counts))
+        tiles[(tile_x, tile_y)] = features
+    return tiles
+
+# Function to write the tiles of one layer at one zoom level as {layer}/{z}/{x}/{y}.geojson, meant to run in a worker process
+def write_zoom(name, points, zoom, output_dir=TILES_DIR, point_zoom=POINT_ZOOM):
+    with stage('write_tiles', layer=name, zoom=zoom, rows=len(points)):
+        tiles = tile_features(points, zoom, point_zoom)
+        for (tile_x, tile_y), features in tiles.items():
+            directory = os.path.join(output_dir, name, str(zoom), str(tile_x))
+            os.makedirs(directory, exist_ok=True)
+            with open(os.path.join(directory, f'{tile_y}.geojson'), 'w', encoding='utf-8') as f:
+                json.dump({'type': 'FeatureCollection', 'features': features}, f, separators=(',', ':'))
+    # Pool workers do not run exit handlers, so each task writes its own profile
+    if instrumentation.PROFILING:
+        instrumentation.write_profile()
+        instrumentation.reset_profile()
+    return len(tiles)
+
+# Function to fingerprint the points of a layer together with the settings its tiles are cut with
+def layer_fingerprint(points, settings):
+    rows = pd.util.hash_pandas_object(points.astype('string'), index=False).to_numpy()
+    payload = hashlib.sha256(rows.tobytes())
+    payload.update(json.dumps(settings, sort_keys=True).encode('utf-8'))
+    return payload.hexdigest()
+
+# Function to write the viewer page and the list of layers it offers
+def write_viewer(state, output_dir=TILES_DIR):
+    layers = {name: {key: entry[key] for key in ['min_zoom', 'max_zoom', 'point_zoom', 'bounds', 'places']} for name, entry in sorted(state.items())}
+    config = {'layers': layers, 'colors': {platform: spec['color'] for platform, spec in PLATFORMS.items()},
+              'tile_pixels': TILE_PIXELS, 'cell_pixels': CELL_PIXELS}
+    with open(os.path.join(output_dir, LAYERS_FILE), 'w', encoding='utf-8') as f:
+        json.dump(config, f, indent=2)
+    shutil.copyfile(VIEWER_TEMPLATE, os.path.join(output_dir, 'index.html'))
+
+# Function to write the tile pyramid of every layer whose places changed since the last run, each layer and zoom level in its own process.
+# layers maps a layer name to its places; by default the restaurant, vegetarian and kapsalon layers are loaded
+@instrumented()
+def write_tiles(layers=None, output_dir=TILES_DIR, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM, point_zoom=POINT_ZOOM, force=False,
+                max_workers=MAX_WORKERS):
+    os.makedirs(output_dir, exist_ok=True)
+    state_path = os.path.join(output_dir, FINGERPRINT_FILE)
+    state = {}
+    if os.path.exists(state_path):
+        with open(state_path, encoding='utf-8') as f:
+            state = json.load(f)
+
+    layers = layers if layers is not None else {name: load_layer(name) for name in LAYERS}
+    settings = {'min_zoom': min_zoom, 'max_zoom': max_zoom, 'point_zoom': point_zoom, 'tile_pixels': TILE_PIXELS, 'cell_pixels': CELL_PIXELS}
+    to_write = {}
+    for name, places in layers.items():
+        points = to_points(places)
+        fingerprint = layer_fingerprint(points, settings)
+        if not force and state.get(name, {}).get('fingerprint') == fingerprint and os.path.isdir(os.path.join(output_dir, name)):
+            print(f"Skipping {name}, its places have not changed")
+            continue
+        to_write[name] = (points, fingerprint)
+
+    if to_write:
+        tasks = [(name, zoom) for name in to_write for zoom in range(min_zoom, max_zoom + 1)]
+        for name in to_write:
+            # Tiles left empty by the new places must not linger from the last run
+            shutil.rmtree(os.path.join(output_dir, name), ignore_errors=True)
+        with ProcessPoolExecutor(max_workers=max_workers or min(len(tasks), os.cpu_count() or 1)) as executor:
+            futures = {task: executor.submit(write_zoom, task[0], to_write[task[0]][0], task[1], output_dir, point_zoom) for task in tasks}
+            written = {name: 0 for name in to_write}
+            failed = set()
+            for (name, zoom), future in futures.items():
+                # A failing layer keeps its old fingerprint so the next run writes it again
+                try:
+                    written[name] += future.result()
+                except Exception as e:
+                    print(f"Failed to write {name} tiles at zoom {zoom}: {e}")
+                    failed.add(name)
+
+        for name, (points, fingerprint) in to_write.items():
+            if name in failed:
+                state.pop(name, None)
+                continue
+            bounds = [float(points['longitude'].min()), float(points['latitude'].min()), float(points['longitude'].max()), float(points['latitude'].max())] if len(points) else None
+            state[name] = dict(settings, fingerprint=fingerprint, bounds=bounds, places=len(points), tiles=written[name])
+            print(f"Wrote {written[name]} tiles of {name} ({len(points)} places)")
+
+        with open(state_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2, sort_keys=True)
+    write_viewer(state, output_dir)
+    return state
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Write the restaurant, vegetarian and kapsalon layers as a tile pyramid with a viewer page')
+    parser.add_argument('--output', default=TILES_DIR, help='directory the tiles are written to')
+    parser.add_argument('--layers', nargs='*', choices=list(LAYERS), help='layers to write (default: all)')
+    parser.add_argument('--min-zoom', type=int, default=MIN_ZOOM, help='first zoom level of the pyramid')
+    parser.add_argument('--max-zoom', type=int, default=MAX_ZOOM, help='last zoom level of the pyramid')
+    parser.add_argument('--force', action='store_true', help='write the tiles even when the places have not changed')
+    args = parser.parse_args()
+    layers = {name: load_layer(name) for name in args.layers} if args.layers else None
+    write_tiles(layers, args.output, args.min_zoom, args.max_zoom, force=args.force)
+    print(f"Serve the map with: python -m http.server -d {args.output}")
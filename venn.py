@@ -1,48 +1,45 @@
-from sqlalchemy import create_engine, Table, MetaData
-import pandas as pd
 import matplotlib.pyplot as plt
-from matplotlib_venn import venn3
-
-def connect_to_database(db_path):
-    engine = create_engine(db_path)
-    return engine.connect()
-
-def fetch_restaurant_titles(con, table_name, column_name):
-    metadata = MetaData()
-    restaurants = Table(table_name, metadata, autoload_with=con)
-    query = con.execute(restaurants.select().with_only_columns(getattr(restaurants.c, column_name)))
-    results = query.fetchall()
-    return pd.DataFrame(results, columns=['title'])
-
-def main():
-    # Fetch data from UberEats
-    con = connect_to_database('sqlite:///databases/ubereats.db')
-    df_ubereats = fetch_restaurant_titles(con, 'restaurants', 'title')
-    df_ubereats['source'] = 'UberEats'
-    con.close()
-
-    # Fetch data from Takeaway
-    con = connect_to_database('sqlite:///databases/takeaway.db')
-    df_takeaway = fetch_restaurant_titles(con, 'restaurants', 'name')
-    df_takeaway['source'] = 'Takeaway'
-    con.close()
-
-    # Fetch data from Deliveroo
-    con = connect_to_database('sqlite:///databases/deliveroo.db')
-    df_deliveroo = fetch_restaurant_titles(con, 'restaurants', 'name')
-    df_deliveroo['source'] = 'Deliveroo'
-    con.close()
-
-    # Concatenate the three dataframes
-    df = pd.concat([df_ubereats, df_takeaway, df_deliveroo])
-
+from matplotlib_venn import venn2, venn3
+import pandas as pd
+from instrumentation import instrumented
+from matching import match_restaurants
+from platforms import PLATFORMS
+
+def fetch_restaurant_ids():
+    # Listings of the same restaurant on several platforms share a canonical id
+    matches = match_restaurants()
+    return matches.rename(columns={'platform': 'source'})
+
+# Function to count the restaurants listed on exactly each combination of platforms, largest first
+def overlap_counts(df, platforms):
+    listed = pd.crosstab(df['canonical_id'], df['source']).reindex(columns=platforms, fill_value=0) > 0
+    combinations_listed = listed.apply(lambda row: ' & '.join(platform for platform in platforms if row[platform]), axis=1)
+    return combinations_listed.value_counts()
+
+@instrumented()
+def plot_venn(df, platforms=None):
     # Create a venn diagram to show the number of restaurants in each platform
-    venn3([set(df[df['source'] == 'UberEats']['title']),
-           set(df[df['source'] == 'Takeaway']['title']),
-           set(df[df['source'] == 'Deliveroo']['title'])],
-          set_labels=('UberEats', 'Takeaway', 'Deliveroo'))
+    platforms = list(platforms or PLATFORMS)
+    sets = [set(df[df['source'] == platform]['canonical_id']) for platform in platforms]
+    fig = plt.figure()
+    if len(platforms) == 2:
+        venn2(sets, set_labels=platforms)
+    elif len(platforms) == 3:
+        venn3(sets, set_labels=platforms)
+    else:
+        # Venn diagrams stop at three sets, more platforms get one bar per combination of platforms
+        counts = overlap_counts(df, platforms)
+        ax = fig.add_subplot()
+        ax.barh(counts.index[::-1], counts.to_numpy()[::-1], color='grey')
+        ax.set_xlabel('Restaurants')
+        ax.set_title('Restaurants listed on each combination of platforms')
+    return fig
 
+def main():
+    # Fetch the restaurants of all platforms, from the Parquet snapshot when it has been built
+    df = fetch_restaurant_ids()
+    plot_venn(df)
     plt.show()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()